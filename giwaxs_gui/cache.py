@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+import logging
+from threading import RLock
+from collections import OrderedDict
+
+import numpy as np
+
+__all__ = ['LRUCache', 'get_nbytes', 'CACHE_CONFIG_NAME']
+
+logger = logging.getLogger(__name__)
+
+CACHE_CONFIG_NAME = 'Cache parameters'
+
+
+class LRUCache(object):
+    """
+    Thread-safe least recently used cache with a memory budget in bytes.
+    The least recently used values are evicted when the total size
+    of cached values exceeds max_size. Values larger than max_size are not cached.
+    """
+
+    @property
+    def max_size(self) -> int:
+        return self._max_size
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def __init__(self, max_size: int, get_size=None):
+        self._max_size = max_size
+        self._get_size = get_size or get_nbytes
+        self._size = 0
+        self._data = OrderedDict()
+        self._lock = RLock()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value, _ = self._data[key]
+            except KeyError:
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value) -> None:
+        size = self._get_size(value)
+        with self._lock:
+            self.pop(key)
+            if size > self._max_size:
+                return
+            self._data[key] = (value, size)
+            self._size += size
+            self._evict()
+
+    def pop(self, key, default=None):
+        with self._lock:
+            try:
+                value, size = self._data.pop(key)
+            except KeyError:
+                return default
+            self._size -= size
+            return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._size = 0
+
+    def set_max_size(self, max_size: int) -> None:
+        with self._lock:
+            self._max_size = max_size
+            self._evict()
+
+    def _evict(self):
+        while self._size > self._max_size and self._data:
+            _, (_, size) = self._data.popitem(last=False)
+            self._size -= size
+
+
+def get_nbytes(value) -> int:
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sum(get_nbytes(v) for v in value)
+    return getattr(value, 'nbytes', 0)
@@ -1 +1 @@
-from .config_manager import read_config, save_config
+from .config_manager import read_config, save_config, get_config_folder
@@ -11,6 +11,10 @@ if not _CONFIG_FOLDER.is_dir():
     _CONFIG_FOLDER.mkdir()
 
 
+def get_config_folder() -> Path:
+    return _CONFIG_FOLDER
+
+
 def read_config(config_name: str, get_default_values: bool = False) -> dict or None:
     filename = f'{config_name}.json'
     config_path = _CONFIG_FOLDER / filename
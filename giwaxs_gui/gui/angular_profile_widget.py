@@ -19,13 +19,24 @@ class AngularProfileWidget(BasicROIContainer, PlotWithBaseLineCorrection):
         self.current_roi_key = None
 
     def process_signal(self, sc: SignalContainer):
+        # angular binning is calculated for every beam center, so the profile
+        # is not updated while the beam center is being dragged, but once it is set
+        preview = (
+                not sc.image_changed() and not sc.geometry_changed_finish() and
+                bool(sc.geometry_changed()) and all(signal() for signal in sc.geometry_changed())
+        )
         for signal in sc.segment_deleted():
             if signal().key == self.current_roi_key:
                 self._remove_current_roi()
         for signal in sc.segment_moved():
             if signal().key == self.current_roi_key:
-                self.update_profile()
+                if preview:
+                    self._update_suggested = True
+                else:
+                    self.update_profile()
         BasicROIContainer.process_signal(self, sc)
+        if self._update_suggested and not preview and (sc.geometry_changed() or sc.geometry_changed_finish()):
+            self.update_profile()
 
     def _on_status_changed(self, sig: StatusChangedContainer):
         super()._on_status_changed(sig)
@@ -65,16 +76,16 @@ class AngularProfileWidget(BasicROIContainer, PlotWithBaseLineCorrection):
         self.image_view.plot_item.removeItem(roi)
 
     def update_profile(self):
-        if any(x is None for x in
-               (self.current_roi_key,
-                self.image.phi,
-                self.image.image,
-                self.image.rr)):
+        self._update_suggested = False
+        if self.current_roi_key is None or self.image.image is None:
             return
         roi = self.roi_dict[self.current_roi_key]
-        r, w = roi.value.radius / self.image.scale, roi.value.width / self.image.scale
+        r, w = roi.value.radius, roi.value.width
         r1, r2 = r - w / 2, r + w / 2
-        self.x, self.y = self.image.get_angular_profile(r1, r2)
+        profile = self.image.get_angular_profile(r1, r2)
+        if profile is None:
+            return
+        self.x, self.y = profile
         self.plot()
 
     def send_value_changed(self, value: RoiParameters):
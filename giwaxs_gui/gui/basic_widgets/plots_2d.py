@@ -98,7 +98,8 @@ class CustomImageViewer(GraphicsLayoutWidget):
         self.set_default_range()
 
     def _set_axis(self, min_: float, max_: float, axis_ind: int):
-        shape = self.image_item.image.shape
+        # images are row-major: x axis corresponds to columns
+        shape = self.image_item.image.shape[::-1]
         scale = np.array(self._scale)
         scale[axis_ind] = (max_ - min_) / shape[axis_ind]
         center = np.array(self._center)
@@ -111,7 +112,7 @@ class CustomImageViewer(GraphicsLayoutWidget):
         self._center = tuple(center)
 
     def get_axes(self):
-        shape = np.array(self.image_item.image.shape)
+        shape = np.array(self.image_item.image.shape[::-1])
         scale = np.array(self._scale)
         min_ = - np.array(self._center) * scale
         max_ = min_ + shape * scale
@@ -4,7 +4,7 @@ from abc import abstractmethod
 from typing import NamedTuple
 
 from PyQt5.QtWidgets import (QWidget, QLineEdit, QHBoxLayout,
-                             QLabel, QFormLayout,
+                             QLabel, QFormLayout, QCheckBox,
                              QPushButton, QRadioButton)
 from PyQt5.QtGui import QIntValidator
 from PyQt5.QtCore import Qt, pyqtSignal
@@ -61,7 +61,11 @@ class AbstractInputParametersWidget(QWidget):
         if current_value is None:
             current_value = ''
         label_widget = QLabel(input_parameter.label)
-        input_widget = QLineEdit(str(current_value))
+        if input_parameter.type is bool:
+            input_widget = QCheckBox()
+            input_widget.setChecked(bool(current_value))
+        else:
+            input_widget = QLineEdit(str(current_value))
         if input_parameter.type is int:
             input_widget.setValidator(QIntValidator())
         layout = QHBoxLayout()
@@ -72,6 +76,8 @@ class AbstractInputParametersWidget(QWidget):
             layout.addWidget(info_button, Qt.AlignLeft)
 
         def get_input(s):
+            if input_parameter.type is bool:
+                return input_widget.isChecked()
             return validate_scientific_value(input_widget, input_parameter.type, input_parameter.none)
 
         setattr(AbstractInputParametersWidget, input_parameter.name,
@@ -77,10 +77,9 @@ class ControlWidget(BasicROIContainer, QTreeView):
         super().process_signal(s)
 
     def _on_geometry_changed(self):
-        if self.image.rr is not None:
-            self._radius_bounds = np.array([self.image.rr.min() * self.image.scale,
-                                            self.image.rr.max() * self.image.scale])
-            self._width_bounds = np.array([0, self.image.rr.max() * self.image.scale / 10])
+        if self.image.r_range is not None:
+            self._radius_bounds = self.image.r_to_q(np.array(self.image.r_range))
+            self._width_bounds = np.array([0, self._radius_bounds[1] / 10])
             self._default_ring_parameters['radius'] = self._radius_bounds.sum() / 2
             self._default_ring_parameters['width'] = self._radius_bounds.sum() / 10
 
@@ -157,8 +156,8 @@ class ControlWidget(BasicROIContainer, QTreeView):
         self.add_roi(value)
 
     def _on_scale_changed(self):
-        self._radius_bounds = self._radius_bounds * self.image.scale_change
-        self._width_bounds = self._width_bounds * self.image.scale_change
+        self._radius_bounds = self.image.rescale(self._radius_bounds)
+        self._width_bounds = np.array([0, self._radius_bounds[1] / 10])
         for v in self.roi_dict.values():
             v.set_radius_bounds(self._radius_bounds)
             v.set_width_bounds(self._width_bounds)
@@ -11,17 +11,22 @@ from PyQt5.QtWidgets import (QTreeView, QFileDialog, QWidget,
 from PyQt5.QtCore import Qt, QItemSelectionModel
 from PyQt5.QtGui import QStandardItem, QStandardItemModel
 
-from .utils import read_h5_dict
+from .utils import read_h5_dict, get_file_dialog_filter
 from .items import (file_item_factory, FolderGroupItem, RoiItem,
                     H5GiwaxsItem, H5FileItem, AbstractGroupItem,
                     AbstractFileItem, H5DatasetItem)
 
-from ..basic_widgets import RoundedPushButton
+from ..basic_widgets import RoundedPushButton, BasicInputParametersWidget
 from ..roi.roi_widgets import EmptyROI, FileWidgetRoi
 from ..roi.roi_containers import BasicROIContainer
 from ..signal_connection import SignalConnector, SignalContainer, StatusChangedContainer
 
 from ...utils import Icon, RoiParameters, save_execute
+from ...config import read_config
+from ...read_data.frame_cache import get_frame_cache, CACHE_CONFIG_NAME
+from ..interpolation.interpolation import get_interpolation_geometry_cache
+from ..integration import get_integration_cache
+from ..global_context import get_binning_cache
 
 logger = logging.getLogger(__name__)
 
@@ -48,6 +53,29 @@ class FileModel(QStandardItemModel):
         return item
 
 
+class CacheSetupWindow(BasicInputParametersWidget):
+    P = BasicInputParametersWidget.InputParameters
+
+    PARAMETER_TYPES = (P('frame_cache_size', 'Frame cache size (MB)', float,
+                         'Memory budget for decoded images.\n'
+                         'Least recently used images are removed\n'
+                         'from the cache when it is full.'),
+                       P('prefetch_number', 'Number of images to prefetch', int,
+                         'Number of next and previous files in the\n'
+                         'current folder which are read in background.'),
+                       P('geometry_cache_size', 'Polar maps cache size (MB)', float,
+                         'Memory budget for polar interpolation maps\n'
+                         'reused for images with the same geometry.'),
+                       P('integration_cache_size', 'Integration cache size (MB)', float,
+                         'Memory budget for pixel splitting matrices\n'
+                         'reused for images with the same geometry.'),
+                       P('binning_cache_size', 'Profiles cache size (MB)', float,
+                         'Memory budget for radial and angular profile\n'
+                         'binnings reused for images with the same geometry.'))
+
+    NAME = CACHE_CONFIG_NAME
+
+
 class FileWidget(BasicROIContainer, QTreeView):
     def __init__(self, signal_connector: SignalConnector, parent=None):
         BasicROIContainer.__init__(self, signal_connector)
@@ -56,9 +84,14 @@ class FileWidget(BasicROIContainer, QTreeView):
         self.setEditTriggers(QTreeView.NoEditTriggers)
         self.setModel(self._model)
         self.selectionModel().currentChanged.connect(self._on_clicked)
+        self.expanded.connect(self._on_expanded)
+        self.collapsed.connect(self._on_collapsed)
         # self.clicked.connect(self._on_clicked)
         self.current_dataset = None
         self._future_dataset = None
+        self._cache_setup = None
+        self._prefetch_number = 0
+        self.set_cache_parameters(read_config(CacheSetupWindow.NAME))
         self.customContextMenuRequested.connect(
             self.context_menu
         )
@@ -74,9 +107,35 @@ class FileWidget(BasicROIContainer, QTreeView):
         add_folder_button = RoundedPushButton(icon=Icon('folder'), radius=30,
                                               background_color='transparent')
         add_folder_button.clicked.connect(self._open_add_folder_menu)
+        cache_setup_button = RoundedPushButton(icon=Icon('setup'), radius=30,
+                                               background_color='transparent')
+        cache_setup_button.clicked.connect(self.open_cache_setup)
         layout = self._get_header_layout(QStandardItem(), 'Files')
         layout.addWidget(add_file_button)
         layout.addWidget(add_folder_button)
+        layout.addWidget(cache_setup_button)
+
+    def open_cache_setup(self):
+        self._cache_setup = CacheSetupWindow()
+        self._cache_setup.apply_signal.connect(self.set_cache_parameters)
+        self._cache_setup.close_signal.connect(self.close_cache_setup)
+        self._cache_setup.show()
+
+    def close_cache_setup(self):
+        self._cache_setup = None
+
+    def set_cache_parameters(self, params: dict or None):
+        params = params or dict()
+        self._prefetch_number = params.get('prefetch_number', 0)
+        if 'frame_cache_size' in params:
+            get_frame_cache().set_max_size(int(params['frame_cache_size'] * 2 ** 20))
+        if 'geometry_cache_size' in params:
+            get_interpolation_geometry_cache().set_max_size(
+                int(params['geometry_cache_size'] * 2 ** 20))
+        if 'integration_cache_size' in params:
+            get_integration_cache().set_max_size(int(params['integration_cache_size'] * 2 ** 20))
+        if 'binning_cache_size' in params:
+            get_binning_cache().set_max_size(int(params['binning_cache_size'] * 2 ** 20))
 
     @save_execute('File widget process signal failed.')
     def process_signal(self, s: SignalContainer):
@@ -152,14 +211,14 @@ class FileWidget(BasicROIContainer, QTreeView):
         options |= QFileDialog.DontUseNativeDialog
         filepath, _ = QFileDialog.getOpenFileName(
             self, 'Open image', '',
-            'edf, tiff, h5, hdf5 files (*.tiff *.edf *.h5 *.hdf5)', options=options)
+            get_file_dialog_filter(), options=options)
         if filepath:
             self._model.add_file(Path(filepath))
 
     def _open_add_folder_menu(self):
         options = QFileDialog.ShowDirsOnly | QFileDialog.DontResolveSymlinks
         folder_path = QFileDialog.getExistingDirectory(
-            self, 'Choose directory containing edf, tiff or h5 files', '',
+            self, 'Choose directory containing image files', '',
             options=options)
         if folder_path:
             self._model.add_folder(Path(folder_path))
@@ -178,19 +237,45 @@ class FileWidget(BasicROIContainer, QTreeView):
     def _on_clicked(self, index):
         item = self._model.itemFromIndex(index)
         if isinstance(item, AbstractGroupItem) and not item.content_uploaded:
-            item.update_content()
+            self._update_group_content(item)
             self.setExpanded(item.index(), True)
         elif isinstance(item, AbstractFileItem):
             if item.should_parse_file:
                 self._parse_h5_item(item)
             else:
                 data = item.get_data()
-                if self.current_dataset != item and data.ndim == 2:
+                if self.current_dataset != item and data is not None and data.ndim == 2:
                     self._change_image_item(item, data)
+                self._prefetch_neighbours(item)
         elif (isinstance(item, RoiItem) and
               item.roi and item.parent() is self.current_dataset):
             item.roi.send_active()
 
+    @save_execute('Could not prefetch files.')
+    def _prefetch_neighbours(self, item: AbstractFileItem):
+        parent = item.parent() or self._model.invisibleRootItem()
+        row, number = item.row(), self._prefetch_number
+        for i in list(range(row + 1, row + number + 1)) + list(range(row - 1, row - number - 1, -1)):
+            neighbour = parent.child(i) if 0 <= i < parent.rowCount() else None
+            if isinstance(neighbour, AbstractFileItem) and not neighbour.should_parse_file:
+                neighbour.prefetch()
+
+    def _on_expanded(self, index):
+        item = self._model.itemFromIndex(index)
+        if isinstance(item, FolderGroupItem) and not item.content_uploaded:
+            item.start_loading(self)
+
+    def _on_collapsed(self, index):
+        item = self._model.itemFromIndex(index)
+        if isinstance(item, FolderGroupItem) and item.is_loading:
+            item.cancel_loading()
+
+    def _update_group_content(self, item: AbstractGroupItem):
+        if isinstance(item, FolderGroupItem):
+            item.start_loading(self)
+        else:
+            item.update_content()
+
     @save_execute('Could not read saved h5 image.', silent=False)
     def _parse_h5_item(self, item: H5GiwaxsItem):
         try:
@@ -270,6 +355,8 @@ class FileWidget(BasicROIContainer, QTreeView):
             update_folder.triggered.connect(lambda: self.update_group(item))
             close_folder = menu.addAction('Close folder')
             close_folder.triggered.connect(lambda: self._on_closing_group(item))
+            if item.content_uploaded:
+                self._add_sort_menu(menu, item)
         elif isinstance(item, H5FileItem):
             update_folder = menu.addAction('Update h5 file')
             update_folder.triggered.connect(lambda: self.update_group(item))
@@ -288,6 +375,19 @@ class FileWidget(BasicROIContainer, QTreeView):
             return
         menu.exec_(self.viewport().mapToGlobal(position))
 
+    @staticmethod
+    def _add_sort_menu(menu: QMenu, item: FolderGroupItem):
+        sort_menu = menu.addMenu('Sort by')
+        for key, name in (('name', 'Name'), ('mtime', 'Modification time'), ('size', 'Size')):
+            sort_action = sort_menu.addAction(name)
+            sort_action.triggered.connect(lambda *args, k=key: item.sort_files(k))
+        header_keys = item.get_metadata_keys()
+        if header_keys:
+            header_menu = sort_menu.addMenu('Header')
+            for key in header_keys:
+                sort_action = header_menu.addAction(key)
+                sort_action.triggered.connect(lambda *args, k=key: item.sort_files(k))
+
     def _on_closing_group(self, item: H5FileItem or FolderGroupItem):
         if self._group_contains_current_dataset(item):
             self.current_dataset = None
@@ -312,5 +412,5 @@ class FileWidget(BasicROIContainer, QTreeView):
             for k, v in self.roi_dict.items():
                 self.roi_dict[k] = EmptyROI(v.value)
         item.removeRows(0, item.rowCount())
-        item.update_content()
+        self._update_group_content(item)
         self.setExpanded(item.index(), True)
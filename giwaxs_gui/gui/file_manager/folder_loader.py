@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+import logging
+from pathlib import Path
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from .utils import iter_folder_content
+
+logger = logging.getLogger(__name__)
+
+
+class FolderContentLoader(QThread):
+    """
+    Enumerates folder content and reads file metadata in a worker thread.
+    Subfolders are emitted first, files are emitted in batches
+    of (filepath, metadata) tuples so that the file tree is filled incrementally.
+    """
+    folders_loaded = pyqtSignal(list)
+    files_loaded = pyqtSignal(list)
+
+    def __init__(self, folder_path: Path, parent=None):
+        super().__init__(parent)
+        self.folder_path = folder_path
+
+    def run(self):
+        try:
+            for dirpaths, files in iter_folder_content(self.folder_path):
+                if self.isInterruptionRequested():
+                    return
+                if dirpaths:
+                    self.folders_loaded.emit(dirpaths)
+                if files:
+                    self.files_loaded.emit(files)
+        except Exception as err:
+            logger.exception(f'Could not read folder {self.folder_path}: {err}')
+
+    def cancel(self):
+        self.requestInterruption()
@@ -7,13 +7,17 @@ from pathlib import Path
 import numpy as np
 import h5py
 
+from PyQt5.QtCore import QObject
 from PyQt5.QtGui import QStandardItem
 
 from .utils import (save_as_h5_dialog, save_to_h5_dialog,
                     save_create_h5_subgroup,
                     prepare_dict_to_h5, parse_h5_group,
-                    filter_dirs, filter_files)
-from ...read_data import get_image_from_path
+                    iter_folder_content, metadata_to_str,
+                    get_metadata_sort_key)
+from .folder_loader import FolderContentLoader
+from ...read_data.readers import AbstractReader, get_reader
+from ...read_data.frame_cache import get_frame_cache
 from ...utils import Icon, save_execute
 
 logger = logging.getLogger(__name__)
@@ -48,18 +52,41 @@ class AbstractFileItem(AbstractItem):
         super().__init__(filepath)
         self._properties = dict()
         self._properties_item = None
+        self.metadata = dict()
         self.setIcon(Icon('data'))
 
+    def set_metadata(self, metadata: dict):
+        self.metadata = metadata
+        self.setToolTip(metadata_to_str(metadata))
+
     def get_child_rois(self):
         for row in range(self.rowCount()):
             item = self.child(row)
             if isinstance(item, RoiItem) and item.roi:
                 yield item
 
+    @property
+    def cache_key(self) -> tuple:
+        return str(self.filepath), self.filepath.stat().st_mtime_ns
+
     @abstractmethod
     def get_data(self) -> np.array:
         pass
 
+    @abstractmethod
+    def read_data(self) -> np.array:
+        """
+        Reads data from file bypassing the frame cache.
+        Could be called from worker threads.
+        """
+        pass
+
+    def get_cached_data(self) -> np.array:
+        return get_frame_cache().get_frame(self.cache_key, self.read_data)
+
+    def prefetch(self):
+        get_frame_cache().prefetch(self.cache_key, self.read_data)
+
     @save_execute('An error occured while trying to save file.',
                   silent=False, error_title='Save file error')
     def save_as_h5(self, *args):
@@ -140,6 +167,10 @@ class PropertiesItem(AttributesItem):
 
 
 class H5Item(AbstractItem):
+    @property
+    def cache_key(self) -> tuple:
+        return super().cache_key + (self.h5_key,)
+
     def __init__(self, filepath: Path, h5_key: str, *args, **kwargs):
         self.h5_key = h5_key
         super(H5Item, self).__init__(filepath)
@@ -183,7 +214,10 @@ class H5FileItem(H5GroupItem):
 class H5DatasetItem(H5Item, AbstractFileItem):
     @save_execute('Error while trying to get data from h5 file.', silent=True)
     def get_data(self):
-        with h5py.File(self.filepath) as f:
+        return self.get_cached_data()
+
+    def read_data(self):
+        with h5py.File(self.filepath, 'r') as f:
             return f[self.h5_key][()]
 
     def save_here(self):
@@ -198,45 +232,163 @@ class H5DatasetItem(H5Item, AbstractFileItem):
 class H5GiwaxsItem(H5DatasetItem):
     should_parse_file = True
 
-    @save_execute('Error while trying to get data from h5 file.', silent=True)
-    def get_data(self):
+    def read_data(self):
         with h5py.File(self.filepath, 'r') as f:
             return f[f'{self.h5_key}/image'][()]
 
 
 class FolderGroupItem(AbstractGroupItem):
+    @property
+    def is_loading(self) -> bool:
+        return self._loader is not None
+
+    def __init__(self, filepath: Path, *args, **kwargs):
+        super().__init__(filepath, *args, **kwargs)
+        self._loader = None
+
     def _update_content(self):
-        for dirpath in filter_dirs(self.filepath):
-            self.appendRow(FolderGroupItem(dirpath))
-        for filepath in filter_files(self.filepath):
+        for dirpaths, files in iter_folder_content(self.filepath):
+            self._add_folders(dirpaths)
+            self._add_files(files)
+
+    def start_loading(self, parent: QObject = None):
+        """
+        Loads folder content in a worker thread, items are added in batches.
+        """
+        self.cancel_loading()
+        self.content_uploaded = True
+        loader = FolderContentLoader(self.filepath, parent)
+        loader.folders_loaded.connect(lambda dirpaths: self._on_loaded(loader, self._add_folders, dirpaths))
+        loader.files_loaded.connect(lambda files: self._on_loaded(loader, self._add_files, files))
+        loader.finished.connect(lambda: self._on_loading_finished(loader))
+        self._loader = loader
+        loader.start()
+
+    def cancel_loading(self):
+        if self._loader is not None:
+            self._loader.cancel()
+            self._loader = None
+            self.removeRows(0, self.rowCount())
+            self.content_uploaded = False
+
+    def _on_loaded(self, loader: FolderContentLoader, add_func, paths: list):
+        # batches from cancelled loaders can still be in the event queue
+        if loader is self._loader:
+            add_func(paths)
+
+    def _on_loading_finished(self, loader: FolderContentLoader):
+        if loader is self._loader:
+            self._loader = None
+        loader.deleteLater()
+
+    def _add_folders(self, dirpaths: list):
+        if dirpaths:
+            self.appendRows([FolderGroupItem(dirpath) for dirpath in dirpaths])
+
+    def _add_files(self, files: list):
+        items = list()
+        for filepath, metadata in files:
             item = file_item_factory(filepath)
             if item:
-                self.appendRow(item)
+                item.set_metadata(metadata)
+                items.append(item)
+        if items:
+            self.appendRows(items)
+
+    def get_metadata_keys(self) -> list:
+        keys = set()
+        for row in range(self.rowCount()):
+            item = self.child(row)
+            if isinstance(item, AbstractFileItem):
+                keys.update(item.metadata.get('header', {}).keys())
+        return sorted(keys)
+
+    def sort_files(self, key: str = 'name'):
+        rows = [self.takeRow(0) for _ in range(self.rowCount())]
+        folder_rows = [row for row in rows if not isinstance(row[0], AbstractFileItem)]
+        file_rows = [row for row in rows if isinstance(row[0], AbstractFileItem)]
+        if key == 'name':
+            file_rows.sort(key=lambda row: row[0].filepath.name)
+        else:
+            file_rows.sort(key=lambda row: get_metadata_sort_key(row[0].metadata, key))
+        for row in folder_rows + file_rows:
+            self.appendRow(row)
 
     def close(self):
+        self.cancel_loading()
         parent = self.parent() or self.model()
         parent.removeRow(self.row())
 
 
-class EdfFileItem(AbstractFileItem):
-    @save_execute('Cound not read from edf file', silent=False)
+class ImageFileItem(AbstractFileItem):
+    """
+    Image file item read by a registered reader.
+    Frames of multi-frame files are shown as child items,
+    the file item itself shows the first frame.
+    """
+
+    @property
+    def frames(self):
+        if self._frames is None:
+            self._frames = self.reader.open(self.filepath)
+        return self._frames
+
+    def __init__(self, filepath: Path, reader: AbstractReader, *args, **kwargs):
+        super().__init__(filepath, *args, **kwargs)
+        self.reader = reader
+        self._frames = None
+        self.frames_uploaded = False
+
+    @save_execute('Could not read from file', silent=False)
     def get_data(self):
-        return get_image_from_path(self.filepath)
+        if not self.frames_uploaded:
+            self._add_frame_items()
+        return self.get_cached_data()
+
+    def read_data(self):
+        return self.frames[0]
 
+    def _add_frame_items(self):
+        self.frames_uploaded = True
+        if len(self.frames) > 1:
+            self.appendRows([FrameItem(self.filepath, i, self.frames)
+                             for i in range(len(self.frames))])
 
-class TiffFileItem(AbstractFileItem):
-    @save_execute('Cound not read from tiff file', silent=False)
+
+class FrameItem(AbstractFileItem):
+    def __init__(self, filepath: Path, frame_index: int, frames, *args, **kwargs):
+        self.frame_index = frame_index
+        self.frames = frames
+        super().__init__(filepath, *args, **kwargs)
+        self.setIcon(Icon('item'))
+
+    @property
+    def cache_key(self) -> tuple:
+        return super().cache_key + (self.frame_index,)
+
+    def __get_name__(self):
+        return f'frame {self.frame_index}'
+
+    @save_execute('Could not read from file', silent=False)
     def get_data(self):
-        return get_image_from_path(self.filepath)
+        return self.get_cached_data()
+
+    def read_data(self):
+        return self.frames[self.frame_index]
+
+    def _save_to_h5(self, f: h5py.File, data: np.ndarray = None, name: str = None):
+        name = name or f'{self.filepath.name.split(".")[0]}_{self.frame_index}'
+        super()._save_to_h5(f, data, name)
 
 
 def file_item_factory(filepath: Path):
-    if filepath.suffix == '.edf':
-        return EdfFileItem(filepath)
-    elif filepath.suffix in ['.tif', '.tiff']:
-        return TiffFileItem(filepath)
-    elif filepath.suffix == '.h5':
+    reader = get_reader(filepath)
+    if reader is None:
+        return
+    elif reader.IS_H5_CONTAINER:
         return H5FileItem(filepath)
+    else:
+        return ImageFileItem(filepath, reader)
 
 
 def h5_item_factory(h5item: h5py.Group or h5py.Dataset, filepath: Path):
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 
+import os
 import logging
 from pathlib import Path
 
@@ -8,17 +9,81 @@ import h5py
 
 from PyQt5.QtWidgets import QFileDialog
 
-logger = logging.getLogger(__name__)
-
-_AVAILABLE_FILE_FORMATS = tuple('.tif .tiff .h5 .hdf5 .edf'.split())
-
-
-def filter_files(path: Path):
-    yield from (p for p in path.iterdir() if p.suffix in _AVAILABLE_FILE_FORMATS)
+from ...read_data.metadata_index import FolderMetadataIndex
+from ...read_data.readers import get_reader, get_readers, get_available_suffixes
 
+logger = logging.getLogger(__name__)
 
-def filter_dirs(path: Path):
-    yield from (p for p in path.iterdir() if p.is_dir())
+_FOLDER_BATCH_SIZE = 500
+
+
+def get_file_dialog_filter() -> str:
+    names = ', '.join(reader.NAME for reader in get_readers())
+    patterns = ' '.join(f'*{suffix}' for suffix in get_available_suffixes())
+    return f'{names} files ({patterns})'
+
+
+def scan_folder(path: Path):
+    dirpaths, filepaths = list(), list()
+    with os.scandir(str(path)) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                dirpaths.append(Path(entry.path))
+            elif get_reader(entry.name) is not None:
+                filepaths.append(Path(entry.path))
+    return sorted(dirpaths), sorted(filepaths)
+
+
+def iter_folder_content(path: Path, batch_size: int = _FOLDER_BATCH_SIZE):
+    """
+    Yields subfolders of the folder first and then batches of
+    (filepath, metadata) tuples of the files with available formats.
+    """
+    dirpaths, filepaths = scan_folder(path)
+    yield dirpaths, []
+    try:
+        index = FolderMetadataIndex(path)
+    except Exception as err:
+        logger.exception(f'Could not open metadata index of {path}: {err}')
+        index = None
+    for i in range(0, len(filepaths), batch_size):
+        batch = filepaths[i:i + batch_size]
+        metadata = _update_index(index, batch)
+        yield [], [(filepath, metadata.get(filepath, {})) for filepath in batch]
+    if index:
+        index.remove_missing(filepaths)
+
+
+def _update_index(index: FolderMetadataIndex or None, filepaths: list) -> dict:
+    if index is None:
+        return dict()
+    try:
+        return index.update(filepaths)
+    except Exception as err:
+        logger.exception(f'Could not update metadata index of {index.folder}: {err}')
+        return dict()
+
+
+def metadata_to_str(metadata: dict) -> str:
+    lines = list()
+    if 'shape' in metadata:
+        lines.append(f'shape: {" x ".join(map(str, metadata["shape"]))}')
+    if 'dtype' in metadata:
+        lines.append(f'dtype: {metadata["dtype"]}')
+    for name, dset in metadata.get('datasets', {}).items():
+        lines.append(f'{name}: {tuple(dset["shape"])} {dset["dtype"]}')
+    lines.extend(f'{k}: {v}' for k, v in metadata.get('header', {}).items())
+    return '\n'.join(lines)
+
+
+def get_metadata_sort_key(metadata: dict, key: str):
+    value = metadata.get(key, metadata.get('header', {}).get(key, None))
+    if value is None:
+        return 2, ''
+    try:
+        return 0, float(value)
+    except (TypeError, ValueError):
+        return 1, str(value)
 
 
 def parse_h5_group(file: h5py.File, key: str):
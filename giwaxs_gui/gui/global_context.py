@@ -1,33 +1,913 @@
 from typing import NamedTuple
+from functools import lru_cache
+import os
+import hashlib
 import logging
 
 import numpy as np
+import cv2
 
 from .exceptions import UnknownTransformation
 from .interpolation.interpolation import Interpolation
+from .integration import get_integration_matrix
+from ..config import read_config
+from ..cache import LRUCache, CACHE_CONFIG_NAME
+from ..read_data import get_image_from_path
 
 logger = logging.getLogger(__name__)
 
+_MB = 2 ** 20
+
 
 # TODO Refactor, introduce phi_degree_axis and r_scaled_axis for common use.
 
 
-class Geometry(NamedTuple):
-    xx: np.ndarray = None
-    yy: np.ndarray = None
-    rr: np.ndarray = None
-    phi: np.ndarray = None
-    beam_center: tuple = None
+class Geometry(object):
+    """
+    Pixel coordinates relative to the beam center.
+    Coordinate maps are float32 arrays computed lazily on the first access and are read-only,
+    as instances are shared between images of the same shape and beam center.
+    Radius and angle ranges are calculated from the image edges without creating the maps.
+    Should be initialized by the class method '.get()'.
+    """
+
+    @property
+    def shape(self) -> tuple or None:
+        return self._shape
+
+    @property
+    def beam_center(self) -> tuple or None:
+        return self._beam_center
+
+    @property
+    def xx(self) -> np.ndarray or None:
+        if self._xx is None and self._shape:
+            self._xx = _read_only(np.broadcast_to(self._x[np.newaxis, :], self._shape))
+        return self._xx
+
+    @property
+    def yy(self) -> np.ndarray or None:
+        if self._yy is None and self._shape:
+            self._yy = _read_only(np.broadcast_to(self._y[:, np.newaxis], self._shape))
+        return self._yy
+
+    @property
+    def rr(self) -> np.ndarray or None:
+        if self._rr is None and self._shape:
+            self._rr = _read_only(np.sqrt(self._x[np.newaxis, :] ** 2 + self._y[:, np.newaxis] ** 2))
+        return self._rr
+
+    @property
+    def phi(self) -> np.ndarray or None:
+        if self._phi is None and self._shape:
+            self._phi = _read_only(np.arctan2(self.yy, self.xx))
+        return self._phi
+
+    @property
+    def r_range(self) -> tuple or None:
+        if self._r_range is None and self._shape:
+            # the nearest pixel and the farthest corner
+            nearest_x, nearest_y = np.abs(self._x).min(), np.abs(self._y).min()
+            farthest_x, farthest_y = np.abs(self._x[[0, -1]]).max(), np.abs(self._y[[0, -1]]).max()
+            self._r_range = (float(np.sqrt(nearest_x ** 2 + nearest_y ** 2)),
+                             float(np.sqrt(farthest_x ** 2 + farthest_y ** 2)))
+        return self._r_range
+
+    @property
+    def phi_range(self) -> tuple or None:
+        if self._phi_range is None and self._shape:
+            # angles take extreme values at the left or the right image edges
+            edges = np.arctan2(self._y[:, np.newaxis], self._x[np.newaxis, [0, -1]])
+            self._phi_range = float(edges.min()), float(edges.max())
+        return self._phi_range
+
+    def __init__(self, shape: tuple = None, beam_center: tuple = None):
+        self._shape = shape
+        self._beam_center = beam_center
+        self._xx = self._yy = self._rr = self._phi = None
+        self._r_range = self._phi_range = None
+        if shape:
+            self._x = (np.arange(shape[1]) - beam_center[1]).astype(np.float32)
+            self._y = (np.arange(shape[0]) - beam_center[0]).astype(np.float32)
+
+    def get_rr(self, step: int = 1) -> np.ndarray or None:
+        """
+        Returns radius map of every step-th pixel along both axes (for fast previews).
+        """
+        if step == 1 or not self._shape:
+            return self.rr
+        return np.sqrt(self._x[np.newaxis, ::step] ** 2 + self._y[::step, np.newaxis] ** 2)
+
+    def get_chi(self, step: int = 1) -> np.ndarray or None:
+        """
+        Returns azimuthal angle [rad] of every step-th pixel measured from the upward direction
+        (positive to the right), which is chi of a flat sample without detector geometry.
+        """
+        if not self._shape:
+            return
+        return np.arctan2(self._x[np.newaxis, ::step], -self._y[::step, np.newaxis])
+
+    def get_radial_binning(self, step: int = 1, edges: np.ndarray = None, sectors: tuple = (),
+                           detector_geometry: 'DetectorGeometry' = None,
+                           mask: 'DetectorMask' = None) -> 'RadialBinning' or None:
+        """
+        Returns radial binning of every step-th pixel, calculated once for the geometry
+        and kept in the binning cache shared by all geometries.
+        Bins are one pixel wide by default or defined by edges [pixels].
+        Sectors are binned by chi of the detector geometry if it is given.
+        Masked pixels are excluded from all bins.
+        """
+        if not self._shape:
+            return
+        sectors = tuple(sectors)
+        key = ('radial', self._shape, self._beam_center, step,
+               None if edges is None else np.asarray(edges, dtype=np.float64).tobytes(), sectors,
+               detector_geometry.parameters if sectors and detector_geometry else None,
+               mask.key if mask else None)
+        cache = get_binning_cache()
+        binning = cache.get(key)
+        if binning is None:
+            chi = None
+            if sectors:
+                chi = detector_geometry.chi[::step, ::step] if detector_geometry else self.get_chi(step)
+            binning = RadialBinning(
+                self.get_rr(step), edges, chi, sectors, mask.array[::step, ::step] if mask else None)
+            cache.put(key, binning)
+        return binning
+
+    def get_angular_binning(self, mask: 'DetectorMask' = None) -> 'AngularBinning' or None:
+        """
+        Returns pixel index sorted by radius for angular profiles, calculated once for the geometry
+        and kept in the binning cache shared by all geometries.
+        """
+        if not self._shape:
+            return
+        key = 'angular', self._shape, self._beam_center, mask.key if mask else None
+        cache = get_binning_cache()
+        binning = cache.get(key)
+        if binning is None:
+            binning = AngularBinning(self.rr, self.phi, self.phi_range, mask.array if mask else None)
+            cache.put(key, binning)
+        return binning
 
     @classmethod
-    def get(cls, shape: tuple, center: tuple):
-        xx, yy = np.meshgrid(
-            np.arange(shape[1]) - center[1],
-            np.arange(shape[0]) - center[0]
-        )
-        rr = np.sqrt(xx ** 2 + yy ** 2)
-        phi = np.arctan2(yy, xx)
-        return cls(xx=xx, yy=yy, rr=rr, phi=phi, beam_center=center)
+    def get(cls, shape: tuple, center: tuple) -> 'Geometry':
+        return _get_cached_geometry(tuple(shape), tuple(center))
+
+
+class RadialBinning(object):
+    """
+    Pixels binned by the integer part of their radius or by arbitrary bin edges.
+    Holds the bin index and inverse pixel counts of bins, so that a radial profile
+    of an image (and its Poisson errors) is a single weighted bincount.
+    Empty bins of the profile are zeros, pixels outside of the edges are ignored.
+    With sectors, the index combines (sector, radius) bins and pixels outside of all sectors
+    are collected in an extra row, so that profiles of all sectors and of the full azimuth
+    come from the same bincount. Pixels of overlapping sectors belong to the first one.
+    Masked pixels are moved to the ignored bin, so masked profiles cost the same.
+    The index is stored as np.intp, as np.bincount converts other types on every call,
+    and float64 weights are converted in cache-sized chunks instead of a full copy.
+    """
+    _CHUNK_SIZE = 2 ** 16
+
+    @property
+    def index(self) -> np.ndarray:
+        return self._index
+
+    @property
+    def inverse_counts(self) -> np.ndarray:
+        return self._inverse_counts
+
+    @property
+    def sector_inverse_counts(self) -> np.ndarray or None:
+        return self._sector_inverse_counts
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def edges(self) -> np.ndarray:
+        return self._edges
+
+    @property
+    def sectors(self) -> tuple:
+        return self._sectors
+
+    @property
+    def nbytes(self) -> int:
+        return self._index.nbytes + self._inverse_counts.nbytes + (
+            self._sector_inverse_counts.nbytes if self._sectors else 0)
+
+    def __init__(self, rr: np.ndarray, edges: np.ndarray = None,
+                 chi: np.ndarray = None, sectors: tuple = (), mask: np.ndarray = None):
+        self._shape = rr.shape
+        self._sectors = tuple(sectors)
+        if edges is None:
+            self._index = rr.astype(np.intp).ravel()
+            self._size = int(self._index.max(initial=-1)) + 1
+            self._edges = np.arange(self._size + 1, dtype=np.float64)
+            outside = np.zeros(self._index.size, dtype=bool)
+        else:
+            self._edges = np.asarray(edges, dtype=np.float64)
+            self._size = self._edges.size - 1
+            self._index = np.searchsorted(self._edges, rr.ravel(), side='right') - 1
+            outside = (self._index < 0) | (self._index >= self._size)
+        self._rows = len(self._sectors) + 1 if self._sectors else 1
+        if self._sectors:
+            self._index += self._get_sector_rows(chi) * self._size
+        if mask is not None:
+            outside |= mask.ravel()
+        # pixels outside of the edges and masked pixels are collected in the extra last bin
+        self._index[outside] = self._rows * self._size
+        _read_only(self._edges)
+        _read_only(self._index)
+        counts = np.bincount(self._index, minlength=self._rows * self._size + 1)
+        counts = counts[:self._rows * self._size].reshape(self._rows, self._size)
+        self._inverse_counts = _read_only(_get_inverse(counts.sum(axis=0)))
+        self._sector_inverse_counts = _read_only(_get_inverse(counts[:-1])) if self._sectors else None
+
+    def _get_sector_rows(self, chi: np.ndarray) -> np.ndarray:
+        abs_chi = np.abs(np.rad2deg(chi)).ravel()
+        rows = np.full(abs_chi.size, len(self._sectors), dtype=np.intp)
+        for i, sector in reversed(list(enumerate(self._sectors))):
+            rows[(abs_chi >= sector.chi_min) & (abs_chi < sector.chi_max)] = i
+        return rows
+
+    def get_profile(self, image: np.ndarray, errors: bool = False):
+        """
+        Returns mean intensities of bins over the full azimuth and, if errors,
+        their Poisson standard errors sqrt(sum) / count calculated from the same sums.
+        """
+        return _get_means(self._get_sums(image).sum(axis=0), self._inverse_counts, errors)
+
+    def get_sector_profiles(self, image: np.ndarray, errors: bool = False):
+        """
+        Returns profiles of the full azimuth (1d) and of the sectors (2d, sector x bin)
+        calculated from a single bincount, both are (profile, errors) tuples if errors.
+        """
+        if not self._sectors:
+            raise ValueError('Radial binning has no sectors')
+        sums = self._get_sums(image)
+        return (_get_means(sums.sum(axis=0), self._inverse_counts, errors),
+                _get_means(sums[:-1], self._sector_inverse_counts, errors))
+
+    def _get_sums(self, image: np.ndarray) -> np.ndarray:
+        if image.shape != self._shape:
+            raise ValueError(f'Image shape {image.shape} does not match binning shape {self._shape}')
+        weights = image.ravel()
+        length = self._rows * self._size + 1
+        sums = np.zeros(length)
+        for i in range(0, weights.size, self._CHUNK_SIZE):
+            sums += np.bincount(self._index[i:i + self._CHUNK_SIZE],
+                                weights[i:i + self._CHUNK_SIZE].astype(np.float64),
+                                minlength=length)
+        return sums[:-1].reshape(self._rows, self._size)
+
+
+class AngularBinning(object):
+    """
+    Pixel indices sorted by radius together with their radii and angles,
+    so that the pixels of a ring are a contiguous slice found by np.searchsorted.
+    Angular profile of a ring is a bincount of the pixels in the ring only
+    and does not require polar interpolation of the image. Masked pixels are excluded.
+    """
+
+    @property
+    def phi_range(self) -> tuple:
+        return self._phi_range
+
+    @property
+    def nbytes(self) -> int:
+        return self._r.nbytes + self._phi.nbytes + self._order.nbytes
+
+    def __init__(self, rr: np.ndarray, phi: np.ndarray, phi_range: tuple, mask: np.ndarray = None):
+        self._shape = rr.shape
+        self._phi_range = phi_range
+        order = np.argsort(rr.ravel(), kind='stable')
+        if mask is not None:
+            order = order[~mask.ravel()[order]]
+        self._r = _read_only(rr.ravel()[order])
+        self._phi = _read_only(phi.ravel()[order])
+        # int32 indices take half of the memory and are only used for ring slices
+        self._order = _read_only(order.astype(np.int32) if rr.size < 2 ** 31 else order)
+
+    def get_profile(self, image: np.ndarray, r1: float, r2: float, bins_number: int = None):
+        """
+        Returns angles [rad] of bin centers and mean intensities of pixels with r1 <= r < r2 [pixels].
+        By default, bins are about one pixel long at the middle radius of the ring.
+        Empty bins are zeros.
+        """
+        if image.shape != self._shape:
+            raise ValueError(f'Image shape {image.shape} does not match binning shape {self._shape}')
+        phi_min, phi_max = self._phi_range
+        bins_number = bins_number or max(int(np.ceil((r1 + r2) / 2 * (phi_max - phi_min))), 1)
+        # float64 radii would make searchsorted convert the whole sorted array
+        i1, i2 = np.searchsorted(self._r, np.array((r1, r2), dtype=self._r.dtype))
+        width = (phi_max - phi_min) / bins_number
+        index = ((self._phi[i1:i2] - phi_min) / width).astype(np.intp)
+        np.clip(index, 0, bins_number - 1, out=index)
+        indices = self._order[i1:i2]
+        if image.flags.c_contiguous:
+            values = image.ravel()[indices]
+        else:
+            # transformed images are views, ravel would copy the whole image
+            values = image[np.unravel_index(indices, self._shape)]
+        sums = np.bincount(index, values, minlength=bins_number)
+        counts = np.bincount(index, minlength=bins_number)
+        profile = np.zeros(bins_number)
+        np.divide(sums, counts, out=profile, where=counts > 0)
+        return phi_min + (np.arange(bins_number) + 0.5) * width, profile
+
+
+def _get_inverse(counts: np.ndarray) -> np.ndarray:
+    inverse_counts = np.zeros(counts.shape)
+    np.divide(1, counts, out=inverse_counts, where=counts > 0)
+    return inverse_counts
+
+
+def _get_means(sums: np.ndarray, inverse_counts: np.ndarray, errors: bool):
+    profile = sums * inverse_counts
+    if not errors:
+        return profile
+    np.clip(sums, 0, None, out=sums)
+    np.sqrt(sums, out=sums)
+    sums *= inverse_counts
+    return profile, sums
+
+
+_BINNING_CACHE = None
+
+
+def get_binning_cache() -> LRUCache:
+    global _BINNING_CACHE
+    if _BINNING_CACHE is None:
+        params = read_config(CACHE_CONFIG_NAME) or dict()
+        _BINNING_CACHE = LRUCache(int(params.get('binning_cache_size', 512) * _MB))
+    return _BINNING_CACHE
+
+
+@lru_cache(maxsize=4)
+def _get_cached_geometry(shape: tuple, center: tuple) -> Geometry:
+    return Geometry(shape, center)
+
+
+def _read_only(arr: np.ndarray) -> np.ndarray:
+    arr.setflags(write=False)
+    return arr
+
+
+DETECTOR_CONFIG_NAME = 'Detector geometry'
+
+
+class DetectorParameters(NamedTuple):
+    """
+    Experimental geometry of a GIWAXS measurement.
+    Fields:
+        distance: float - sample to detector distance [mm]
+        pixel_size: float - [mm]
+        wavelength: float - [Angstrom]
+        incidence_angle: float - grazing incidence angle [deg]
+        tilt: float - rotation of the detector around its horizontal axis through the beam center [deg]
+    """
+    distance: float
+    pixel_size: float
+    wavelength: float
+    incidence_angle: float = 0.
+    tilt: float = 0.
+
+    @classmethod
+    def from_dict(cls, parameters: dict or None) -> 'DetectorParameters' or None:
+        """
+        Returns None if any of the required parameters is missing.
+        """
+        parameters = {k: v for k, v in (parameters or {}).items() if v is not None and k in cls._fields}
+        try:
+            return cls(**parameters)
+        except TypeError:
+            return
+
+
+class DetectorGeometry(object):
+    """
+    Reciprocal space coordinates of the detector pixels in the grazing incidence geometry.
+    The beam center is the direct beam position, y axis of the detector points upwards
+    (to smaller row indices), incident beam is tilted by the incidence angle
+    with respect to the sample surface.
+    Maps q, q_xy, q_z [1/Angstrom] and chi [rad, angle from q_z axis] are float32 arrays
+    computed lazily and shared between images of the same geometry (read-only).
+    Radial conversions r_to_q and q_to_r use the scattering angle only,
+    as 1d profiles are calculated over pixel radii.
+    Should be initialized by the class method '.get()'.
+    """
+
+    @property
+    def geometry(self) -> Geometry:
+        return self._geometry
+
+    @property
+    def parameters(self) -> DetectorParameters:
+        return self._parameters
+
+    @property
+    def k(self) -> float:
+        return 2 * np.pi / self._parameters.wavelength
+
+    @property
+    def q(self) -> np.ndarray:
+        if self._q is None:
+            self._q = _read_only(np.hypot(self.q_xy, self.q_z))
+        return self._q
+
+    @property
+    def q_xy(self) -> np.ndarray:
+        if self._q_xy is None:
+            self._calculate_maps()
+        return self._q_xy
+
+    @property
+    def q_z(self) -> np.ndarray:
+        if self._q_z is None:
+            self._calculate_maps()
+        return self._q_z
+
+    @property
+    def chi(self) -> np.ndarray:
+        if self._chi is None:
+            self._chi = _read_only(np.arctan2(self.q_xy, self.q_z))
+        return self._chi
+
+    def __init__(self, geometry: Geometry, parameters: DetectorParameters):
+        self._geometry = geometry
+        self._parameters = parameters
+        self._q = self._q_xy = self._q_z = self._chi = self._solid_angle = None
+        self._reciprocal_key = self._reciprocal_maps = None
+
+    def r_to_q(self, r):
+        two_theta = np.arctan(np.asarray(r) * self._parameters.pixel_size / self._parameters.distance)
+        return 2 * self.k * np.sin(two_theta / 2)
+
+    def q_to_r(self, q):
+        sin_theta = np.clip(np.asarray(q) / 2 / self.k, -1, 1)
+        two_theta = np.clip(2 * np.arcsin(sin_theta), -np.pi / 2 + 1e-6, np.pi / 2 - 1e-6)
+        return np.tan(two_theta) * self._parameters.distance / self._parameters.pixel_size
+
+    @property
+    def solid_angle(self) -> np.ndarray:
+        """
+        Solid angles of pixels relative to the pixel closest to the sample.
+        """
+        if self._solid_angle is None:
+            x, y, z = self._get_lab_coordinates()
+            plane_distance = np.float32(self._parameters.distance * np.cos(np.deg2rad(self._parameters.tilt)))
+            # cos of the incidence angle on the detector divided by squared distance
+            solid_angle = np.sqrt(x ** 2 + y ** 2 + z ** 2)
+            np.divide(plane_distance, solid_angle, out=solid_angle)
+            solid_angle **= 3
+            self._solid_angle = _read_only(solid_angle)
+        return self._solid_angle
+
+    def get_polarization(self, factor: float) -> np.ndarray:
+        """
+        Polarization factor map for the given degree of linear polarization of the beam
+        (1 - horizontal, -1 - vertical, 0 - unpolarized).
+        """
+        x, y, z = self._get_lab_coordinates()
+        r2 = x ** 2 + y ** 2
+        cos2_two_theta = z ** 2
+        cos2_two_theta /= r2 + z ** 2
+        # factor * cos(2 chi) * sin(2 theta) ** 2, chi - azimuth around the beam
+        polarization = np.subtract(x ** 2, y ** 2)
+        np.divide(polarization, r2, out=polarization, where=r2 > 0)
+        polarization *= np.float32(-factor)
+        polarization *= 1 - cos2_two_theta
+        polarization += 1
+        polarization += cos2_two_theta
+        polarization *= np.float32(0.5)
+        return polarization
+
+    def _get_lab_coordinates(self):
+        # laboratory coordinates of pixels [mm]: z along the direct beam, y upwards
+        p = self._parameters
+        tilt = np.deg2rad(p.tilt)
+        x = self._geometry.xx * np.float32(p.pixel_size)
+        y = self._geometry.yy * np.float32(-p.pixel_size)
+        z = y * np.float32(np.sin(tilt)) + np.float32(p.distance)
+        y *= np.float32(np.cos(tilt))
+        return x, y, z
+
+    def _calculate_maps(self):
+        alpha_i = np.deg2rad(self._parameters.incidence_angle)
+        # maps are calculated in float64, as q_xy of small angles is a difference of close values
+        u_x, u_y, u_z = (c.astype(np.float64) for c in self._get_lab_coordinates())
+        norm = np.sqrt(u_x ** 2 + u_y ** 2 + u_z ** 2)
+        u_x /= norm
+        u_y /= norm
+        u_z /= norm
+        del norm
+
+        # k_f is rotated by the incidence angle about the x axis to the sample frame,
+        # where the incident beam is k * (0, -sin(alpha_i), cos(alpha_i))
+        k = self.k
+        sin_alpha_f = u_y * np.cos(alpha_i) - u_z * np.sin(alpha_i)
+        s_z = u_y * np.sin(alpha_i) + u_z * np.cos(alpha_i)
+        del u_y, u_z
+        s_z -= np.cos(alpha_i)
+        q_xy = np.hypot(u_x, s_z)
+        q_xy *= np.sign(u_x)
+        q_xy *= k
+        del u_x, s_z
+        sin_alpha_f += np.sin(alpha_i)
+        sin_alpha_f *= k
+        self._q_xy = _read_only(q_xy.astype(np.float32))
+        self._q_z = _read_only(sin_alpha_f.astype(np.float32))
+
+    def get_reciprocal_maps(self, q_xy_size: int, q_z_size: int):
+        """
+        Returns q_xy and q_z axes and float32 maps of pixel coordinates for cv2.remap
+        to reshape an image to the regular (q_z, q_xy) grid covering the detector.
+        Maps of the last requested shape are kept.
+        """
+        key = (q_xy_size, q_z_size)
+        if self._reciprocal_key != key:
+            self._reciprocal_maps = self._calculate_reciprocal_maps(q_xy_size, q_z_size)
+            self._reciprocal_key = key
+        return self._reciprocal_maps
+
+    def remap_reciprocal(self, image: np.ndarray, q_xy_size: int, q_z_size: int,
+                         flag: int = cv2.INTER_LINEAR):
+        """
+        Returns q_xy axis, q_z axis and the image in reciprocal space (q_z rows ascending).
+        Points not covered by the detector are zeros.
+        """
+        q_xy, q_z, map_x, map_y = self.get_reciprocal_maps(q_xy_size, q_z_size)
+        return q_xy, q_z, cv2.remap(np.asarray(image, dtype=np.float32), map_x, map_y, flag)
+
+    def _calculate_reciprocal_maps(self, q_xy_size: int, q_z_size: int):
+        p = self._parameters
+        k, tilt, alpha_i = self.k, np.deg2rad(p.tilt), np.deg2rad(p.incidence_angle)
+        q_xy = np.linspace(float(self.q_xy.min()), float(self.q_xy.max()), q_xy_size)
+        q_z = np.linspace(float(self.q_z.min()), float(self.q_z.max()), q_z_size)
+
+        # inverse of the forward transformation for the regular grid:
+        # unit k_f in the sample frame (s_x, sin(alpha_f), s_z) is rotated back to the laboratory frame
+        sin_alpha_f = np.clip(q_z[:, np.newaxis] / k - np.sin(alpha_i), -1, 1)
+        cos2_alpha_f = 1 - sin_alpha_f ** 2
+        s_z = (cos2_alpha_f + np.cos(alpha_i) ** 2 - (q_xy[np.newaxis, :] / k) ** 2) / (2 * np.cos(alpha_i))
+        s_x2 = cos2_alpha_f - s_z ** 2
+        unreachable = s_x2 < 0
+        u_x = np.sqrt(s_x2.clip(0)) * np.sign(q_xy[np.newaxis, :])
+        u_y = sin_alpha_f * np.cos(alpha_i) + s_z * np.sin(alpha_i)
+        u_z = s_z * np.cos(alpha_i) - sin_alpha_f * np.sin(alpha_i)
+
+        # intersection with the tilted detector plane
+        normal = u_z * np.cos(tilt) - u_y * np.sin(tilt)
+        unreachable |= normal <= 0
+        t = p.distance * np.cos(tilt) / np.where(unreachable, 1, normal)
+        x = t * u_x / p.pixel_size
+        y = (t * u_y * np.cos(tilt) + (t * u_z - p.distance) * np.sin(tilt)) / p.pixel_size
+
+        center = self._geometry.beam_center
+        map_x = (x + center[1]).astype(np.float32)
+        map_y = (center[0] - y).astype(np.float32)
+        map_x[unreachable] = map_y[unreachable] = -1
+        return q_xy, q_z, map_x, map_y
+
+    @classmethod
+    def get(cls, geometry: Geometry, parameters: DetectorParameters) -> 'DetectorGeometry':
+        return _get_cached_detector_geometry(geometry, parameters)
+
+
+@lru_cache(maxsize=4)
+def _get_cached_detector_geometry(geometry: Geometry, parameters: DetectorParameters) -> DetectorGeometry:
+    return DetectorGeometry(geometry, parameters)
+
+
+CORRECTIONS_CONFIG_NAME = 'Intensity corrections'
+
+
+class CorrectionParameters(NamedTuple):
+    """
+    Fields:
+        solid_angle: bool - normalize intensities by the solid angles of pixels
+        polarization_factor: float - degree of linear polarization of the beam, None to skip
+        flat_field: str - path to the flat field image, None to skip
+        dark_current: str - path to the dark current image, None to skip
+    """
+    solid_angle: bool = False
+    polarization_factor: float = None
+    flat_field: str = None
+    dark_current: str = None
+
+    @classmethod
+    def from_dict(cls, parameters: dict or None) -> 'CorrectionParameters':
+        return cls(**{k: v for k, v in (parameters or {}).items() if k in cls._fields})
+
+    def __bool__(self):
+        return any(x not in (None, False, '') for x in self)
+
+
+class IntensityCorrection(object):
+    """
+    Dark current, flat field, solid angle and polarization corrections folded into
+    a dark map and a single multiplicative float32 map computed once per geometry,
+    transformations and parameters. Correction of a frame is (image - dark) * factor
+    calculated in place. Pixels with nonpositive flat field are set to zero.
+    Should be initialized by the class method '.get()'.
+    """
+
+    @property
+    def dark(self) -> np.ndarray or None:
+        return self._dark
+
+    @property
+    def factor(self) -> np.ndarray or None:
+        return self._factor
+
+    def __init__(self, parameters: CorrectionParameters, shape: tuple,
+                 transformations: tuple = (), detector_geometry: 'DetectorGeometry' = None):
+        self._dark = self._factor = None
+        if parameters.dark_current:
+            self._dark = _read_only(self._check_shape(_transform(
+                _read_calibration_image(parameters.dark_current), transformations), shape, 'Dark current'))
+        if parameters.flat_field:
+            flat = self._check_shape(_transform(_read_calibration_image(parameters.flat_field), transformations),
+                                     shape, 'Flat field')
+            self._multiply_by_inverse(flat)
+        if parameters.solid_angle or parameters.polarization_factor is not None:
+            if detector_geometry is None:
+                logger.warning('Solid angle and polarization corrections require detector geometry.')
+            else:
+                if parameters.solid_angle:
+                    self._multiply_by_inverse(detector_geometry.solid_angle)
+                if parameters.polarization_factor is not None:
+                    self._multiply_by_inverse(detector_geometry.get_polarization(parameters.polarization_factor))
+        if self._factor is not None:
+            _read_only(self._factor)
+
+    def apply(self, image: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        """
+        Returns corrected float32 image, out buffer can be reused for series of frames.
+        """
+        if self._dark is not None:
+            out = np.subtract(image, self._dark, out=out, dtype=np.float32)
+        elif out is None:
+            out = np.array(image, dtype=np.float32)
+        else:
+            np.copyto(out, image, casting='unsafe')
+        if self._factor is not None:
+            out *= self._factor
+        return out
+
+    def _multiply_by_inverse(self, arr: np.ndarray):
+        inverse = np.zeros(arr.shape, dtype=np.float32)
+        np.divide(1, arr, out=inverse, where=arr > 0)
+        if self._factor is None:
+            self._factor = inverse
+        else:
+            self._factor *= inverse
+
+    @staticmethod
+    def _check_shape(arr: np.ndarray, shape: tuple, name: str) -> np.ndarray:
+        if arr.shape != tuple(shape):
+            raise ValueError(f'{name} image shape {arr.shape} does not match image shape {tuple(shape)}')
+        return arr.astype(np.float32)
+
+    @classmethod
+    def get(cls, parameters: CorrectionParameters, shape: tuple, transformations: tuple = (),
+            detector_geometry: 'DetectorGeometry' = None) -> 'IntensityCorrection':
+        # modification times of calibration files invalidate the cached correction
+        mtimes = _get_mtime(parameters.flat_field), _get_mtime(parameters.dark_current)
+        return _get_cached_correction(parameters, tuple(shape), tuple(transformations), detector_geometry, mtimes)
+
+
+@lru_cache(maxsize=4)
+def _get_cached_correction(parameters: CorrectionParameters, shape: tuple, transformations: tuple,
+                           detector_geometry: 'DetectorGeometry' or None, mtimes: tuple) -> IntensityCorrection:
+    return IntensityCorrection(parameters, shape, transformations, detector_geometry)
+
+
+def _read_calibration_image(filepath: str) -> np.ndarray:
+    return _read_cached_calibration_image(filepath, _get_mtime(filepath))
+
+
+@lru_cache(maxsize=4)
+def _read_cached_calibration_image(filepath: str, mtime: float or None) -> np.ndarray:
+    return _read_only(np.asarray(get_image_from_path(filepath)))
+
+
+def _get_mtime(filepath: str or None) -> float or None:
+    try:
+        return os.stat(filepath).st_mtime
+    except (OSError, TypeError):
+        return
+
+
+def _transform(image: np.ndarray, transformations: tuple) -> np.ndarray:
+    for name in transformations:
+        image = getattr(ImageTransformation, name)(image)
+    return image
+
+
+MASK_CONFIG_NAME = 'Detector mask'
+
+
+class MaskParameters(NamedTuple):
+    """
+    Fields:
+        mask_file: str - path to an image with nonzero values at masked pixels, None to skip
+        min_intensity: float - pixels below are masked (detector gaps), None to skip
+        max_intensity: float - pixels above are masked (hot pixels), None to skip
+        Thresholds are applied once to the image current when the parameters are set
+        and the resulting mask is kept for the following frames of the same shape.
+        horizon: bool - mask pixels below the sample horizon (requires detector geometry)
+    """
+    mask_file: str = None
+    min_intensity: float = None
+    max_intensity: float = None
+    horizon: bool = False
+
+    @classmethod
+    def from_dict(cls, parameters: dict or None) -> 'MaskParameters':
+        return cls(**{k: v for k, v in (parameters or {}).items() if k in cls._fields})
+
+    def __bool__(self):
+        return bool(self.mask_file or self.horizon or
+                    self.min_intensity is not None or self.max_intensity is not None)
+
+
+class DetectorMask(object):
+    """
+    Boolean mask of excluded pixels (True - masked) stored as packed bits.
+    Masks are immutable and identified by the key calculated from their content,
+    so that binnings, integration matrices and remap weights folding the mask in
+    are cached per mask and reused for all frames.
+    """
+
+    @property
+    def shape(self) -> tuple:
+        return self._shape
+
+    @property
+    def key(self) -> bytes:
+        return self._key
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def array(self) -> np.ndarray:
+        """
+        Unpacked read-only boolean mask, calculated on every call.
+        """
+        mask = np.unpackbits(self._packed, count=int(np.prod(self._shape))).view(bool)
+        return _read_only(mask.reshape(self._shape))
+
+    def __init__(self, mask: np.ndarray):
+        mask = np.asarray(mask, dtype=bool)
+        self._shape = mask.shape
+        self._packed = _read_only(np.packbits(mask))
+        self._count = int(np.count_nonzero(mask))
+        self._key = hashlib.sha1(self._packed.tobytes() + str(self._shape).encode()).digest()
+
+    def __or__(self, other: 'DetectorMask' or None) -> 'DetectorMask':
+        if other is None:
+            return self
+        if other.shape != self._shape:
+            raise ValueError(f'Mask shapes {self._shape} and {other.shape} do not match')
+        return DetectorMask(self.array | other.array)
+
+    __ror__ = __or__
+
+    def __bool__(self):
+        return self._count > 0
+
+    @classmethod
+    def from_file(cls, filepath: str, shape: tuple, transformations: tuple = ()) -> 'DetectorMask':
+        mask = _transform(_read_calibration_image(filepath), transformations)
+        if mask.shape != tuple(shape):
+            raise ValueError(f'Mask image shape {mask.shape} does not match image shape {tuple(shape)}')
+        return cls(mask != 0)
+
+    @classmethod
+    def from_threshold(cls, image: np.ndarray, min_intensity: float = None,
+                       max_intensity: float = None) -> 'DetectorMask':
+        mask = np.zeros(image.shape, dtype=bool)
+        if min_intensity is not None:
+            mask |= image < min_intensity
+        if max_intensity is not None:
+            mask |= image > max_intensity
+        return cls(mask)
+
+    @classmethod
+    def from_horizon(cls, detector_geometry: 'DetectorGeometry') -> 'DetectorMask':
+        # exit angle is negative below the sample horizon
+        alpha_i = np.deg2rad(detector_geometry.parameters.incidence_angle)
+        return cls(detector_geometry.q_z < detector_geometry.k * np.sin(alpha_i))
+
+    @classmethod
+    def from_rois(cls, geometry: Geometry, rois: list, q_to_r=None) -> 'DetectorMask':
+        """
+        Masks ring segments of RoiParameters, q_to_r converts radii [radial units] to pixels.
+        """
+        mask = np.zeros(geometry.shape, dtype=bool)
+        q_to_r = q_to_r or np.asarray
+        for roi in rois:
+            r1, r2 = q_to_r([roi.radius - roi.width / 2, roi.radius + roi.width / 2])
+            ring = (geometry.rr >= r1) & (geometry.rr <= r2)
+            angle_std = roi.angle_std if roi.angle_std is not None else 360
+            if angle_std < 360:
+                angle = np.deg2rad(roi.angle or 0)
+                # angular distance to the segment center wrapped to [-pi, pi)
+                distance = np.abs((geometry.phi - angle + np.pi) % (2 * np.pi) - np.pi)
+                ring &= distance <= np.deg2rad(angle_std) / 2
+            mask |= ring
+        return cls(mask)
+
+
+RADIAL_BINNING_CONFIG_NAME = 'Radial binning'
+
+
+class RadialSector(NamedTuple):
+    """
+    Azimuthal wedge chi_min <= |chi| < chi_max [deg], where chi is measured from the q_z axis,
+    so that a sector includes both sides of the image.
+    """
+    name: str
+    chi_min: float
+    chi_max: float
+
+
+# centers of the standard GIWAXS sectors [deg]
+GIWAXS_SECTORS = (('Out-of-plane', 0.), ('45°', 45.), ('In-plane', 90.))
+
+
+class RadialBinningParameters(NamedTuple):
+    """
+    Fields:
+        bins_number: int - number of bins, None for bins about one pixel wide
+        r_min: float - lower edge of the first bin in radial units, None for the nearest pixel
+        r_max: float - upper edge of the last bin in radial units, None for the farthest pixel
+        log_scale: bool - logarithmic bin spacing
+        pixel_splitting: bool - split pixels between bins (linear spacing only)
+        error_bars: bool - show Poisson standard errors
+        sector_width: float - width of out-of-plane, 45° and in-plane sectors [deg], None for no sectors
+    """
+    bins_number: int = None
+    r_min: float = None
+    r_max: float = None
+    log_scale: bool = False
+    pixel_splitting: bool = False
+    error_bars: bool = False
+    sector_width: float = None
+
+    @classmethod
+    def from_dict(cls, parameters: dict or None) -> 'RadialBinningParameters':
+        """
+        Raises ValueError for parameters which do not define nonempty bins.
+        """
+        params = cls(**{k: v for k, v in (parameters or {}).items() if k in cls._fields})
+        if params.bins_number is not None and params.bins_number <= 0:
+            raise ValueError(f'Number of bins should be positive, got {params.bins_number}.')
+        if params.r_min is not None and params.r_max is not None and params.r_min >= params.r_max:
+            raise ValueError(f'Minimum radius {params.r_min} should be less than maximum radius {params.r_max}.')
+        if params.log_scale and params.r_min is not None and params.r_min <= 0:
+            raise ValueError(f'Minimum radius should be positive for logarithmic bins, got {params.r_min}.')
+        if params.sector_width is not None and params.sector_width < 0:
+            raise ValueError(f'Sector width should not be negative, got {params.sector_width}.')
+        return params
+
+    @property
+    def one_pixel_bins(self) -> bool:
+        return (self.bins_number, self.r_min, self.r_max, self.log_scale, self.pixel_splitting) == \
+               (None, None, None, False, False)
+
+    @property
+    def sectors(self) -> tuple:
+        if not self.sector_width:
+            return ()
+        half_width = self.sector_width / 2
+        return tuple(RadialSector(name, max(center - half_width, 0.), center + half_width)
+                     for name, center in GIWAXS_SECTORS)
+
+
+class RadialProfile(NamedTuple):
+    """
+    Fields:
+        x: np.ndarray - bin centers in radial units
+        y: np.ndarray - mean intensities over the full azimuth
+        errors: np.ndarray - Poisson standard errors of y
+        sectors: tuple - RadialSector instances
+        sector_y: np.ndarray - 2d (sector, bin) mean intensities, None without sectors
+        sector_errors: np.ndarray - Poisson standard errors of sector_y
+    """
+    x: np.ndarray
+    y: np.ndarray
+    errors: np.ndarray
+    sectors: tuple = ()
+    sector_y: np.ndarray = None
+    sector_errors: np.ndarray = None
 
 
 class ImageScale(NamedTuple):
@@ -96,6 +976,56 @@ class Image(object):
     def image(self):
         return self._image
 
+    @property
+    def corrected_image(self):
+        """
+        Image with intensity corrections applied, calculated on request.
+        """
+        if self._corrected_image is None and self._image is not None:
+            self._corrected_image = self._correct(self._image)
+        return self._corrected_image
+
+    @property
+    def correction_parameters(self):
+        return self._correction_parameters
+
+    @property
+    def radial_binning_parameters(self):
+        return self._radial_binning_parameters
+
+    @property
+    def mask_parameters(self):
+        return self._mask_parameters
+
+    @property
+    def mask(self) -> 'DetectorMask' or None:
+        """
+        Detector mask combined from the mask file, thresholds, drawn rings and horizon.
+        Calculated on request and kept until the parameters, the image shape or transformations
+        change, and with the horizon mask - until the beam center or detector geometry change.
+        The horizon of the previous beam center is kept for beam center previews.
+        """
+        if self._image is None:
+            return
+        key = self.shape, tuple(self.transformation.transformation_list)
+        horizon_key = None
+        if self._mask_parameters.horizon:
+            if self._geometry_preview and self._mask_key is not None and self._mask_key[0] == key:
+                horizon_key = self._mask_key[1]
+            else:
+                horizon_key = self._beam_center, self._detector_parameters
+        if (key, horizon_key) != self._mask_key:
+            if key != self._base_mask_key:
+                self._base_mask = self._get_base_mask(*key)
+                self._base_mask_key = key
+            self._mask = self._base_mask
+            horizon_mask = self._get_horizon_mask() if horizon_key is not None else None
+            if horizon_mask is not None:
+                self._mask = horizon_mask | self._mask
+            self._mask = self._mask or None
+            self._mask_key = key, horizon_key
+        return self._mask
+
     @property
     def shape(self):
         return self._image.shape if self._image is not None else None
@@ -116,6 +1046,14 @@ class Image(object):
     def phi(self):
         return self.geometry.phi
 
+    @property
+    def r_range(self):
+        return self.geometry.r_range
+
+    @property
+    def phi_range(self):
+        return self.geometry.phi_range
+
     @property
     def xx(self):
         return self.geometry.xx
@@ -128,12 +1066,22 @@ class Image(object):
     def intensity_limits(self):
         return self._intensity_limits
 
+    @property
+    def detector_geometry(self):
+        return self._detector_geometry
+
+    @property
+    def detector_parameters(self):
+        return self._detector_parameters
+
     @property
     def scale(self):
         return self._scale.scale
 
     @property
     def scale_unit(self):
+        if self._detector_parameters:
+            return 'Å⁻¹'
         return self._scale.unit
 
     @property
@@ -155,13 +1103,33 @@ class Image(object):
     def __init__(self):
         self._source_image = None
         self._image = None
+        self._corrected_image = None
+        self._correction_parameters = CorrectionParameters.from_dict(read_config(CORRECTIONS_CONFIG_NAME))
+        try:
+            self._radial_binning_parameters = RadialBinningParameters.from_dict(
+                read_config(RADIAL_BINNING_CONFIG_NAME))
+        except ValueError as err:
+            logger.error(f'Radial binning config is ignored: {err}')
+            self._radial_binning_parameters = RadialBinningParameters()
+        self._mask_parameters = MaskParameters.from_dict(read_config(MASK_CONFIG_NAME))
+        self._mask = self._mask_key = None
+        # mask from the file, thresholds and drawn rings which does not depend on geometry
+        self._base_mask = self._base_mask_key = None
+        # masks drawn with rois and thresholded from one frame with the (shape, transformations)
+        # they were calculated for
+        self._drawn_mask = self._drawn_mask_key = None
+        self._threshold_mask = self._threshold_mask_key = None
         self.transformation = ImageTransformation()
         self._intensity_limits = None
         self._keep_limits = True
         self.save_transformation = False
         self._beam_center = (0, 0)
+        self._geometry_preview = False
         self._geometry = Geometry()
         self._scale = ImageScale()
+        self._detector_parameters = DetectorParameters.from_dict(read_config(DETECTOR_CONFIG_NAME))
+        self._detector_geometry = None
+        self._previous_q_to_r = self._get_q_to_r()
         self._ring_angles = RingAngles()
         self._interpolation = Interpolation()
 
@@ -172,9 +1140,13 @@ class Image(object):
         else:
             self._keep_limits = True
 
-    def set_beam_center(self, beam_center: tuple):
+    def set_beam_center(self, beam_center: tuple, preview: bool = False):
+        """
+        Preview beam centers are set while the beam center is being dragged.
+        """
         if beam_center:
             self._beam_center = beam_center
+            self._geometry_preview = preview
             self.update_geometry()
 
     def add_transformation(self, name):
@@ -204,34 +1176,238 @@ class Image(object):
         if self._image is None or self._beam_center is None:
             return
         self._geometry = Geometry.get(self.shape, self._beam_center)
-        phi = self._geometry.phi
+        phi_min, phi_max = self._geometry.phi_range
         self._ring_angles = RingAngles(
-            angle=(phi.max() + phi.min()) / 2 * 180 / np.pi,
-            angle_std=(phi.max() - phi.min()) * 180 / np.pi
+            angle=(phi_max + phi_min) / 2 * 180 / np.pi,
+            angle_std=(phi_max - phi_min) * 180 / np.pi
         )
+        self._update_detector_geometry()
         self.interpolation.set_geometry(self.geometry)
 
+    def _update_detector_geometry(self):
+        if self._detector_parameters and self._geometry.shape:
+            self._detector_geometry = DetectorGeometry.get(self._geometry, self._detector_parameters)
+        else:
+            self._detector_geometry = None
+        self._corrected_image = None
+        self.interpolation.set_detector_geometry(self._detector_geometry)
+
+    def set_correction_parameters(self, parameters: CorrectionParameters):
+        self._correction_parameters = parameters
+        self._corrected_image = None
+
+    def set_mask_parameters(self, parameters: MaskParameters):
+        self._mask_parameters = parameters
+        self._threshold_mask = self._threshold_mask_key = None
+        self._base_mask_key = self._mask_key = None
+
+    def add_mask_rois(self, rois: list):
+        """
+        Adds ring segments of rois to the drawn mask.
+        """
+        if self._image is None or not rois:
+            return
+        key = self.shape, tuple(self.transformation.transformation_list)
+        drawn_mask = DetectorMask.from_rois(self._geometry, rois, self.q_to_r)
+        if self._drawn_mask is not None and self._drawn_mask_key == key:
+            drawn_mask = drawn_mask | self._drawn_mask
+        self._drawn_mask, self._drawn_mask_key = drawn_mask, key
+        self._base_mask_key = self._mask_key = None
+
+    def clear_drawn_mask(self):
+        self._drawn_mask = self._drawn_mask_key = None
+        self._base_mask_key = self._mask_key = None
+
+    def _get_horizon_mask(self) -> 'DetectorMask' or None:
+        if self._detector_geometry is None:
+            logger.warning('Horizon mask requires detector geometry.')
+            return
+        return DetectorMask.from_horizon(self._detector_geometry)
+
+    def _get_base_mask(self, shape: tuple, transformations: tuple) -> 'DetectorMask' or None:
+        params = self._mask_parameters
+        mask = None
+        if params.mask_file:
+            try:
+                mask = DetectorMask.from_file(params.mask_file, shape, transformations)
+            except (OSError, ValueError) as err:
+                logger.exception(err)
+        if params.min_intensity is not None or params.max_intensity is not None:
+            if self._threshold_mask_key != (shape, transformations):
+                self._threshold_mask = DetectorMask.from_threshold(
+                    self._image, params.min_intensity, params.max_intensity)
+                self._threshold_mask_key = shape, transformations
+            mask = self._threshold_mask | mask
+        if self._drawn_mask is not None:
+            if self._drawn_mask_key == (shape, transformations):
+                mask = self._drawn_mask | mask
+            else:
+                logger.warning('Drawn mask does not match the image and is removed.')
+                self._drawn_mask = self._drawn_mask_key = None
+        return mask
+
+    def _correct(self, image: np.ndarray) -> np.ndarray:
+        if not self._correction_parameters:
+            return image
+        try:
+            correction = IntensityCorrection.get(
+                self._correction_parameters, image.shape,
+                self.transformation.transformation_list, self._detector_geometry)
+            return correction.apply(image)
+        except (OSError, ValueError) as err:
+            logger.exception(err)
+            return image
+
     def set_scale(self, scale: float, unit: str = ''):
+        self._previous_q_to_r = self._get_q_to_r()
         self._scale = ImageScale(scale, unit, self.scale)
         self._interpolation.set_scale(scale)
 
+    def set_detector_parameters(self, parameters: DetectorParameters or None):
+        """
+        Detector parameters replace the linear scale by the reciprocal space conversion,
+        None returns to the linear scale.
+        """
+        self._previous_q_to_r = self._get_q_to_r()
+        self._detector_parameters = parameters
+        self._update_detector_geometry()
+
+    def r_to_q(self, r):
+        """
+        Converts radius [pixels] to the scaled radial units (q if detector parameters are set).
+        """
+        if self._detector_geometry:
+            return self._detector_geometry.r_to_q(r)
+        return np.asarray(r) * self.scale
+
+    def q_to_r(self, q):
+        if self._detector_geometry:
+            return self._detector_geometry.q_to_r(q)
+        return np.asarray(q) / self.scale
+
+    def rescale(self, q):
+        """
+        Converts radial values from the units before the last scale change to the current units.
+        """
+        return self.r_to_q(self._previous_q_to_r(q))
+
+    def _get_q_to_r(self):
+        detector_geometry, scale = self._detector_geometry, self.scale
+        if detector_geometry:
+            return detector_geometry.q_to_r
+        return lambda q: np.asarray(q) / scale
+
     def set_interpolation_parameters(self, parameters: dict):
         self.interpolation.set_parameters(parameters)
 
     def interpolate(self):
-        return self.interpolation.interpolate(self.image)
+        self.interpolation.set_mask(self.mask)
+        return self.interpolation.interpolate(self.corrected_image)
+
+    def interpolate_region(self, r_range: tuple, phi_range: tuple):
+        self.interpolation.set_mask(self.mask)
+        return self.interpolation.interpolate_region(self.corrected_image, r_range, phi_range)
+
+    def set_radial_binning_parameters(self, parameters: RadialBinningParameters):
+        self._radial_binning_parameters = parameters
+
+    def get_radial_profile(self, step: int = 1) -> RadialProfile or None:
+        """
+        Returns radial profile with bin centers in radial units and Poisson standard errors.
+        Profiles of sectors are calculated in the same pass (without pixel splitting).
+        Profiles of subsampled images (step > 1) are calculated without intensity corrections.
+        """
+        if self._image is None or not self._geometry.shape:
+            return
+        params = self._radial_binning_parameters
+        image = self.corrected_image if step == 1 else self._image[::step, ::step]
+        sectors = params.sectors
+        edges = centers = None
+        if not params.one_pixel_bins:
+            edges, centers = self._get_radial_bins(params)
+        if (params.pixel_splitting and not params.log_scale and not sectors
+                and step == 1 and centers.size > 1):
+            integration_matrix = get_integration_matrix(
+                self._geometry, centers.size, 1, r_range=(centers[0], centers[-1]),
+                phi_range=self.phi_range, detector_geometry=self._detector_geometry, mask=self.mask)
+            profile, errors = integration_matrix.integrate(image, errors=True)
+            return RadialProfile(self.r_to_q(centers), profile.ravel(), errors.ravel())
+        binning = self._geometry.get_radial_binning(step, edges, sectors, self._detector_geometry, self.mask)
+        if centers is None:
+            centers = np.arange(binning.size) + 0.5
+        if not sectors:
+            return RadialProfile(self.r_to_q(centers), *binning.get_profile(image, errors=True))
+        (profile, errors), (sector_profiles, sector_errors) = binning.get_sector_profiles(image, errors=True)
+        return RadialProfile(self.r_to_q(centers), profile, errors, sectors, sector_profiles, sector_errors)
+
+    def _get_radial_bins(self, params: RadialBinningParameters):
+        """
+        Returns edges and centers of radial bins [pixels]. Bins are uniform
+        (or logarithmic) in q if detector parameters are set and in pixels otherwise.
+        """
+        if self._detector_geometry:
+            to_bin_units, from_bin_units = self._detector_geometry.r_to_q, self._detector_geometry.q_to_r
+        else:
+            to_bin_units = from_bin_units = np.asarray
+
+        r_min, r_max = self.r_range
+        if params.r_min is not None:
+            r_min = float(self.q_to_r(params.r_min))
+        if params.r_max is not None:
+            r_max = float(self.q_to_r(params.r_max))
+        if params.log_scale:
+            r_min = max(r_min, 1.)
+        # explicit limits are validated by RadialBinningParameters, only a limit taken
+        # from the image range can be on the wrong side of the other one
+        r_max = max(r_max, r_min + 1.)
+        bins_number = params.bins_number or int(np.ceil(r_max - r_min))
+
+        lower, upper = to_bin_units(r_min), to_bin_units(r_max)
+        if params.log_scale:
+            edges = np.geomspace(lower, upper, bins_number + 1)
+            centers = np.sqrt(edges[1:] * edges[:-1])
+        else:
+            edges = np.linspace(lower, upper, bins_number + 1)
+            centers = (edges[1:] + edges[:-1]) / 2
+        return from_bin_units(edges), from_bin_units(centers)
 
     def get_angular_profile(self, r1: float, r2: float):
-        return self.interpolation.phi_axis, self.interpolation.get_angular_profile(r1, r2)
+        """
+        Returns angles [deg] and mean intensities of the ring between radii r1 and r2 in radial units.
+        Pixels in the ring are binned directly, without polar interpolation of the image.
+        """
+        if self._image is None or not self._geometry.shape:
+            return
+        r1, r2 = sorted(float(r) for r in self.q_to_r([r1, r2]))
+        phi, profile = self._geometry.get_angular_binning(self.mask).get_profile(self.corrected_image, r1, r2)
+        return np.rad2deg(phi), profile
 
 
-def get_limits(image: np.ndarray, sigma_factor: float = 2):
+def get_limits(image: np.ndarray, sigma_factor: float = 2, mask: np.ndarray = None):
+    """
+    Masked pixels (True in the mask) are ignored, returns None if all pixels are masked.
+    Without sigma_factor, limits are the minimum and maximum intensities.
+    """
+    if mask is not None:
+        image = image[~mask]
+    if not image.size:
+        return
+    if not sigma_factor:
+        return image.min(), image.max()
     m, s = image.mean(), image.std() * sigma_factor
     return max((m - s, image.min())), min((m + s, image.max()))
 
 
-def normalize_image(image: np.ndarray, sigma_factor: float = None):
+def normalize_image(image: np.ndarray, sigma_factor: float = None, mask: np.ndarray = None):
+    """
+    Limits are calculated from valid pixels only, masked pixels are set to zero.
+    """
+    limits = get_limits(image, sigma_factor, mask)
+    if limits is None:
+        return np.zeros(image.shape)
     if sigma_factor:
-        image = np.clip(image, *get_limits(image, sigma_factor))
-    image = (image - image.min()) / image.max()
+        image = np.clip(image, *limits)
+    image = (image - limits[0]) / limits[1]
+    if mask is not None:
+        image[mask] = 0
     return image
@@ -0,0 +1 @@
+from .integration import IntegrationMatrix, get_integration_matrix, get_integration_cache
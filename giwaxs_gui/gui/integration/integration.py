@@ -0,0 +1,212 @@
+import logging
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from ...cache import LRUCache, CACHE_CONFIG_NAME
+from ...config import read_config
+
+logger = logging.getLogger(__name__)
+
+__all__ = ['IntegrationMatrix', 'get_integration_matrix', 'get_integration_cache']
+
+_MB = 2 ** 20
+
+
+class IntegrationMatrix(object):
+    """
+    Sparse matrix distributing detector pixels between (phi, r) bins with pixel splitting.
+    Each pixel is represented by the bounding box of its corners in (r, phi) coordinates,
+    its intensity is split between the bins proportionally to their overlap with the box.
+    Pixels containing the beam center or crossing the phi = ±pi cut are not split in phi.
+    With detector geometry, radial bins are uniform in q instead of pixels.
+    Masked pixels are dropped from the matrix, bins without valid pixels are zeros.
+    Integration of an image is a single sparse matrix-vector product,
+    bins get the mean intensity of the pixels weighted by their fractions.
+    Should be initialized by get_integration_matrix function, which caches matrices per geometry.
+    """
+
+    @property
+    def r(self) -> np.ndarray:
+        return self._r
+
+    @property
+    def p(self) -> np.ndarray:
+        return self._p
+
+    @property
+    def shape(self) -> tuple:
+        return self._p.size, self._r.size
+
+    @property
+    def matrix(self) -> csr_matrix:
+        return self._matrix
+
+    @property
+    def nbytes(self) -> int:
+        return (self._matrix.data.nbytes + self._matrix.indices.nbytes +
+                self._matrix.indptr.nbytes + self._norm.nbytes)
+
+    def __init__(self, geometry: 'Geometry', r_size: int, phi_size: int,
+                 r_range: tuple, phi_range: tuple, detector_geometry: 'DetectorGeometry' = None,
+                 mask: 'DetectorMask' = None):
+        r_lo, r_hi, p_lo, p_hi = _get_pixel_boxes(geometry)
+        if detector_geometry:
+            # r_to_q is monotonic, so the boxes are mapped by their edges
+            r_range = detector_geometry.r_to_q(r_range)
+            r_lo, r_hi = detector_geometry.r_to_q(r_lo), detector_geometry.r_to_q(r_hi)
+
+        r_start, r_width = _get_bins(r_range, r_size)
+        p_start, p_width = _get_bins(phi_range, phi_size)
+        self._r = r_start + (np.arange(r_size) + 0.5) * r_width
+        self._p = p_start + (np.arange(phi_size) + 0.5) * p_width
+        if detector_geometry:
+            self._r = detector_geometry.q_to_r(self._r)
+
+        r_pixels, r_bins, r_fractions = _split_pixels(r_lo, r_hi, r_start, r_width, r_size)
+        p_pixels, p_bins, p_fractions = _split_pixels(p_lo, p_hi, p_start, p_width, phi_size)
+        del r_lo, r_hi, p_lo, p_hi
+
+        pixels, bins, fractions = _combine_splits(
+            (r_pixels, r_bins, r_fractions), (p_pixels, p_bins, p_fractions), r_size)
+        if mask:
+            valid = ~mask.array.ravel()[pixels]
+            pixels, bins, fractions = pixels[valid], bins[valid], fractions[valid]
+
+        self._matrix = csr_matrix((fractions, (bins, pixels)),
+                                  shape=(r_size * phi_size, int(np.prod(geometry.shape))))
+        self._norm = np.asarray(self._matrix.sum(axis=1), dtype=np.float32).ravel()
+
+    def integrate(self, image: np.ndarray, errors: bool = False):
+        """
+        Returns 2d (phi, r) array of mean intensities, empty bins are zeros.
+        If errors, Poisson standard errors sqrt(sum) / count are returned as well.
+        """
+        intensity = self._matrix @ np.asarray(image, dtype=np.float32).ravel()
+        result = np.zeros_like(self._norm)
+        np.divide(intensity, self._norm, out=result, where=self._norm > 0)
+        if not errors:
+            return result.reshape(self.shape)
+        result_errors = np.zeros_like(self._norm)
+        np.divide(np.sqrt(intensity.clip(0)), self._norm, out=result_errors, where=self._norm > 0)
+        return result.reshape(self.shape), result_errors.reshape(self.shape)
+
+
+def get_integration_matrix(geometry: 'Geometry', r_size: int, phi_size: int = 1,
+                           r_range: tuple = None, phi_range: tuple = None,
+                           detector_geometry: 'DetectorGeometry' = None,
+                           mask: 'DetectorMask' = None) -> IntegrationMatrix or None:
+    """
+    Returns cached integration matrix for the geometry. By default, bins cover the whole image,
+    r_range [pixels] and phi_range [rad] are the centers of the first and the last bins.
+    Radius axis of the matrix is in pixels in both cases.
+    """
+    r_range = r_range or geometry.r_range
+    phi_range = phi_range or geometry.phi_range
+    if any(x is None for x in (r_range, phi_range, r_size, phi_size)):
+        return
+    r_range, phi_range = tuple(r_range), tuple(phi_range)
+    key = (geometry.shape, geometry.beam_center, r_size, phi_size, r_range, phi_range,
+           detector_geometry.parameters if detector_geometry else None, mask.key if mask else None)
+    cache = get_integration_cache()
+    integration_matrix = cache.get(key)
+    if integration_matrix is None:
+        logger.info(f'Calculating integration matrix.')
+        integration_matrix = IntegrationMatrix(geometry, r_size, phi_size, r_range, phi_range,
+                                               detector_geometry, mask)
+        cache.put(key, integration_matrix)
+    return integration_matrix
+
+
+_INTEGRATION_CACHE = None
+
+
+def get_integration_cache() -> LRUCache:
+    global _INTEGRATION_CACHE
+    if _INTEGRATION_CACHE is None:
+        params = read_config(CACHE_CONFIG_NAME) or dict()
+        _INTEGRATION_CACHE = LRUCache(int(params.get('integration_cache_size', 1024) * _MB))
+    return _INTEGRATION_CACHE
+
+
+def _get_bins(value_range: tuple, size: int):
+    # bin centers coincide with np.linspace(*value_range, size) as used for polar interpolation
+    start, end = value_range
+    if size == 1:
+        return start, end - start
+    width = (end - start) / (size - 1)
+    return start - width / 2, width
+
+
+def _get_pixel_boxes(geometry: 'Geometry'):
+    x = np.arange(geometry.shape[1]) - geometry.beam_center[1]
+    y = np.arange(geometry.shape[0]) - geometry.beam_center[0]
+    x_corners = x[np.newaxis, :] - 0.5, x[np.newaxis, :] + 0.5
+    y_corners = y[:, np.newaxis] - 0.5, y[:, np.newaxis] + 0.5
+
+    # radius range: the nearest point and the farthest corner of the pixel
+    nearest_x, nearest_y = np.abs(x).clip(0.5) - 0.5, np.abs(y).clip(0.5) - 0.5
+    farthest_x, farthest_y = np.abs(x) + 0.5, np.abs(y) + 0.5
+    r_lo = np.sqrt(nearest_x[np.newaxis, :] ** 2 + nearest_y[:, np.newaxis] ** 2).ravel()
+    r_hi = np.sqrt(farthest_x[np.newaxis, :] ** 2 + farthest_y[:, np.newaxis] ** 2).ravel()
+
+    p_lo = np.full(r_lo.size, np.inf)
+    p_hi = np.full(r_lo.size, -np.inf)
+    for x_corner in x_corners:
+        for y_corner in y_corners:
+            angle = np.arctan2(y_corner, x_corner).ravel()
+            np.minimum(p_lo, angle, out=p_lo)
+            np.maximum(p_hi, angle, out=p_hi)
+
+    # pixels crossing the phi = ±pi cut are not split in phi
+    crossing = ((x_corners[0] < 0) & (y_corners[0] < 0) & (y_corners[1] > 0)).ravel()
+    p_lo[crossing] = p_hi[crossing] = np.arctan2(y[:, np.newaxis], x[np.newaxis, :]).ravel()[crossing]
+    return r_lo, r_hi, p_lo, p_hi
+
+
+def _split_pixels(lo: np.ndarray, hi: np.ndarray, start: float, width: float, size: int):
+    """
+    Splits intervals [lo, hi] between bins [start + i * width, start + (i + 1) * width).
+    Returns pixel indices, bin indices and fractions of the pixels in the bins.
+    """
+    lo = (lo - start) / width
+    hi = (hi - start) / width
+    first = np.floor(lo).astype(np.int64).clip(0, size - 1)
+    last = np.floor(hi).astype(np.int64).clip(0, size - 1)
+    inside = (hi >= 0) & (lo < size)
+    pixels = np.flatnonzero(inside)
+    first, last, lo, hi = first[pixels], last[pixels], lo[pixels], hi[pixels]
+
+    counts = last - first + 1
+    entries = np.repeat(np.arange(pixels.size), counts)
+    offsets = np.arange(entries.size) - np.repeat(np.cumsum(counts) - counts, counts)
+    bins = first[entries] + offsets
+
+    lo, hi = lo[entries], hi[entries]
+    box_width = hi - lo
+    overlap = np.minimum(hi, bins + 1) - np.maximum(lo, bins)
+    fractions = np.ones(entries.size, dtype=np.float32)
+    np.divide(overlap, box_width, out=fractions, where=box_width > 0, casting='unsafe')
+    return pixels[entries], bins, fractions
+
+
+def _combine_splits(r_split: tuple, p_split: tuple, r_size: int):
+    """
+    Combines splits of pixels in r and phi into (phi, r) bins.
+    Both splits are sorted by pixel indices.
+    """
+    r_pixels, r_bins, r_fractions = r_split
+    p_pixels, p_bins, p_fractions = p_split
+    number_of_pixels = max(r_pixels.max(initial=-1), p_pixels.max(initial=-1)) + 1
+    p_counts = np.bincount(p_pixels, minlength=number_of_pixels)
+    p_first = np.cumsum(p_counts) - p_counts
+
+    repeats = p_counts[r_pixels]
+    entries = np.repeat(np.arange(r_pixels.size), repeats)
+    offsets = np.arange(entries.size) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+    pixels = r_pixels[entries]
+    p_entries = p_first[pixels] + offsets
+
+    bins = p_bins[p_entries] * r_size + r_bins[entries]
+    fractions = r_fractions[entries] * p_fractions[p_entries]
+    return pixels, bins, fractions
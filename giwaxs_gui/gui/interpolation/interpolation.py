@@ -4,23 +4,41 @@ from typing import NamedTuple
 import numpy as np
 import cv2
 
-from .modes import get_mode
+from .modes import get_mode, PIXEL_SPLITTING
 from .parameters_widget import get_interpolation_parameters
+from ..integration import get_integration_matrix
+from ...utils import get_subsampling_step
+from ...cache import LRUCache, CACHE_CONFIG_NAME
+from ...config import read_config
 
 logger = logging.getLogger(__name__)
 
+_PREVIEW_IMAGE_SIZE = 2 ** 20
+_PREVIEW_SIZE = 2 ** 18
+_MB = 2 ** 20
+
 
 class Interpolation(object):
     """
     This class is a singleton and it contains main functionality needed for 2d polar interpolation.
     Its instance is held by ..global_context.Image class so that other widgets could
-    get access to it (for instance, for fast angular profile calculation).
+    get access to it.
     """
+    _MAX_WEIGHTS = 4
 
     def __init__(self):
+        self._geometry = None
+        self._detector_geometry = None
         self._interpolation_geometry = None
         self._image = None
         self._scale = 1.
+        self._mask = None
+        # float32 map of valid pixels and inverse remap weights
+        # cached per (interpolation geometry key, flag, mask key)
+        self._valid = None
+        self._weights = {}
+        # last preview geometry and its key
+        self._preview_geometry = self._preview_key = None
         params = get_interpolation_parameters()
         self._r_size = params.get('r_size', None)
         self._phi_size = params.get('phi_size', None)
@@ -29,6 +47,11 @@ class Interpolation(object):
 
     @property
     def interpolation_geometry(self) -> 'InterpolationGeometry' or None:
+        # polar maps are calculated only when they are needed
+        if self._interpolation_geometry is None and self._geometry is not None:
+            self._interpolation_geometry = InterpolationGeometry.get(
+                self._geometry, self._r_size, self._phi_size,
+                detector_geometry=self._detector_geometry)
         return self._interpolation_geometry
 
     @property
@@ -54,14 +77,14 @@ class Interpolation(object):
     @property
     def r_axis(self) -> np.ndarray or None:
         try:
-            return self._interpolation_geometry.r * self._scale
+            return self._r_to_q(self._get_axes_source().r)
         except AttributeError:  # should be faster than checking if not None
             return
 
     @property
     def phi_axis(self) -> np.ndarray or None:
         try:
-            return self._interpolation_geometry.p * 180 / np.pi
+            return self._get_axes_source().p * 180 / np.pi
         except AttributeError:
             return
 
@@ -72,6 +95,28 @@ class Interpolation(object):
     def set_scale(self, scale: float):
         self._scale = scale
 
+    def set_detector_geometry(self, detector_geometry: 'DetectorGeometry' or None):
+        """
+        With detector geometry, radius axis is uniform in q instead of pixels.
+        """
+        if detector_geometry is not self._detector_geometry:
+            self._detector_geometry = detector_geometry
+            self._interpolation_geometry = None
+
+    def set_mask(self, mask: 'DetectorMask' or None):
+        """
+        Masked pixels are excluded from interpolation, polar bins interpolated mostly
+        from masked pixels are set to zero.
+        """
+        if (mask.key if mask else None) != (self._mask.key if self._mask else None):
+            self._mask = mask or None
+            self._valid = None if self._mask is None else (~self._mask.array).astype(np.float32)
+
+    def _r_to_q(self, r: np.ndarray) -> np.ndarray:
+        if self._detector_geometry:
+            return self._detector_geometry.r_to_q(r)
+        return r * self._scale
+
     def set_algorithm(self, mode: 'Mode' or str):
         if isinstance(mode, str):
             mode = get_mode(mode)
@@ -81,79 +126,241 @@ class Interpolation(object):
 
     def set_geometry(self, geometry: 'Geometry', r_size: int = None, phi_size: int = None):
         self.set_shape(r_size, phi_size)
-        self._interpolation_geometry = InterpolationGeometry.get(
-            geometry, self._r_size, self._phi_size)
+        self._geometry = geometry
+        self._interpolation_geometry = None
 
     def set_shape(self, r_size: int = None, phi_size: int = None):
-        if r_size:  # anyway should be nonzero
+        if r_size and r_size != self._r_size:  # anyway should be nonzero
             self._r_size = r_size
-        if phi_size:
+            self._interpolation_geometry = None
+        if phi_size and phi_size != self._phi_size:
             self._phi_size = phi_size
+            self._interpolation_geometry = None
 
     def set_parameters(self, parameters: dict):
         self.set_shape(parameters.get('r_size', None), parameters.get('phi_size', None))
         self.set_algorithm(parameters.get('mode', None))
 
     def interpolate(self, image: np.ndarray) -> np.ndarray or None:
+        if self.algorithm_flag == PIXEL_SPLITTING:
+            integration_matrix = self._get_integration_matrix()
+            if any(x is None for x in (integration_matrix, image)):
+                return
+            self._image = integration_matrix.integrate(image)
+            return self._image
         if any(x is None for x in (self.interpolation_geometry, image)):
             return
-        xx = self.interpolation_geometry.xx.astype(np.float32)
-        yy = self.interpolation_geometry.yy.astype(np.float32)
         try:
             logger.info(f'Calculating interpolation.')
-            self._image = cv2.remap(image.astype(np.float32), xx, yy,
-                                    interpolation=self.algorithm_flag)
+            key = get_interpolation_geometry_key(
+                self._geometry, self._r_size, self._phi_size, detector_geometry=self._detector_geometry)
+            self._image = self._remap(self.interpolation_geometry, key, image)
             logger.info(f'Interpolation is calculated.')
             return self._image
         except cv2.error as err:
             logger.exception(err)
             return
 
-    def get_angular_profile(self, r1: float, r2: float):
-        if self.image is None:
+    def interpolate_preview(self, image: np.ndarray):
+        """
+        Fast coarse interpolation used while the geometry is being changed.
+        Returns r axis, phi axis [deg] and the interpolated image
+        calculated from a subsampled image on a reduced polar grid.
+        """
+        if any(x is None for x in (self._geometry, image, self._r_size, self._phi_size)):
             return
-        r_min, r_max, scale = self.r_axis.min(), self.r_axis.max(), self.scale
-        r_ratio = (r_max - r_min) / self.r_size / scale
-
-        r1 = int((r1 - r_min) / r_ratio)
-        r2 = int((r2 - r_min) / r_ratio)
+        step = get_subsampling_step(image.size, _PREVIEW_IMAGE_SIZE)
+        size_step = get_subsampling_step(self._r_size * self._phi_size, _PREVIEW_SIZE)
+        r_size, phi_size = max(self._r_size // size_step, 2), max(self._phi_size // size_step, 2)
+        key = get_interpolation_geometry_key(
+            self._geometry, r_size, phi_size, step=step, detector_geometry=self._detector_geometry)
+        if key != self._preview_key:
+            self._preview_geometry = InterpolationGeometry.get(
+                self._geometry, r_size, phi_size, step=step, detector_geometry=self._detector_geometry)
+            self._preview_key = key
+        preview_geometry = self._preview_geometry
+        try:
+            p_image = self._remap(preview_geometry, key, image[::step, ::step], step=step, flag=cv2.INTER_LINEAR)
+        except cv2.error as err:
+            logger.exception(err)
+            return
+        return self._r_to_q(preview_geometry.r), preview_geometry.p * 180 / np.pi, p_image
 
-        r1, r2 = max(min((r1, r2)), 0), min(max((r1, r2)), self.r_size)
-        if r1 > self.r_size or r2 < 0:
+    def interpolate_region(self, image: np.ndarray, r_range: tuple, phi_range: tuple,
+                           r_size: int = None, phi_size: int = None):
+        """
+        Interpolates only the region r_range [pixels] x phi_range [rad]
+        with the requested resolution (current r_size and phi_size by default).
+        Returns r axis, phi axis [deg] and the interpolated image.
+        """
+        if any(x is None for x in (self._geometry, image)):
+            return
+        if self.algorithm_flag == PIXEL_SPLITTING:
+            integration_matrix = get_integration_matrix(
+                self._geometry, r_size or self._r_size, phi_size or self._phi_size,
+                r_range=r_range, phi_range=phi_range, detector_geometry=self._detector_geometry,
+                mask=self._mask)
+            return (self._r_to_q(integration_matrix.r), integration_matrix.p * 180 / np.pi,
+                    integration_matrix.integrate(image))
+        r_size, phi_size = r_size or self._r_size, phi_size or self._phi_size
+        interpolation_geometry = InterpolationGeometry.get(
+            self._geometry, r_size, phi_size,
+            r_range=r_range, phi_range=phi_range, detector_geometry=self._detector_geometry)
+        if interpolation_geometry is None:
             return
+        key = get_interpolation_geometry_key(
+            self._geometry, r_size, phi_size, r_range=r_range, phi_range=phi_range,
+            detector_geometry=self._detector_geometry)
         try:
-            return self.image[:, r1:r2].sum(axis=1)
-        except Exception as err:
+            p_image = self._remap(interpolation_geometry, key, image)
+        except cv2.error as err:
             logger.exception(err)
             return
+        return self._r_to_q(interpolation_geometry.r), interpolation_geometry.p * 180 / np.pi, p_image
+
+    def _get_integration_matrix(self) -> 'IntegrationMatrix' or None:
+        # pixel splitting does not need remap maps of the interpolation geometry
+        if any(x is None for x in (self._geometry, self._r_size, self._phi_size)):
+            return
+        return get_integration_matrix(self._geometry, self._r_size, self._phi_size,
+                                      detector_geometry=self._detector_geometry, mask=self._mask)
+
+    def _get_axes_source(self):
+        if self.algorithm_flag == PIXEL_SPLITTING:
+            return self._get_integration_matrix()
+        return self.interpolation_geometry
+
+    def _get_weights(self, interpolation_geometry: 'InterpolationGeometry', geometry_key: tuple,
+                     valid: np.ndarray, flag: int) -> np.ndarray:
+        key = geometry_key, flag, self._mask.key
+        if key not in self._weights:
+            if len(self._weights) >= self._MAX_WEIGHTS:
+                del self._weights[next(iter(self._weights))]
+            self._weights[key] = _get_inverse_weights(interpolation_geometry, valid, flag)
+        return self._weights[key]
+
+    def _remap(self, interpolation_geometry: 'InterpolationGeometry', geometry_key: tuple,
+               image: np.ndarray, step: int = 1, flag: int = None) -> np.ndarray:
+        """
+        Remaps the image subsampled by step with masked pixels set to zero and normalizes
+        polar bins by the remapped weights of valid pixels.
+        The mask is ignored if it does not match the image shape.
+        """
+        flag = self.algorithm_flag if flag is None else flag
+        valid = None if self._valid is None else self._valid[::step, ::step]
+        if valid is not None and valid.shape != image.shape:
+            logger.warning(f'Mask shape {self._valid.shape} does not match the image, mask is ignored.')
+            valid = None
+        if valid is None:
+            return interpolation_geometry.remap(np.asarray(image, dtype=np.float32), flag)
+        p_image = interpolation_geometry.remap(np.multiply(image, valid, dtype=np.float32), flag)
+        p_image *= self._get_weights(interpolation_geometry, geometry_key, valid, flag)
+        return p_image
 
 
 class InterpolationGeometry(NamedTuple):
     """
     Interpolation geometry container used for polar interpolation.
     Should only be initialized by the class method '.get()'.
+    Remap maps are stored in the fixed-point representation
+    (cv2.convertMaps to CV_16SC2), which is faster for cv2.remap
+    and can be reused for all images with the same geometry.
     Fields:
         r: np.ndarray - 1d radius axis for interpolated image
         p: np.ndarray - 1d angular axis [rad] for interpolated image
-        xx: np.ndarray - 2d map1 for cv2 remap function
-        yy: np.ndarray - 2d map2 for cv2 remap function
+        map1: np.ndarray - 2d map of integer pixel coordinates for cv2 remap function
+        map2: np.ndarray - 2d map of interpolation table indices for cv2 remap function
+        nearest_map: np.ndarray - 2d map of rounded pixel coordinates for nearest neighbour mode
     """
     r: np.ndarray
     p: np.ndarray
-    xx: np.ndarray
-    yy: np.ndarray
+    map1: np.ndarray
+    map2: np.ndarray
+    nearest_map: np.ndarray
+
+    def remap(self, image: np.ndarray, flag: int) -> np.ndarray:
+        # fixed-point maps cannot be used with INTER_NEAREST together with map2
+        if flag == cv2.INTER_NEAREST:
+            return cv2.remap(image, self.nearest_map, None, interpolation=flag)
+        return cv2.remap(image, self.map1, self.map2, interpolation=flag)
 
     @classmethod
-    def get(cls, geometry: 'Geometry', r_size: int, phi_size: int):
-        rr = geometry.rr
-        phi = geometry.phi
-        center = geometry.beam_center
-        if any(x is None for x in (rr, phi, center, r_size, phi_size)):
+    def get(cls, geometry: 'Geometry', r_size: int, phi_size: int, step: int = 1,
+            r_range: tuple = None, phi_range: tuple = None,
+            detector_geometry: 'DetectorGeometry' = None):
+        """
+        Calculates maps for the images subsampled by step along both axes.
+        By default, maps cover the whole image, r_range [pixels] and phi_range [rad]
+        restrict them to a region of interest.
+        With detector geometry, radius axis is uniform in q.
+        Maps for full images are taken from the cache shared by all images.
+        """
+        key = get_interpolation_geometry_key(
+            geometry, r_size, phi_size, step, r_range, phi_range, detector_geometry)
+        if key is None:
             return
-        r = np.linspace(rr.min(), rr.max(), r_size)
-        r_matrix = r[np.newaxis, :].repeat(phi_size, axis=0)
-        p = np.linspace(phi.min(), phi.max(), phi_size)
-        p_matrix = p[:, np.newaxis].repeat(r_size, axis=1)
-        xx = r_matrix * np.cos(p_matrix) + center[1]
-        yy = r_matrix * np.sin(p_matrix) + center[0]
-        return cls(r=r, p=p, xx=xx, yy=yy)
+        _, center, _, _, r_range, phi_range, *_ = key
+        if detector_geometry:
+            r = detector_geometry.q_to_r(np.linspace(*detector_geometry.r_to_q(r_range), r_size))
+        else:
+            r = np.linspace(*r_range, r_size)
+        if step != 1:
+            return cls._calculate(center, r, phi_size, step, phi_range)
+        cache = get_interpolation_geometry_cache()
+        interpolation_geometry = cache.get(key)
+        if interpolation_geometry is None:
+            interpolation_geometry = cls._calculate(center, r, phi_size, step, phi_range)
+            cache.put(key, interpolation_geometry)
+        return interpolation_geometry
+
+    @classmethod
+    def _calculate(cls, center: tuple, r: np.ndarray, phi_size: int, step: int, phi_range: tuple):
+        r_size = r.size
+        p = np.linspace(*phi_range, phi_size)
+        # outer products of r and cos(p), sin(p) are written directly to float32 maps
+        r_vector = r.astype(np.float32)[np.newaxis, :]
+        xx = np.empty((phi_size, r_size), dtype=np.float32)
+        yy = np.empty((phi_size, r_size), dtype=np.float32)
+        np.multiply((np.cos(p) / step).astype(np.float32)[:, np.newaxis], r_vector, out=xx)
+        np.multiply((np.sin(p) / step).astype(np.float32)[:, np.newaxis], r_vector, out=yy)
+        xx += np.float32(center[1] / step)
+        yy += np.float32(center[0] / step)
+        map1, map2 = cv2.convertMaps(xx, yy, cv2.CV_16SC2)
+        nearest_map, _ = cv2.convertMaps(xx, yy, cv2.CV_16SC2, nninterpolation=True)
+        return cls(r=r, p=p, map1=map1, map2=map2, nearest_map=nearest_map)
+
+
+def _get_inverse_weights(interpolation_geometry: InterpolationGeometry, valid: np.ndarray,
+                         flag: int) -> np.ndarray:
+    # bins with less than a half of the interpolation weight from valid pixels are dropped
+    weights = interpolation_geometry.remap(valid, flag)
+    inverse_weights = np.zeros_like(weights)
+    np.divide(1, weights, out=inverse_weights, where=weights >= 0.5)
+    return inverse_weights
+
+
+def get_interpolation_geometry_key(geometry: 'Geometry', r_size: int, phi_size: int, step: int = 1,
+                                   r_range: tuple = None, phi_range: tuple = None,
+                                   detector_geometry: 'DetectorGeometry' = None) -> tuple or None:
+    """
+    Returns the key which identifies interpolation maps with these parameters
+    (None if they cannot be calculated).
+    """
+    r_range = r_range or geometry.r_range
+    phi_range = phi_range or geometry.phi_range
+    center = geometry.beam_center
+    if any(x is None for x in (r_range, phi_range, center, r_size, phi_size)):
+        return
+    return (geometry.shape, center, r_size, phi_size, tuple(r_range), tuple(phi_range), step,
+            detector_geometry.parameters if detector_geometry else None)
+
+
+_INTERPOLATION_GEOMETRY_CACHE = None
+
+
+def get_interpolation_geometry_cache() -> LRUCache:
+    global _INTERPOLATION_GEOMETRY_CACHE
+    if _INTERPOLATION_GEOMETRY_CACHE is None:
+        params = read_config(CACHE_CONFIG_NAME) or dict()
+        _INTERPOLATION_GEOMETRY_CACHE = LRUCache(int(params.get('geometry_cache_size', 256) * _MB))
+    return _INTERPOLATION_GEOMETRY_CACHE
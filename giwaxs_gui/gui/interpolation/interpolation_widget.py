@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 import logging
 
+import numpy as np
+
 from PyQt5.QtWidgets import QMainWindow
 
 from .parameters_widget import InterpolateSetupWindow
@@ -21,6 +23,10 @@ class InterpolateImageWidget(AbstractROIContainer, QMainWindow):
         AbstractROIContainer.__init__(self, signal_connector)
         QMainWindow.__init__(self, parent)
         self._setup_window = None
+        # (r_range [pixels], phi_range [rad]) of the zoomed region or None for the full image
+        # and the (geometry, detector geometry) it was selected for
+        self._region = None
+        self._region_key = None
         self._image_viewer = CustomImageViewer(self)
         self.setCentralWidget(self._image_viewer)
         self.__init_toolbar__()
@@ -33,13 +39,18 @@ class InterpolateImageWidget(AbstractROIContainer, QMainWindow):
             update_image = True
         if s.geometry_changed_finish():
             update_image = True
+            self._region = None
         if s.transformation_added():
             update_image = True
+            self._region = None
         if update_image:
             self.update_image()
+        elif s.geometry_changed() and all(signal() for signal in s.geometry_changed()):
+            self.update_preview()
 
     def _on_scale_changed(self):
-        self.set_axes()
+        # radius grid is uniform in q when detector parameters are set, so it can change too
+        self.update_image()
 
     def _add_item(self, roi):
         if isinstance(roi, Roi2DRect):
@@ -59,30 +70,85 @@ class InterpolateImageWidget(AbstractROIContainer, QMainWindow):
         setup_action = setup_toolbar.addAction(Icon('setup'), 'Setup')
         setup_action.triggered.connect(self.open_setup_window)
 
+        zoom_action = setup_toolbar.addAction(Icon('find'), 'Render visible region')
+        zoom_action.triggered.connect(self.render_visible_region)
+
+        full_image_action = setup_toolbar.addAction(Icon('interpolate'), 'Show full image')
+        full_image_action.triggered.connect(self.show_full_image)
+
     def update_image(self):
+        # angular profiles are calculated from the image directly,
+        # so the full image is interpolated only when no region is shown
+        if self._region is not None and self._region_key != self._get_region_key():
+            # the region is not valid for images of other shapes, beam centers or detector geometry
+            self._region = None
+        if self._region is not None:
+            region = self.image.interpolate_region(*self._region)
+            if region is not None:
+                r, p, p_image = region
+                self._set_image_with_rois(p_image, r, p)
+                return
         p_image = self.image.interpolate()
         if p_image is not None:
-            roi_values = [value.parameters for value in self.roi_dict.values()]
-            active_list = [value.active for value in self.roi_dict.values()]
-            for p in roi_values:
-                self.delete_roi(p)
+            self._set_image_with_rois(p_image)
+
+    def _set_image_with_rois(self, p_image, r=None, p=None):
+        roi_values = [value.parameters for value in self.roi_dict.values()]
+        active_list = [value.active for value in self.roi_dict.values()]
+        for roi in roi_values:
+            self.delete_roi(roi)
+        self.set_data(p_image)
+        self.set_axes(r, p)
+        for roi, a in zip(roi_values, active_list):
+            self.add_roi(roi)
+            if a:
+                self.roi_dict[roi.key].set_active()
+
+    def render_visible_region(self):
+        """
+        Interpolates the visible part of the image with the full resolution
+        instead of showing upsampled full image.
+        """
+        if self.image.image is None or self.image.r_range is None:
+            return
+        (x_min, x_max), (y_min, y_max) = self._image_viewer.view_box.viewRange()
+        r_min, r_max = self.image.r_range
+        phi_min, phi_max = self.image.phi_range
+        x_min, x_max = self.image.q_to_r([x_min, x_max])
+        r_range = max(x_min, r_min), min(x_max, r_max)
+        phi_range = max(np.deg2rad(y_min), phi_min), min(np.deg2rad(y_max), phi_max)
+        if r_range[0] >= r_range[1] or phi_range[0] >= phi_range[1]:
+            return
+        self._region = r_range, phi_range
+        self._region_key = self._get_region_key()
+        self.update_image()
+
+    def _get_region_key(self) -> tuple:
+        # geometries are cached per shape and beam center, so they are compared by identity
+        return self.image.geometry, self.image.detector_geometry
+
+    def show_full_image(self):
+        self._region = None
+        self.update_image()
+
+    def update_preview(self):
+        preview = self.image.interpolation.interpolate_preview(self.image.image)
+        if preview is not None:
+            r, p, p_image = preview
             self.set_data(p_image)
-            self.set_axes()
-            for p, a in zip(roi_values, active_list):
-                self.add_roi(p)
-                if a:
-                    self.roi_dict[p.key].set_active()
+            self.set_axes(r, p)
 
     def set_data(self, image):
         self._image_viewer.set_data(image)
 
-    def set_axes(self):
-        # TODO: fix bug when r_size and phi_size are different.
-        r, p = self.image.interpolation.r_axis, self.image.interpolation.phi_axis
+    def set_axes(self, r=None, p=None):
+        if r is None or p is None:
+            r, p = self.image.interpolation.r_axis, self.image.interpolation.phi_axis
         r_min, r_max = r.min(), r.max()
         phi_min, phi_max = p.min(), p.max()
 
-        aspect_ratio = (phi_max - phi_min) * p.size / (r_max - r_min) / r.size
+        # pixels of the interpolated image are shown as squares
+        aspect_ratio = (phi_max - phi_min) * r.size / (r_max - r_min) / p.size
 
         self._image_viewer.set_x_axis(r_min, r_max)
         self._image_viewer.set_y_axis(phi_min, phi_max)
@@ -7,6 +7,10 @@ import cv2
 logger = logging.getLogger(__name__)
 
 
+# not an OpenCV flag: intensity is integrated with pixel splitting instead of cv2.remap
+PIXEL_SPLITTING = -1
+
+
 class _Mode(NamedTuple):
     name: str
     flag: int
@@ -16,7 +20,8 @@ INTERPOLATION_MODES = (
     _Mode('Nearest', cv2.INTER_NEAREST),
     _Mode('Bilinear', cv2.INTER_LINEAR),
     _Mode('Cubic', cv2.INTER_CUBIC),
-    _Mode('Lanczos', cv2.INTER_LANCZOS4)
+    _Mode('Lanczos', cv2.INTER_LANCZOS4),
+    _Mode('Pixel splitting', PIXEL_SPLITTING)
 )
 
 
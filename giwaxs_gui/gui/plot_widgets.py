@@ -3,12 +3,16 @@ import logging
 
 import numpy as np
 
-from pyqtgraph import CircleROI, LineSegmentROI
-from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout)
-from PyQt5.QtCore import pyqtSignal, Qt
+from pyqtgraph import CircleROI, LineSegmentROI, ImageItem
+from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QPushButton)
+from PyQt5.QtCore import pyqtSignal, Qt, QTimer
 
-from .basic_widgets import CustomImageViewer, AnimatedSlider, BlackToolBar
+from .basic_widgets import (CustomImageViewer, AnimatedSlider, BlackToolBar,
+                            BasicInputParametersWidget)
 from .signal_connection import SignalConnector, SignalContainer, AppNode
+from .global_context import (DetectorParameters, DETECTOR_CONFIG_NAME,
+                             CorrectionParameters, CORRECTIONS_CONFIG_NAME,
+                             MaskParameters, MASK_CONFIG_NAME, get_limits)
 from .roi.roi_widgets import Roi2DRing
 from .roi.roi_containers import AbstractROIContainer
 from ..utils import Icon, center_widget, RoiParameters
@@ -17,6 +21,10 @@ logger = logging.getLogger(__name__)
 
 
 class GiwaxsImageViewer(AbstractROIContainer, CustomImageViewer):
+    # beam center changes are coalesced to the screen refresh rate while dragging
+    _BEAM_CENTER_UPDATE_INTERVAL = 30  # ms
+    _MASK_COLOR = (255, 0, 0, 100)
+
     @property
     def beam_center(self):
         return self.image.beam_center
@@ -99,31 +107,71 @@ class GiwaxsImageViewer(AbstractROIContainer, CustomImageViewer):
         CustomImageViewer.__init__(self, parent, **kwargs)
 
         self._geometry_params_widget = None
+        self._pending_beam_center = None
+        self._beam_center_timer = QTimer(self)
+        self._beam_center_timer.setSingleShot(True)
+        self._beam_center_timer.setInterval(self._BEAM_CENTER_UPDATE_INTERVAL)
+        self._beam_center_timer.timeout.connect(self._apply_beam_center)
         self.hist.sigLevelChangeFinished.connect(self._on_limits_changed)
+        # child of the image item, so that it follows its scale and position
+        self._mask_item = ImageItem(parent=self.image_item)
+        self._mask_item.setZValue(1)
+        self._mask_key = None
         self.__init_center_roi__()
 
     def process_signal(self, s: SignalContainer):
         AbstractROIContainer.process_signal(self, s)
         if s.image_changed():
             self.set_data(self.image.image, change_limits=False)
-            self.set_levels(self.image.intensity_limits)
+            self.update_mask()
+            self.set_levels(self.image.intensity_limits or self._get_default_levels())
         if s.transformation_added():
             self.set_data(self.image.image, change_limits=False)
+            self.update_mask()
         if s.geometry_changed():
             self.update_beam_center(self.image.beam_center, emit_value=False)
 
+    def update_mask(self):
+        mask = self.image.mask
+        if mask is None:
+            self._mask_key = None
+            self._mask_item.hide()
+            return
+        if mask.key != self._mask_key:
+            self._mask_key = mask.key
+            overlay = np.zeros((*mask.shape, 4), dtype=np.uint8)
+            overlay[mask.array] = self._MASK_COLOR
+            self._mask_item.setImage(overlay, autoLevels=False)
+        self._mask_item.show()
+
+    def _get_default_levels(self):
+        # masked hot pixels and detector gaps do not define the displayed levels
+        mask = self.image.mask
+        if self.image.image is None or mask is None:
+            return
+        return get_limits(self.image.image, None, mask.array)
+
     def _on_limits_changed(self):
         levels = self.get_levels()
         if levels != (0, 1):
             self.set_image_limits(self.get_levels())
 
     def _on_scale_changed(self):
-        scale = self.image.scale
+        # q is not proportional to the radius, so the image stays in pixels and rings are converted
+        scale = 1. if self.image.detector_geometry else self.image.scale
         self.set_scale(scale)
         self.center_roi.set_scale(scale)
+        for roi in self.roi_dict.values():
+            roi.set_converter(self._get_roi_converter())
+        # horizon mask depends on detector geometry
+        self.update_mask()
+
+    def _get_roi_converter(self):
+        if self.image.detector_geometry:
+            return self.image.q_to_r
 
     def _get_roi(self, params: RoiParameters):
-        return Roi2DRing(params)
+        return Roi2DRing(params, to_pixels=self._get_roi_converter())
 
     def _add_item(self, roi):
         self.image_plot.addItem(roi)
@@ -153,9 +201,15 @@ class GiwaxsImageViewer(AbstractROIContainer, CustomImageViewer):
             self._geometry_params_widget.change_zero_angle.connect(self.set_zero_angle)
             self._geometry_params_widget.change_invert_angle.connect(self.set_invert_angle)
             self._geometry_params_widget.scale_changed.connect(self.emit_scale_changed)
+            self._geometry_params_widget.detector_parameters_changed.connect(
+                self.emit_detector_parameters_changed)
             self._geometry_params_widget.close_event.connect(self.on_closing_geometry_parameters)
 
     def on_closing_geometry_parameters(self):
+        self._beam_center_timer.stop()
+        self._apply_beam_center()
+        # the last beam center is not a preview anymore
+        self.image.set_beam_center(self.image.beam_center)
         self.center_roi.set_size()
         self._geometry_params_widget = None
         SignalContainer(app_node=self).geometry_changed_finish(0).send()
@@ -164,6 +218,10 @@ class GiwaxsImageViewer(AbstractROIContainer, CustomImageViewer):
         self.image.set_scale(value)
         SignalContainer(app_node=self).scale_changed(0).send()
 
+    def emit_detector_parameters_changed(self, params: dict):
+        self.image.set_detector_parameters(DetectorParameters.from_dict(params))
+        SignalContainer(app_node=self).scale_changed(0).send()
+
     def set_zero_angle(self, value):
         self.angle_roi.set_angle(value)
 
@@ -172,15 +230,23 @@ class GiwaxsImageViewer(AbstractROIContainer, CustomImageViewer):
 
     def update_beam_center(self, value, emit_value: bool = True):
         if emit_value:
-            self.set_beam_center(value)
+            self._pending_beam_center = tuple(value)
+            if not self._beam_center_timer.isActive():
+                self._beam_center_timer.start()
         self.set_center((value[1], value[0]), pixel_units=True)
 
+    def _apply_beam_center(self):
+        if self._pending_beam_center is not None:
+            beam_center, self._pending_beam_center = self._pending_beam_center, None
+            self.set_beam_center(beam_center, preview=True)
+
 
 class GeometryParametersWidget(QWidget):
     change_center = pyqtSignal(list)
     change_zero_angle = pyqtSignal(float)
     change_invert_angle = pyqtSignal(bool)
     scale_changed = pyqtSignal(float)
+    detector_parameters_changed = pyqtSignal(dict)
 
     close_event = pyqtSignal()
 
@@ -193,6 +259,7 @@ class GeometryParametersWidget(QWidget):
         self.zero_angle = zero_angle
         self.scale = scale
         self.angle_direction = angle_direction
+        self._detector_setup = None
         self.__init__ui__()
         self.setWindowTitle('Set beam center coordinates')
         self.setWindowIcon(Icon('setup'))
@@ -200,6 +267,8 @@ class GeometryParametersWidget(QWidget):
         self.show()
 
     def closeEvent(self, a0) -> None:
+        if self._detector_setup:
+            self._detector_setup.close()
         self.close_event.emit()
         QWidget.closeEvent(self, a0)
 
@@ -230,9 +299,13 @@ class GeometryParametersWidget(QWidget):
                                          decimals=5)
         self.scale_edit.valueChanged.connect(self.on_scale_changed)
 
+        detector_button = QPushButton('Detector geometry')
+        detector_button.clicked.connect(self.open_detector_setup)
+
         layout.addWidget(self.x_slider)
         layout.addWidget(self.y_slider)
         layout.addWidget(self.scale_edit)
+        layout.addWidget(detector_button)
         # layout.addWidget(self.angle_slider)
         # layout.addWidget(self.invert_angle_box)
 
@@ -240,6 +313,16 @@ class GeometryParametersWidget(QWidget):
         self.scale = value
         self.scale_changed.emit(value)
 
+    def open_detector_setup(self):
+        if self._detector_setup is None:
+            self._detector_setup = DetectorSetupWindow()
+            self._detector_setup.apply_signal.connect(self.detector_parameters_changed.emit)
+            self._detector_setup.close_signal.connect(self.close_detector_setup)
+            self._detector_setup.show()
+
+    def close_detector_setup(self):
+        self._detector_setup = None
+
     def _connect_func(self, ind: int):
         def beam_center_changed(value):
             self.beam_center[ind] = value
@@ -261,11 +344,69 @@ class GeometryParametersWidget(QWidget):
             return angle_direction_changed
 
 
+class DetectorSetupWindow(BasicInputParametersWidget):
+    P = BasicInputParametersWidget.InputParameters
+
+    PARAMETER_TYPES = (P('distance', 'Sample-detector distance (mm)', float,
+                         'Leave empty to use linear Q to pixel ratio.', True),
+                       P('pixel_size', 'Pixel size (mm)', float, None, True),
+                       P('wavelength', 'Wavelength (Å)', float, None, True),
+                       P('incidence_angle', 'Incidence angle (deg)', float,
+                         'Grazing incidence angle of the beam\n'
+                         'with respect to the sample surface.', True),
+                       P('tilt', 'Detector tilt (deg)', float,
+                         'Rotation of the detector around its\n'
+                         'horizontal axis through the beam center.', True))
+
+    NAME = DETECTOR_CONFIG_NAME
+
+
+class CorrectionsSetupWindow(BasicInputParametersWidget):
+    P = BasicInputParametersWidget.InputParameters
+
+    PARAMETER_TYPES = (P('solid_angle', 'Solid angle correction', bool,
+                         'Requires detector geometry.'),
+                       P('polarization_factor', 'Polarization factor', float,
+                         'Degree of linear polarization of the beam:\n'
+                         '1 - horizontal, -1 - vertical, 0 - unpolarized.\n'
+                         'Requires detector geometry. Leave empty to skip.', True),
+                       P('flat_field', 'Flat field image', str,
+                         'Path to the flat field image.\n'
+                         'Leave empty to skip.', True),
+                       P('dark_current', 'Dark current image', str,
+                         'Path to the dark current image.\n'
+                         'Leave empty to skip.', True))
+
+    NAME = CORRECTIONS_CONFIG_NAME
+
+
+class MaskSetupWindow(BasicInputParametersWidget):
+    P = BasicInputParametersWidget.InputParameters
+
+    PARAMETER_TYPES = (P('mask_file', 'Mask image', str,
+                         'Path to the image with nonzero values\n'
+                         'at masked pixels. Leave empty to skip.', True),
+                       P('min_intensity', 'Minimum intensity', float,
+                         'Pixels below are masked (detector gaps).\n'
+                         'Thresholds are applied once to the current image\n'
+                         'and the mask is kept for the following frames.\n'
+                         'Leave empty to skip.', True),
+                       P('max_intensity', 'Maximum intensity', float,
+                         'Pixels above are masked (hot pixels).\n'
+                         'Leave empty to skip.', True),
+                       P('horizon', 'Mask below horizon', bool,
+                         'Requires detector geometry.'))
+
+    NAME = MASK_CONFIG_NAME
+
+
 class Basic2DImageWidget(AppNode, QMainWindow):
 
     def __init__(self, signal_connector, parent=None):
         AppNode.__init__(self, signal_connector)
         QMainWindow.__init__(self, parent)
+        self._corrections_setup = None
+        self._mask_setup = None
         self.image_viewer = GiwaxsImageViewer(self.get_lower_connector(), self)
         self.setCentralWidget(self.image_viewer)
         self.__init_toolbar__()
@@ -290,3 +431,41 @@ class Basic2DImageWidget(AppNode, QMainWindow):
             Icon('center'), 'Beam center')
         set_beam_center_action.triggered.connect(
             self.image_viewer.open_geometry_parameters)
+
+        corrections_action = toolbar.addAction(Icon('setup'), 'Intensity corrections')
+        corrections_action.triggered.connect(self.open_corrections_setup)
+
+        mask_toolbar = BlackToolBar('Mask', self)
+        self.addToolBar(mask_toolbar)
+
+        mask_action = mask_toolbar.addAction(Icon('setup_white'), 'Detector mask')
+        mask_action.triggered.connect(self.open_mask_setup)
+
+        mask_rois_action = mask_toolbar.addAction(Icon('roi_item'), 'Mask selected rings')
+        mask_rois_action.triggered.connect(
+            lambda: self.add_mask_rois(self.image_viewer.get_selected()))
+
+        clear_mask_action = mask_toolbar.addAction(Icon('delete'), 'Clear drawn mask')
+        clear_mask_action.triggered.connect(self.clear_drawn_mask)
+
+    def open_corrections_setup(self):
+        if self._corrections_setup is None:
+            self._corrections_setup = CorrectionsSetupWindow()
+            self._corrections_setup.apply_signal.connect(
+                lambda params: self.set_correction_parameters(CorrectionParameters.from_dict(params)))
+            self._corrections_setup.close_signal.connect(self.close_corrections_setup)
+            self._corrections_setup.show()
+
+    def close_corrections_setup(self):
+        self._corrections_setup = None
+
+    def open_mask_setup(self):
+        if self._mask_setup is None:
+            self._mask_setup = MaskSetupWindow()
+            self._mask_setup.apply_signal.connect(
+                lambda params: self.set_mask_parameters(MaskParameters.from_dict(params)))
+            self._mask_setup.close_signal.connect(self.close_mask_setup)
+            self._mask_setup.show()
+
+    def close_mask_setup(self):
+        self._mask_setup = None
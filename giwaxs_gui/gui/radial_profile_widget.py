@@ -7,6 +7,7 @@ from scipy.signal import find_peaks
 from scipy.optimize import curve_fit
 
 from PyQt5.QtGui import QColor
+from pyqtgraph import ErrorBarItem, PlotDataItem
 
 from .basic_widgets import (BasicInputParametersWidget, ConfirmButton,
                             RoundedPushButton, PlotWithBaseLineCorrection,
@@ -15,8 +16,9 @@ from .signal_connection import SignalConnector, SignalContainer
 from .roi.roi_widgets import Roi1D
 from .roi.roi_containers import BasicROIContainer
 
+from .global_context import RadialBinningParameters, RADIAL_BINNING_CONFIG_NAME
 from ..config import read_config
-from ..utils import Icon, RoiParameters, show_error
+from ..utils import Icon, RoiParameters, show_error, get_subsampling_step
 
 logger = logging.getLogger(__name__)
 
@@ -24,12 +26,21 @@ logger = logging.getLogger(__name__)
 class RadialProfileWidget(BasicROIContainer, PlotWithBaseLineCorrection):
     _DefaultRoiWidth = 50
     _DefaultNewRoiParameters = dict(radius=10, width=5)
+    _PREVIEW_IMAGE_SIZE = 2 ** 20
+    _SECTOR_COLORS = ('red', 'yellow', 'cyan')
 
     def __init__(self, signal_connector: SignalConnector,
                  parent=None):
         BasicROIContainer.__init__(self, signal_connector)
         PlotWithBaseLineCorrection.__init__(self, parent)
         self._peaks_setup = None
+        self._binning_setup = None
+        self._errors = None
+        self._error_bars = ErrorBarItem(pen=QColor('gray'))
+        self._error_bars.hide()
+        self.image_view.plot_item.addItem(self._error_bars)
+        self._sector_plots = []
+        self.image_view.plot_item.addLegend()
         self._fit_parameters_dict = read_config(PeaksSetupWindow.NAME)
         self.update_image()
 
@@ -54,6 +65,9 @@ class RadialProfileWidget(BasicROIContainer, PlotWithBaseLineCorrection):
         setup_action = fit_toolbar.addAction(Icon('setup'), 'Fit setup')
         setup_action.triggered.connect(self.open_peaks_setup)
 
+        binning_action = fit_toolbar.addAction(Icon('radial_profile'), 'Radial binning')
+        binning_action.triggered.connect(self.open_binning_setup)
+
         segments_toolbar = BlackToolBar('Segments', self)
         self.addToolBar(segments_toolbar)
 
@@ -82,17 +96,22 @@ class RadialProfileWidget(BasicROIContainer, PlotWithBaseLineCorrection):
 
     def process_signal(self, s: SignalContainer):
         update_image = False
-        if s.image_changed() or s.geometry_changed():
+        if s.image_changed() or s.geometry_changed() or s.geometry_changed_finish():
             update_image = True
+        preview = (
+                not s.image_changed() and not s.geometry_changed_finish() and
+                all(signal() for signal in s.geometry_changed())
+        )
 
         BasicROIContainer.process_signal(self, s)
         if update_image:
-            self.update_image()
+            self.update_image(preview)
         elif s.segment_fixed():
             self.plot()
 
     def _on_scale_changed(self):
-        self.update_x_axis()
+        # bins are defined in radial units, so they change with the scale
+        self.update_image()
 
     def find_peaks(self):
         if self.y is None:
@@ -103,8 +122,8 @@ class RadialProfileWidget(BasicROIContainer, PlotWithBaseLineCorrection):
         peaks = find_peaks(self.smoothed_y)[0]
         sc = SignalContainer(app_node=self)
         for i, peak in enumerate(peaks):
-            segment = RoiParameters(peak * self.image.scale, self._DefaultRoiWidth * self.image.scale,
-                                    name=f'Proposed ring {i}')
+            radius, width = self._get_scaled_ring(self.image.q_to_r(self.x[peak]), self._DefaultRoiWidth)
+            segment = RoiParameters(radius, width, name=f'Proposed ring {i}')
             sc.segment_created(segment)
         sc.send()
 
@@ -114,7 +133,7 @@ class RadialProfileWidget(BasicROIContainer, PlotWithBaseLineCorrection):
         if self._fit_parameters_dict.get('sigma_fit', None) is not None:
             self.set_sigma(self._fit_parameters_dict['sigma_fit'])
         sc = SignalContainer(app_node=self)
-        fit_params = FitParameters(self.x, self.smoothed_y, self.image.scale)
+        fit_params = FitParameters(self.x, self.smoothed_y)
         for value in self.get_selected():
             fit_params.add_value(value)
             value = list(fit_params.fit())[0]
@@ -130,7 +149,7 @@ class RadialProfileWidget(BasicROIContainer, PlotWithBaseLineCorrection):
         if self._fit_parameters_dict.get('sigma_fit', None) is not None:
             self.set_sigma(self._fit_parameters_dict['sigma_fit'])
         sc = SignalContainer(app_node=self)
-        fit_params = FitParameters(self.x, self.smoothed_y, self.image.scale)
+        fit_params = FitParameters(self.x, self.smoothed_y)
         fit_params.add_values(self.get_selected())
         for value in fit_params.fit():
             sc.segment_moved(value, signal_type=sc.SignalTypes.broadcast)
@@ -138,11 +157,13 @@ class RadialProfileWidget(BasicROIContainer, PlotWithBaseLineCorrection):
         sc.send()
 
     def _get_default_roi_parameters(self):
-        scale = self.image.scale
-        param_dict = self._DefaultNewRoiParameters.copy()
-        param_dict['radius'] *= scale
-        param_dict['width'] *= scale
-        return RoiParameters(**param_dict)
+        radius, width = self._get_scaled_ring(**self._DefaultNewRoiParameters)
+        return RoiParameters(radius, width)
+
+    def _get_scaled_ring(self, radius: float, width: float):
+        # ring edges are converted, as the scale can be nonlinear
+        r1, r2 = self.image.r_to_q([radius - width / 2, radius + width / 2])
+        return float(r1 + r2) / 2, float(r2 - r1)
 
     def open_peaks_setup(self):
         self._peaks_setup = PeaksSetupWindow()
@@ -156,6 +177,20 @@ class RadialProfileWidget(BasicROIContainer, PlotWithBaseLineCorrection):
     def close_peaks_setup(self):
         self._peaks_setup = None
 
+    def open_binning_setup(self):
+        if self._binning_setup is None:
+            self._binning_setup = RadialBinningSetupWindow()
+            self._binning_setup.apply_signal.connect(self.set_binning_parameters)
+            self._binning_setup.close_signal.connect(self.close_binning_setup)
+            self._binning_setup.show()
+
+    def set_binning_parameters(self, params: dict):
+        self.image.set_radial_binning_parameters(RadialBinningParameters.from_dict(params))
+        self.update_image()
+
+    def close_binning_setup(self):
+        self._binning_setup = None
+
     def emit_create_segment(self, *args):
         BasicROIContainer.emit_create_segment(
             self, self._get_default_roi_parameters()
@@ -177,17 +212,52 @@ class RadialProfileWidget(BasicROIContainer, PlotWithBaseLineCorrection):
     def _remove_item(self, roi):
         self.image_view.plot_item.removeItem(roi)
 
-    def update_image(self):
-        if self.image.rr is None or self.image.image is None:
+    def update_image(self, preview: bool = False):
+        if self.image.r_range is None or self.image.image is None:
             return
-        self.y = get_radial_profile(self.image.image, self.image.rr)
-        self.update_x_axis()
-
-    def update_x_axis(self, plot: bool = True):
-        rr = self.image.rr
-        self.x = np.linspace(rr.min(), rr.max(), self.smoothed_y.size) * self.image.scale
-        if plot:
-            self.plot()
+        step = 1
+        if preview:
+            # coarse profile from a subsampled image
+            step = get_subsampling_step(self.image.image.size, self._PREVIEW_IMAGE_SIZE)
+        profile = self.image.get_radial_profile(step)
+        if profile is None:
+            return
+        self.x, self.y, self._errors = profile.x, profile.y, profile.errors
+        self._set_sector_plots(profile)
+        self.plot()
+
+    def _set_sector_plots(self, profile):
+        # profiles of sectors are shown as they are, smoothing and baseline apply to the main curve
+        if len(self._sector_plots) != len(profile.sectors):
+            self._clear_sector_plots()
+            for sector, color in zip(profile.sectors, self._SECTOR_COLORS * len(profile.sectors)):
+                # plot item adds named curves to its legend
+                sector_plot = PlotDataItem(pen=QColor(color), name=sector.name)
+                self.image_view.plot_item.addItem(sector_plot)
+                self._sector_plots.append(sector_plot)
+        if profile.sector_y is not None:
+            for sector_plot, y in zip(self._sector_plots, profile.sector_y):
+                sector_plot.setData(profile.x, y)
+
+    def _clear_sector_plots(self):
+        for sector_plot in self._sector_plots:
+            self.image_view.plot_item.removeItem(sector_plot)
+        self._sector_plots = []
+
+    def plot(self):
+        super().plot()
+        self._plot_errors()
+
+    def _plot_errors(self):
+        if (
+                self._errors is None or self.smoothed_y is None or
+                not self.image.radial_binning_parameters.error_bars or
+                self._errors.size != self.smoothed_y.size
+        ):
+            self._error_bars.hide()
+            return
+        self._error_bars.setData(x=self.x, y=self.smoothed_y, height=2 * self._errors)
+        self._error_bars.show()
 
 
 class PeaksSetupWindow(BasicInputParametersWidget):
@@ -213,6 +283,42 @@ class PeaksSetupWindow(BasicInputParametersWidget):
     NAME = 'Fitting parameters'
 
 
+class RadialBinningSetupWindow(BasicInputParametersWidget):
+    P = BasicInputParametersWidget.InputParameters
+
+    PARAMETER_TYPES = (P('bins_number', 'Number of bins', int,
+                         'Leave empty for bins about one pixel wide.', True),
+                       P('r_min', 'Minimum radius', float,
+                         'In radial units (q if detector geometry is set).\n'
+                         'Leave empty to start from the nearest pixel.', True),
+                       P('r_max', 'Maximum radius', float,
+                         'In radial units (q if detector geometry is set).\n'
+                         'Leave empty to end at the farthest pixel.', True),
+                       P('log_scale', 'Logarithmic bins', bool),
+                       P('pixel_splitting', 'Pixel splitting', bool,
+                         'Split pixel intensities between bins\n'
+                         '(linear bins only).'),
+                       P('error_bars', 'Show error bars', bool,
+                         'Poisson standard errors of mean intensities.'),
+                       P('sector_width', 'Sector width [deg]', float,
+                         'Width of out-of-plane, 45° and in-plane sectors\n'
+                         'integrated together with the full profile.\n'
+                         'Leave empty to show the full profile only.', True))
+
+    NAME = RADIAL_BINNING_CONFIG_NAME
+
+    def get_parameters_dict(self):
+        parameters_dict = super().get_parameters_dict()
+        if parameters_dict is None:
+            return
+        try:
+            RadialBinningParameters.from_dict(parameters_dict)
+        except ValueError as err:
+            show_error(str(err), 'Wrong radial binning parameters')
+            return
+        return parameters_dict
+
+
 class FitParameters(object):
     _MAXIMUM_NUMBER_OF_PEAKS = 6
 
@@ -238,10 +344,9 @@ class FitParameters(object):
     def init_parameters(self):
         return tuple(self._init_conditions)
 
-    def __init__(self, x, y, scale: float):
+    def __init__(self, x, y):
         self._x = x
         self._y = y
-        self._scale = scale
         self._number_of_rois = 0
         self._upper_bounds = []
         self._lower_bounds = []
@@ -252,8 +357,7 @@ class FitParameters(object):
 
     def add_value(self, value: RoiParameters):
         mu_min, mu_max = value.radius - value.width / 2, value.radius + value.width / 2
-        x1, x2 = (int(mu_min / self._scale),
-                  int(mu_max / self._scale))
+        x1, x2 = np.searchsorted(self._x, (mu_min, mu_max))
         data = self._y[x1:x2]
         if not data.size:
             return
@@ -322,13 +426,3 @@ def multi_gauss(x, *p):
     for i in range(len(p) // 4):
         res += gauss(x, *p[4 * i:(4 * i + 4)])
     return res
-
-
-def get_radial_profile(img, r):
-    assert img.shape == r.shape
-    r = r.astype(np.int)
-
-    tbin = np.bincount(r.ravel(), img.ravel())
-    nr = np.bincount(r.ravel())
-    radial_profile = np.nan_to_num(tbin / nr)
-    return radial_profile
@@ -199,12 +199,15 @@ class Roi2DRect(AbstractROI, RectROI):
 class Roi2DRing(AbstractROI, ROI):
     _USE_BRIGHT_COLOR = True
 
-    def __init__(self, value, parent=None):
+    def __init__(self, value, parent=None, to_pixels=None):
         self._center = (0, 0)
         self._radius = value.radius
         self._width = value.width
         self._angle = value.angle
         self._angle_std = value.angle_std
+        # radii of the drawn circles in scene units
+        self._to_pixels = to_pixels
+        self._inner = self._middle = self._outer = 0
         AbstractROI.__init__(self, value)
         ROI.__init__(
             self, self._center,
@@ -239,16 +242,29 @@ class Roi2DRing(AbstractROI, ROI):
 
     def set_center(self, center: tuple):
         self._center = center
-        d = self._radius + self._width / 2
-        pos = (center[1] - d, center[0] - d)
+        pos = (center[1] - self._outer, center[0] - self._outer)
         self.setPos(pos)
 
     def set_radius(self, radius):
         self._radius = radius
-        s = 2 * radius + self._width
+        self._update_circles()
+        s = 2 * self._outer
         self.setSize((s, s))
         self.set_center(self._center)
 
+    def set_converter(self, to_pixels=None):
+        """
+        Sets a function converting radial values to scene units for nonlinear scales.
+        """
+        self._to_pixels = to_pixels
+        self.set_radius(self._radius)
+
+    def _update_circles(self):
+        radii = (self._radius - self._width / 2, self._radius, self._radius + self._width / 2)
+        if self._to_pixels:
+            radii = self._to_pixels(radii)
+        self._inner, self._middle, self._outer = (float(r) for r in radii)
+
     def set_width(self, width):
         self._width = width
         self.set_radius(self._radius)
@@ -266,11 +282,9 @@ class Roi2DRing(AbstractROI, ROI):
         p.setPen(self.currentPen)
 
         x1, y1 = 0, 0
-        x2, y2 = x1 + self._width, y1 + self._width
-        x3, y3 = x1 + self._width / 2, y1 + self._width / 2
-        d1, d2, d3 = (2 * self._radius + self._width,
-                      2 * self._radius - self._width,
-                      2 * self._radius)
+        x2, y2 = x1 + self._outer - self._inner, y1 + self._outer - self._inner
+        x3, y3 = x1 + self._outer - self._middle, y1 + self._outer - self._middle
+        d1, d2, d3 = 2 * self._outer, 2 * self._inner, 2 * self._middle
 
         # p.scale(self._radius, self._radius)
         r1 = QRectF(x1, y1, d1, d1)
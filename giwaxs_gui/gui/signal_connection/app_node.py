@@ -17,9 +17,10 @@ class AppNode(object):
     def get_lower_connector(self, name: str = None):
         return self.signal_connector.get_lower_connector(name)
 
-    def set_beam_center(self, beam_center: tuple):
-        self.image.set_beam_center(beam_center)
-        self.signal_connector.emit_upward(SignalContainer().geometry_changed(0))
+    def set_beam_center(self, beam_center: tuple, preview: bool = False):
+        # preview geometry changes are sent while the beam center is being dragged
+        self.image.set_beam_center(beam_center, preview)
+        self.signal_connector.emit_upward(SignalContainer().geometry_changed(preview))
 
     def set_image(self, image: ndarray):
         self.image.set_image(image)
@@ -27,6 +28,22 @@ class AppNode(object):
         sc.image_changed(0)
         sc.geometry_changed(0)
 
+    def set_correction_parameters(self, parameters: 'CorrectionParameters'):
+        self.image.set_correction_parameters(parameters)
+        SignalContainer(app_node=self).image_changed(0).send()
+
+    def set_mask_parameters(self, parameters: 'MaskParameters'):
+        self.image.set_mask_parameters(parameters)
+        SignalContainer(app_node=self).image_changed(0).send()
+
+    def add_mask_rois(self, rois: list):
+        self.image.add_mask_rois(rois)
+        SignalContainer(app_node=self).image_changed(0).send()
+
+    def clear_drawn_mask(self):
+        self.image.clear_drawn_mask()
+        SignalContainer(app_node=self).image_changed(0).send()
+
     def add_transformation(self, name: str):
         self.image.add_transformation(name)
         sc = SignalContainer()
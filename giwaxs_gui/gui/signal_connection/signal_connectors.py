@@ -138,9 +138,10 @@ class CentralSignalConnector(SignalConnector):
         return s
 
     def on_scale_changed(self, s: SignalContainer):
-        scale = self.image.scale_change
+        # segments keep their positions on the detector
         for k, v in self.segments_dict.items():
-            self.segments_dict[k] = v._replace(radius=v.radius * scale, width=v.width * scale)
+            r1, r2 = self.image.rescale([v.radius - v.width / 2, v.radius + v.width / 2])
+            self.segments_dict[k] = v._replace(radius=float(r1 + r2) / 2, width=float(r2 - r1))
             s.segment_moved(self.segments_dict[k], add_later=True)
 
     def on_geometry_changed(self, s: SignalContainer):
@@ -3,13 +3,12 @@
 import numpy as np
 import cv2
 
-from .read_edf import read_edf_from_file
+from .readers import (AbstractReader, register_reader, get_reader,
+                      get_available_suffixes)
 
 
-def get_image_from_path(filepath) -> np.array:
-    filepath = str(filepath)
-    if filepath.endswith('.edf'):
-        image = read_edf_from_file(filepath)[0]
-    else:
-        image = np.flip(cv2.imread(filepath, cv2.IMREAD_GRAYSCALE), 0)
-    return image
+def get_image_from_path(filepath, index: int = 0) -> np.array:
+    reader = get_reader(filepath)
+    if reader is not None:
+        return reader.read(filepath, index)
+    return np.flip(cv2.imread(str(filepath), cv2.IMREAD_GRAYSCALE), 0)
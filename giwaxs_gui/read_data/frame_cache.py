@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+import logging
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from ..cache import LRUCache, CACHE_CONFIG_NAME
+from ..config import read_config
+
+__all__ = ['FrameCache', 'get_frame_cache', 'CACHE_CONFIG_NAME']
+
+logger = logging.getLogger(__name__)
+
+_MB = 2 ** 20
+
+
+class FrameCache(LRUCache):
+    """
+    LRU cache of decoded image frames with a memory budget.
+    Memory-mapped frames are stored without copying and accounted by their nbytes.
+    Frames can be prefetched in a thread pool, a frame requested while
+    it is being prefetched is taken from the pending task.
+    """
+
+    def __init__(self, max_size: int, max_workers: int = 2):
+        super().__init__(max_size)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._pending = dict()
+        self._pending_lock = Lock()
+
+    def get_frame(self, key, loader):
+        frame = self.get(key)
+        if frame is not None:
+            return frame
+        with self._pending_lock:
+            future = self._pending.get(key, None)
+        if future is not None:
+            frame = future.result()
+        else:
+            # prefetching could have been finished in the meantime
+            frame = self.get(key)
+        if frame is not None:
+            return frame
+        return self._load(key, loader)
+
+    def prefetch(self, key, loader) -> None:
+        with self._pending_lock:
+            if key in self._pending or key in self:
+                return
+            self._pending[key] = self._executor.submit(self._prefetch, key, loader)
+
+    def _prefetch(self, key, loader):
+        try:
+            return self._load(key, loader)
+        except Exception as err:
+            logger.info(f'Could not prefetch {key}: {err}')
+        finally:
+            with self._pending_lock:
+                self._pending.pop(key, None)
+
+    def _load(self, key, loader):
+        frame = loader()
+        if not isinstance(frame, np.ndarray):
+            return frame
+        if _needs_detaching(frame):
+            frame = np.array(frame)
+        frame.setflags(write=False)
+        self.put(key, frame)
+        return frame
+
+
+def _needs_detaching(frame: np.ndarray) -> bool:
+    # memory-mapped frames are cached as they are, their pages are kept by the OS,
+    # views of larger buffers are copied so that the whole buffer is not kept alive
+    root = frame
+    while isinstance(root.base, np.ndarray):
+        root = root.base
+    if isinstance(root, np.memmap):
+        return False
+    buffer_size = root.nbytes if root.base is None else memoryview(root.base).nbytes
+    return buffer_size > frame.nbytes
+
+
+_FRAME_CACHE = None
+
+
+def get_frame_cache() -> FrameCache:
+    global _FRAME_CACHE
+    if _FRAME_CACHE is None:
+        params = read_config(CACHE_CONFIG_NAME) or dict()
+        _FRAME_CACHE = FrameCache(int(params.get('frame_cache_size', 1024) * _MB))
+    return _FRAME_CACHE
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import sqlite3
+import logging
+from hashlib import md5
+from contextlib import contextmanager
+from pathlib import Path
+
+from .readers import get_reader
+from ..config import get_config_folder
+
+__all__ = ['FolderMetadataIndex', 'read_file_metadata']
+
+logger = logging.getLogger(__name__)
+
+_INDEX_FILENAME = '.giwaxs_index.sqlite'
+_FALLBACK_INDEX_FOLDER_NAME = 'metadata_index'
+_QUERY_CHUNK_SIZE = 500
+
+
+class FolderMetadataIndex(object):
+    """
+    Persistent index of file metadata (edf headers, image shapes, dtypes and
+    h5 dataset layouts) for a single folder.
+    The index is stored in a sqlite sidecar file inside the folder. The sidecar
+    is created only if the folder (and the existing sidecar) is writable;
+    for read-only folders the index is kept in the user config folder.
+    Records are keyed by file name and are valid while mtime and size of the file
+    do not change, so only new or modified files are read on update.
+    """
+
+    @property
+    def folder(self) -> Path:
+        return self._folder
+
+    @property
+    def index_path(self) -> Path:
+        return self._index_path
+
+    def __init__(self, folder: Path):
+        self._folder = Path(folder)
+        self._index_path = self._folder / _INDEX_FILENAME
+        if self._is_writable():
+            try:
+                self._create_table()
+                return
+            except sqlite3.Error as err:
+                logger.warning(f'Could not create metadata index in {self._folder}: {err}')
+        self._index_path = self._get_fallback_index_path()
+        self._create_table()
+
+    def get_metadata(self, filepath: Path) -> dict:
+        return self.update([filepath])[Path(filepath)]
+
+    def update(self, filepaths) -> dict:
+        """
+        Returns {filepath: metadata} for the given files of the folder
+        reading only the files which are not indexed yet or changed since.
+        """
+        filepaths = [Path(p) for p in filepaths]
+        result = dict()
+        new_records = list()
+        with self._connect() as conn:
+            records = self._select(conn, [filepath.name for filepath in filepaths])
+            for filepath in filepaths:
+                try:
+                    stat = filepath.stat()
+                except OSError:
+                    continue
+                record = records.get(filepath.name, None)
+                if record and record[0] == stat.st_mtime and record[1] == stat.st_size:
+                    result[filepath] = json.loads(record[2])
+                    continue
+                metadata = read_file_metadata(filepath)
+                metadata.update(mtime=stat.st_mtime, size=stat.st_size)
+                result[filepath] = metadata
+                new_records.append((filepath.name, stat.st_mtime, stat.st_size,
+                                    json.dumps(metadata)))
+            if new_records:
+                conn.executemany('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)',
+                                 new_records)
+        return result
+
+    @staticmethod
+    def _select(conn, names: list) -> dict:
+        # only the requested records are read, in chunks below the sqlite variables limit
+        records = dict()
+        for i in range(0, len(names), _QUERY_CHUNK_SIZE):
+            chunk = names[i:i + _QUERY_CHUNK_SIZE]
+            query = ('SELECT name, mtime, size, metadata FROM files WHERE name IN '
+                     f'({", ".join("?" * len(chunk))})')
+            records.update((name, (mtime, size, metadata))
+                           for name, mtime, size, metadata in conn.execute(query, chunk))
+        return records
+
+    def remove_missing(self, filepaths) -> None:
+        """
+        Removes records of files which are not in filepaths.
+        """
+        names = set(Path(p).name for p in filepaths)
+        with self._connect() as conn:
+            conn.executemany('DELETE FROM files WHERE name = ?',
+                             [(name,) for name, in conn.execute('SELECT name FROM files')
+                              if name not in names])
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM files')
+
+    def _create_table(self):
+        with self._connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS files ('
+                         'name TEXT PRIMARY KEY, mtime REAL, size INTEGER, metadata TEXT)')
+
+    @contextmanager
+    def _connect(self):
+        # a new connection per call allows using the index from worker threads
+        conn = sqlite3.connect(str(self._index_path))
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _is_writable(self) -> bool:
+        # sqlite also needs to create journal files next to the index
+        if not os.access(str(self._folder), os.W_OK):
+            return False
+        return not self._index_path.exists() or os.access(str(self._index_path), os.W_OK)
+
+    def _get_fallback_index_path(self) -> Path:
+        index_folder = get_config_folder() / _FALLBACK_INDEX_FOLDER_NAME
+        index_folder.mkdir(parents=True, exist_ok=True)
+        folder_hash = md5(str(self._folder.resolve()).encode()).hexdigest()
+        return index_folder / f'{folder_hash}.sqlite'
+
+
+def read_file_metadata(filepath: Path) -> dict:
+    filepath = Path(filepath)
+    reader = get_reader(filepath)
+    if reader is None:
+        return dict()
+    try:
+        return reader.read_header(filepath)
+    except Exception as err:
+        logger.error(f'Could not read metadata of {filepath}: {err}')
+        return dict()
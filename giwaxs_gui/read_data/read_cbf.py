@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+import os
+import logging
+
+import numpy as np
+
+__all__ = ['CbfFile', 'read_cbf', 'read_cbf_header', 'decompress_byte_offset']
+
+logger = logging.getLogger(__name__)
+
+_BINARY_MARKER = b'\x0c\x1a\x04\xd5'
+_HEADER_CHUNK_SIZE = 4096
+_BYTE_OFFSET = 'x-CBF_BYTE_OFFSET'
+
+_ELEMENT_TYPES = {
+    'signed 8-bit integer': np.int8,
+    'unsigned 8-bit integer': np.uint8,
+    'signed 16-bit integer': np.int16,
+    'unsigned 16-bit integer': np.uint16,
+    'signed 32-bit integer': np.int32,
+    'unsigned 32-bit integer': np.uint32,
+    'signed 64-bit integer': np.int64,
+}
+
+# byte-offset escape lengths: 0x80 + int16, 0x80 0x8000 + int32, 0x80 0x8000 0x80000000 + int64
+_ESCAPE_16, _ESCAPE_32, _ESCAPE_64 = 3, 7, 15
+
+
+def read_cbf(filepath) -> np.ndarray:
+    return CbfFile(filepath)[0]
+
+
+class CbfFile(object):
+    """
+    Access to single frame Pilatus-style CBF files compressed with byte-offset algorithm.
+    Only the text header is read on initialization, the binary section is decompressed
+    on request. Images are flipped vertically to match the orientation of other formats.
+    """
+
+    @property
+    def filepath(self) -> str:
+        return self._filepath
+
+    @property
+    def header(self) -> dict:
+        return self._header
+
+    def __init__(self, filepath):
+        self._filepath = str(filepath)
+        if not os.path.isfile(self._filepath):
+            raise FileNotFoundError(f'File {self._filepath} doesn\'t exist')
+        self._header, self._data_offset = _read_header(self._filepath)
+
+    def __len__(self):
+        return 1
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self.get_frame() for _ in range(*item.indices(len(self)))]
+        if item not in (0, -1):
+            raise IndexError(f'Frame index {item} is out of range')
+        return self.get_frame()
+
+    def __iter__(self):
+        yield self.get_frame()
+
+    def get_shape(self) -> tuple:
+        return (int(self._header['X-Binary-Size-Second-Dimension']),
+                int(self._header['X-Binary-Size-Fastest-Dimension']))
+
+    def get_dtype(self) -> np.dtype:
+        element_type = self._header.get('X-Binary-Element-Type', 'signed 32-bit integer')
+        return np.dtype(_ELEMENT_TYPES.get(element_type, np.int32))
+
+    def get_frame(self) -> np.ndarray:
+        conversions = self._header.get('conversions', _BYTE_OFFSET)
+        if conversions != _BYTE_OFFSET:
+            raise ValueError(f'Unsupported CBF compression {conversions}')
+        shape = self.get_shape()
+        with open(self._filepath, 'rb') as f:
+            f.seek(self._data_offset)
+            data = f.read(int(self._header['X-Binary-Size']))
+        image = decompress_byte_offset(data, shape[0] * shape[1], self.get_dtype())
+        return np.flip(image.reshape(shape), 0)
+
+
+def read_cbf_header(filepath) -> dict:
+    header, _ = _read_header(str(filepath))
+    return header
+
+
+def decompress_byte_offset(data: bytes, size: int, dtype=np.int32) -> np.ndarray:
+    """
+    Vectorized decompression of CBF byte-offset compressed data.
+
+    Each value is stored as a difference to the previous one: a single signed byte,
+    or an escape byte -128 followed by a little-endian int16 (which can be escaped
+    by -32768 followed by int32, escaped by -2 ** 31 followed by int64).
+    Bytes equal to -128 inside of escaped values are not escapes themselves, which is
+    resolved by following the chains of overlapping candidates with a jump table.
+    """
+    raw = np.frombuffer(data, dtype=np.uint8)
+    padded = np.zeros(raw.size + _ESCAPE_64, dtype=np.uint8)
+    padded[:raw.size] = raw
+
+    escapes, lengths = _find_escapes(padded, raw.size)
+
+    # bytes following escape bytes are parts of multibyte values
+    is_value_start = np.ones(raw.size, dtype=bool)
+    for length in (_ESCAPE_16, _ESCAPE_32, _ESCAPE_64):
+        positions = escapes[lengths == length]
+        is_value_start[(positions[:, None] + np.arange(1, length)).clip(max=raw.size - 1)] = False
+    skipped_before = np.cumsum(lengths - 1) - (lengths - 1)
+    escape_indices = escapes - skipped_before
+
+    # integer overflow wraps around identically in dtype and in int64
+    deltas = raw.view(np.int8)[is_value_start].astype(dtype)
+    for length, offset, value_type in ((_ESCAPE_16, 1, '<i2'),
+                                       (_ESCAPE_32, 3, '<i4'),
+                                       (_ESCAPE_64, 7, '<i8')):
+        mask = lengths == length
+        if mask.any():
+            deltas[escape_indices[mask]] = _gather_values(padded, escapes[mask] + offset, value_type)
+
+    if deltas.size < size:
+        raise ValueError(f'Compressed data contains {deltas.size} values instead of {size}')
+    return np.cumsum(deltas[:size], dtype=dtype)
+
+
+def _find_escapes(padded: np.ndarray, size: int):
+    candidates = np.flatnonzero(padded[:size] == 0x80)
+    lengths = np.full(candidates.size, _ESCAPE_16, dtype=np.int64)
+    is_32 = (padded[candidates + 1] == 0x00) & (padded[candidates + 2] == 0x80)
+    lengths[is_32] = _ESCAPE_32
+    is_64 = is_32 & (padded[candidates + 3] == 0) & (padded[candidates + 4] == 0) & \
+        (padded[candidates + 5] == 0) & (padded[candidates + 6] == 0x80)
+    lengths[is_64] = _ESCAPE_64
+
+    if not candidates.size:
+        return candidates, lengths
+
+    # candidates outside of the values of all preceding candidates are always escapes
+    # and start chains, the next escape of a chain is the first candidate after the value
+    ends = candidates + lengths
+    preceding_ends = np.maximum.accumulate(ends)
+    is_escape = np.zeros(candidates.size + 1, dtype=bool)
+    is_escape[0] = True
+    is_escape[1:-1] = candidates[1:] >= preceding_ends[:-1]
+
+    # jumps over 2 ** k escapes (the extra last index is the end) mark all escapes
+    # of the chains in log(chain length) vectorized passes
+    jumps = [np.append(np.searchsorted(candidates, ends), candidates.size)]
+    chain_length = np.diff(np.append(np.flatnonzero(is_escape[:-1]), candidates.size)).max()
+    while 2 ** len(jumps) < chain_length:
+        jumps.append(jumps[-1][jumps[-1]])
+    for jump in reversed(jumps):
+        is_escape[jump[np.flatnonzero(is_escape)]] = True
+    is_escape = is_escape[:-1]
+
+    return candidates[is_escape], lengths[is_escape]
+
+
+def _gather_values(padded: np.ndarray, positions: np.ndarray, value_type: str) -> np.ndarray:
+    itemsize = np.dtype(value_type).itemsize
+    indices = positions[:, None] + np.arange(itemsize)
+    return padded[indices].reshape(-1).view(value_type)
+
+
+def _read_header(filepath: str):
+    with open(filepath, 'rb') as f:
+        text = b''
+        position = -1
+        while position == -1:
+            chunk = f.read(_HEADER_CHUNK_SIZE)
+            if not chunk:
+                raise ValueError(f'Binary section is not found in {filepath}')
+            start = max(len(text) - len(_BINARY_MARKER), 0)
+            text += chunk
+            position = text.find(_BINARY_MARKER, start)
+    return _parse_header(text[:position].decode('latin-1')), position + len(_BINARY_MARKER)
+
+
+def _parse_header(text: str) -> dict:
+    header = dict()
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith('X-Binary-') or line.startswith('Content-'):
+            key, _, value = line.partition(':')
+            header[key.strip()] = value.strip().strip('"')
+        elif line.startswith('# '):
+            key, _, value = line[2:].partition(' ')
+            header[key.strip()] = value.strip()
+        elif line.startswith('conversions='):
+            header['conversions'] = line.partition('=')[2].strip('"')
+    return header
@@ -1,36 +1,163 @@
 # -*- coding: utf-8 -*-
 import os
+import io
 import gzip
 import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 
-__all__ = ['read_edf', 'read_edf_header',
-           'read_edf_from_data', 'read_edf_gz',
-           'read_header_from_file', 'read_edf_from_file']
+__all__ = ['EdfFile', 'read_edf', 'read_edf_header',
+           'read_edf_from_data', 'read_edf_gz', 'read_edf_mmap',
+           'read_edf_header_from_gz', 'read_header_from_file',
+           'read_edf_from_file', 'iter_edf_gz_frames']
 
 logger = logging.getLogger(__name__)
 
+_HEADER_BLOCK_SIZE = 512
+
+
+class EdfFile(object):
+    """
+    Lazy access to (multi-frame) edf and edf.gz files.
+    Frame headers are indexed in one pass over the file on initialization,
+    image data is decoded only when a frame is requested.
+    Plain edf frames are returned as read-only np.memmap views.
+    Decompressed edf.gz data are kept only until the first frame is read,
+    other frames are decompressed from the file on request, so that opened files
+    do not hold whole payloads in memory.
+    """
+
+    @property
+    def filepath(self) -> str:
+        return self._filepath
+
+    @property
+    def headers(self) -> list:
+        return [header for _, header in self._frames]
+
+    def __init__(self, filepath):
+        self._filepath = str(filepath)
+        _check_file(self._filepath)
+        self._data = None
+        if self._filepath.endswith('.edf.gz'):
+            self._data = get_data_from_filepath(self._filepath)
+            self._frames = list(_iter_frame_headers(io.BytesIO(self._data)))
+        elif self._filepath.endswith('.edf'):
+            with open(self._filepath, 'rb') as f:
+                self._frames = list(_iter_frame_headers(f))
+        else:
+            raise ValueError('Unknown file type')
+
+    def __len__(self):
+        return len(self._frames)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self.get_frame(i) for i in range(*item.indices(len(self)))]
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError(f'Frame index {item} is out of range')
+        return self.get_frame(item)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.get_frame(i)
+
+    def get_header(self, index: int) -> dict:
+        return self._frames[index][1]
+
+    def get_frame(self, index: int, *, reshape: bool = True) -> np.ndarray:
+        offset, header_dict = self._frames[index]
+        data_offset = offset + header_dict['headerSize']
+
+        if self._data is not None:
+            data, self._data = self._data, None
+            image = _get_frame_from_data(data, data_offset, header_dict, reshape)
+            # a view of a single frame keeps only its own header in memory
+            return image.copy() if len(self._frames) > 1 else image
+        if self._filepath.endswith('.edf.gz'):
+            with gzip.open(self._filepath, 'rb') as f:
+                f.seek(data_offset)
+                data = f.read(_get_frame_nbytes(header_dict))
+            return _get_frame_from_data(data, 0, header_dict, reshape)
+        data = np.memmap(self._filepath, dtype=_get_numpy_type(header_dict['DataType']), mode='r',
+                         offset=data_offset, shape=_get_frame_shape(header_dict))
+        if reshape:
+            return np.rot90(data)
+        return data.reshape(-1)
+
+
+def iter_edf_gz_frames(filepaths, *, max_workers: int = None,
+                       max_pending: int = None, reshape: bool = True):
+    """
+    Decompresses a series of edf.gz files in a thread pool (zlib releases the GIL)
+    and yields (filepath, image, header) for every frame in the order of filepaths.
+    At most max_pending decompressed or scheduled files are kept in memory,
+    new files are submitted only when the consumer takes the results.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    max_pending = max(max_pending or 2 * max_workers, 1)
+    filepaths = iter(filepaths)
+    pending = deque()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        try:
+            for filepath in filepaths:
+                pending.append(executor.submit(_read_edf_gz_frames, str(filepath), reshape))
+                if len(pending) >= max_pending:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
 
 def read_edf_from_file(file_path: str):
+    if str(file_path).endswith('.edf'):
+        return read_edf_mmap(file_path)
     data = get_data_from_filepath(file_path)
     return read_edf_from_data(data)
 
 
 def read_edf_gz(gz_filepath, *, reshape: bool = True):
     _check_file(gz_filepath, '.edf.gz')
-    with gzip.open(gz_filepath, 'rb') as f:
-        data = f.read()
-    return read_edf_from_data(data, reshape=reshape)
+    return read_edf_from_data(get_data_from_filepath(str(gz_filepath)), reshape=reshape)
 
 
-def read_edf(edf_filepath, *, reshape: bool = True):
+def read_edf(edf_filepath, *, reshape: bool = True, mmap: bool = True):
+    if mmap:
+        return read_edf_mmap(edf_filepath, reshape=reshape)
     _check_file(edf_filepath, '.edf')
     with open(edf_filepath, 'rb') as f:
         data = f.read()
     return read_edf_from_data(data, reshape=reshape)
 
 
+def read_edf_mmap(edf_filepath, *, reshape: bool = True):
+    """
+    Reads an uncompressed edf file without copying the image data.
+    Only the header blocks are read from the file, the returned image
+    is a read-only view of a np.memmap over the payload.
+    """
+    _check_file(edf_filepath, '.edf')
+    with open(edf_filepath, 'rb') as f:
+        header_dict = read_header_from_data(_read_header_bytes(f))
+    data_type = _get_numpy_type(header_dict['DataType'])
+    image_shape = (int(header_dict['Dim_2']), int(header_dict['Dim_1']))
+
+    data = np.memmap(edf_filepath, dtype=data_type, mode='r',
+                     offset=header_dict['headerSize'], shape=image_shape)
+    if reshape:
+        data = np.rot90(data)
+    else:
+        data = data.reshape(-1)
+    return data, header_dict
+
+
 def read_edf_from_data(data, *, reshape: bool = True):
     header_dict = read_header_from_data(data)
     header_end_index = header_dict['headerSize']
@@ -48,15 +175,14 @@ def read_edf_from_data(data, *, reshape: bool = True):
 def read_edf_header(edf_filepath):
     _check_file(edf_filepath, '.edf')
     with open(edf_filepath, 'rb') as f:
-        data = f.read()
-    return read_header_from_data(data)
+        return read_header_from_data(_read_header_bytes(f))
 
 
 def read_edf_header_from_gz(gz_filepath):
+    # gzip stream is decompressed only up to the end of the header
     _check_file(gz_filepath, '.edf.gz')
     with gzip.open(gz_filepath, 'rb') as f:
-        data = f.read()
-    return read_header_from_data(data)
+        return read_header_from_data(_read_header_bytes(f))
 
 
 def read_header_from_data(data) -> dict:
@@ -70,8 +196,13 @@ def read_header_from_data(data) -> dict:
 
 
 def read_header_from_file(filepath):
-    data = get_data_from_filepath(filepath)
-    return read_header_from_data(data)
+    filepath = str(filepath)
+    if filepath.endswith('.edf'):
+        return read_edf_header(filepath)
+    elif filepath.endswith('.edf.gz'):
+        return read_edf_header_from_gz(filepath)
+    else:
+        raise ValueError('Unknown file type')
 
 
 def get_data_from_filepath(filepath: str):
@@ -80,12 +211,65 @@ def get_data_from_filepath(filepath: str):
         with open(filepath, 'rb') as f:
             return f.read()
     elif filepath.endswith('.edf.gz'):
-        with gzip.open(filepath, 'rb') as f:
-            return f.read()
+        # a single zlib call on the whole file releases the GIL while decompressing
+        with open(filepath, 'rb') as f:
+            return gzip.decompress(f.read())
     else:
         raise ValueError('Unknown file type')
 
 
+def _read_edf_gz_frames(filepath: str, reshape: bool) -> list:
+    data = get_data_from_filepath(filepath)
+    return [(filepath, _get_frame_from_data(data, offset + header_dict['headerSize'], header_dict, reshape),
+             header_dict) for offset, header_dict in _iter_frame_headers(io.BytesIO(data))]
+
+
+def _get_frame_shape(header_dict: dict) -> tuple:
+    return int(header_dict['Dim_2']), int(header_dict['Dim_1'])
+
+
+def _get_frame_nbytes(header_dict: dict) -> int:
+    return int(np.prod(_get_frame_shape(header_dict))) * np.dtype(_get_numpy_type(header_dict['DataType'])).itemsize
+
+
+def _get_frame_from_data(data: bytes, data_offset: int, header_dict: dict, reshape: bool) -> np.ndarray:
+    image_shape = _get_frame_shape(header_dict)
+    image = np.frombuffer(data, _get_numpy_type(header_dict['DataType']), image_shape[0] * image_shape[1],
+                          data_offset).reshape(image_shape)
+    if reshape:
+        return np.rot90(image)
+    return image.reshape(-1)
+
+
+def _read_header_bytes(f) -> bytes:
+    data = b''
+    while True:
+        block = f.read(_HEADER_BLOCK_SIZE)
+        if not block:
+            raise ValueError('Edf header is not closed')
+        # the closing sequence could be split between two blocks
+        search_start = max(len(data) - 1, 0)
+        data += block
+        if data.find(b'}\n', search_start) != -1:
+            return data
+
+
+def _iter_frame_headers(f):
+    offset = 0
+    while True:
+        f.seek(offset)
+        if not f.read(1):
+            return
+        f.seek(offset)
+        try:
+            header_dict = read_header_from_data(_read_header_bytes(f))
+        except ValueError:
+            logger.error(f'Could not read edf frame header at {offset} bytes')
+            return
+        yield offset, header_dict
+        offset += header_dict['headerSize'] + int(header_dict['Size'])
+
+
 def _get_header_dict(header):
     header_dict = {}
     raw_list = header.replace('\n', '').strip(). \
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+import logging
+from pathlib import Path
+
+import numpy as np
+import h5py
+
+__all__ = ['NexusFile', 'read_h5_layout']
+
+logger = logging.getLogger(__name__)
+
+_NEXUS_DATA_KEY = 'entry/data'
+
+
+class NexusFile(object):
+    """
+    Lazy access to image frames of NeXus/HDF5 master files.
+    Frames are taken from 3d (or 2d) datasets of the 'entry/data' group
+    (external links to data files are followed), or from all image datasets
+    of the file if there is no such group. Only requested frames are read.
+    """
+
+    @property
+    def filepath(self) -> str:
+        return self._filepath
+
+    @property
+    def datasets(self) -> list:
+        return [key for key, _ in self._datasets]
+
+    def __init__(self, filepath):
+        self._filepath = str(filepath)
+        with h5py.File(self._filepath, 'r') as f:
+            self._datasets = _find_image_datasets(f)
+        self._first_frames = np.cumsum([0] + [n for _, n in self._datasets])
+
+    def __len__(self):
+        return int(self._first_frames[-1])
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self.get_frame(i) for i in range(*item.indices(len(self)))]
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError(f'Frame index {item} is out of range')
+        return self.get_frame(item)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.get_frame(i)
+
+    def get_frame(self, index: int) -> np.ndarray:
+        dataset_index = int(np.searchsorted(self._first_frames, index, side='right')) - 1
+        key, _ = self._datasets[dataset_index]
+        with h5py.File(self._filepath, 'r') as f:
+            dset = f[key]
+            if dset.ndim == 2:
+                return dset[()]
+            return dset[index - self._first_frames[dataset_index]]
+
+
+def read_h5_layout(filepath) -> dict:
+    datasets = dict()
+
+    def add_dataset(name, item):
+        if isinstance(item, h5py.Dataset):
+            datasets[name] = dict(shape=list(item.shape), dtype=str(item.dtype))
+
+    with h5py.File(str(filepath), 'r') as f:
+        f.visititems(add_dataset)
+    return datasets
+
+
+def _find_image_datasets(f: h5py.File) -> list:
+    datasets = list()
+    if _NEXUS_DATA_KEY in f:
+        group = f[_NEXUS_DATA_KEY]
+        for key in sorted(group.keys()):
+            try:
+                _add_image_dataset(datasets, f'{_NEXUS_DATA_KEY}/{key}', group[key])
+            except KeyError:
+                logger.info(f'Could not follow link {key} in {Path(f.filename).name}')
+    if not datasets:
+        f.visititems(lambda name, item: _add_image_dataset(datasets, name, item))
+    return datasets
+
+
+def _add_image_dataset(datasets: list, key: str, item):
+    # key is used instead of item.name, which is the path in the linked file
+    if isinstance(item, h5py.Dataset):
+        if item.ndim == 3:
+            datasets.append((key, item.shape[0]))
+        elif item.ndim == 2:
+            datasets.append((key, 1))
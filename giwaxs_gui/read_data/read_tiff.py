@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+import os
+import struct
+import logging
+
+import numpy as np
+import cv2
+
+__all__ = ['TiffFile', 'read_tiff']
+
+logger = logging.getLogger(__name__)
+
+_IMAGE_WIDTH = 256
+_IMAGE_LENGTH = 257
+_BITS_PER_SAMPLE = 258
+_COMPRESSION = 259
+_STRIP_OFFSETS = 273
+_SAMPLES_PER_PIXEL = 277
+_ROWS_PER_STRIP = 278
+_STRIP_BYTE_COUNTS = 279
+_PLANAR_CONFIGURATION = 284
+_TILE_WIDTH = 322
+_SAMPLE_FORMAT = 339
+
+_TAG_TYPES = {1: 'B', 3: 'H', 4: 'I', 6: 'b', 8: 'h', 9: 'i', 16: 'Q'}
+_TAG_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4,
+                   10: 8, 11: 4, 12: 8, 16: 8}
+_SAMPLE_FORMATS = {1: 'u', 2: 'i', 3: 'f'}
+
+
+def read_tiff(filepath, page: int = 0) -> np.ndarray:
+    return TiffFile(filepath)[page]
+
+
+class TiffFile(object):
+    """
+    Lazy access to (multi-page) tiff files keeping the native data type.
+    Only image file directories are read on initialization.
+    Uncompressed pages with contiguous strips are returned as read-only np.memmap views,
+    pages with scattered strips are read directly into the resulting array.
+    Compressed and tiled pages are decoded by OpenCV.
+    Images are flipped vertically to match the orientation of other formats.
+    """
+
+    @property
+    def filepath(self) -> str:
+        return self._filepath
+
+    @property
+    def pages(self) -> list:
+        return self._pages
+
+    def __init__(self, filepath):
+        self._filepath = str(filepath)
+        if not os.path.isfile(self._filepath):
+            raise FileNotFoundError(f'File {self._filepath} doesn\'t exist')
+        with open(self._filepath, 'rb') as f:
+            self._byte_order, self._pages = _read_pages(f)
+
+    def __len__(self):
+        return len(self._pages)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self.get_page(i) for i in range(*item.indices(len(self)))]
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError(f'Page index {item} is out of range')
+        return self.get_page(item)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.get_page(i)
+
+    def get_dtype(self, index: int) -> np.dtype or None:
+        tags = self._pages[index]
+        bits = tags.get(_BITS_PER_SAMPLE, (1,))[0]
+        sample_format = _SAMPLE_FORMATS.get(tags.get(_SAMPLE_FORMAT, (1,))[0], None)
+        if sample_format is None or bits % 8:
+            return
+        try:
+            return np.dtype(f'{self._byte_order}{sample_format}{bits // 8}')
+        except TypeError:
+            return
+
+    def get_shape(self, index: int) -> tuple:
+        tags = self._pages[index]
+        return tags[_IMAGE_LENGTH][0], tags[_IMAGE_WIDTH][0]
+
+    def get_page(self, index: int) -> np.ndarray:
+        if self._is_raw(index):
+            image = self._read_raw(index)
+        else:
+            image = self._read_with_cv2(index)
+        return np.flip(image, 0)
+
+    def _is_raw(self, index: int) -> bool:
+        tags = self._pages[index]
+        return (
+                tags.get(_COMPRESSION, (1,))[0] == 1 and
+                tags.get(_SAMPLES_PER_PIXEL, (1,))[0] == 1 and
+                _TILE_WIDTH not in tags and
+                _STRIP_OFFSETS in tags and
+                self.get_dtype(index) is not None
+        )
+
+    def _read_raw(self, index: int) -> np.ndarray:
+        tags = self._pages[index]
+        dtype, shape = self.get_dtype(index), self.get_shape(index)
+        offsets, counts = tags[_STRIP_OFFSETS], tags.get(_STRIP_BYTE_COUNTS, None)
+        size = shape[0] * shape[1] * dtype.itemsize
+        if counts is None:
+            counts = (size,)
+
+        if all(o1 + c == o2 for o1, c, o2 in zip(offsets, counts, offsets[1:])):
+            return np.memmap(self._filepath, dtype=dtype, mode='r',
+                             offset=offsets[0], shape=shape)
+
+        image = np.empty(shape, dtype=dtype)
+        buffer = memoryview(image.reshape(-1).view(np.uint8))
+        position = 0
+        with open(self._filepath, 'rb') as f:
+            for offset, count in zip(offsets, counts):
+                count = min(count, size - position)
+                f.seek(offset)
+                f.readinto(buffer[position:position + count])
+                position += count
+        return image
+
+    def _read_with_cv2(self, index: int) -> np.ndarray:
+        success, images = cv2.imreadmulti(self._filepath, start=index, count=1,
+                                          flags=cv2.IMREAD_UNCHANGED)
+        if not success or not images:
+            raise ValueError(f'Could not read page {index} of {self._filepath}')
+        image = images[0]
+        if image.ndim == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        return image
+
+
+def _read_pages(f):
+    header = f.read(8)
+    if header[:2] == b'II':
+        byte_order = '<'
+    elif header[:2] == b'MM':
+        byte_order = '>'
+    else:
+        raise ValueError('File is not a tiff file')
+    version, = struct.unpack(byte_order + 'H', header[2:4])
+    if version == 42:
+        offset, = struct.unpack(byte_order + 'I', header[4:8])
+        entry_format, count_format, offset_format = 'HHII', 'H', 'I'
+    elif version == 43:
+        f.seek(8)
+        offset, = struct.unpack(byte_order + 'Q', f.read(8))
+        entry_format, count_format, offset_format = 'HHQQ', 'Q', 'Q'
+    else:
+        raise ValueError(f'Unknown tiff version {version}')
+
+    count_size = struct.calcsize(count_format)
+    entry_size = struct.calcsize(byte_order + entry_format)
+    value_size = struct.calcsize(offset_format)
+    pages = list()
+    visited = set()
+
+    while offset and offset not in visited:
+        visited.add(offset)
+        f.seek(offset)
+        number_of_entries, = struct.unpack(byte_order + count_format, f.read(count_size))
+        entries = f.read(number_of_entries * entry_size)
+        tags = dict()
+        for i in range(number_of_entries):
+            tag, tag_type, count, value = struct.unpack_from(
+                byte_order + entry_format, entries, i * entry_size)
+            if tag_type not in _TAG_TYPES:
+                continue
+            tags[tag] = _read_tag_values(f, byte_order, tag_type, count, value,
+                                         entries, i * entry_size + entry_size - value_size,
+                                         value_size)
+        pages.append(tags)
+        offset, = struct.unpack(byte_order + offset_format, f.read(value_size))
+    return byte_order, pages
+
+
+def _read_tag_values(f, byte_order, tag_type, count, value, entries, value_position, value_size):
+    size = _TAG_TYPE_SIZES[tag_type] * count
+    if size <= value_size:
+        data = entries[value_position:value_position + size]
+    else:
+        position = f.tell()
+        f.seek(value)
+        data = f.read(size)
+        f.seek(position)
+    return tuple(np.frombuffer(data, np.dtype(byte_order + _TAG_TYPES[tag_type]), count).tolist())
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+import logging
+from abc import abstractmethod
+from pathlib import Path
+
+import numpy as np
+
+from .read_edf import EdfFile, read_header_from_file, _get_numpy_type
+from .read_tiff import TiffFile
+from .read_h5 import NexusFile, read_h5_layout
+from .read_cbf import CbfFile
+
+__all__ = ['AbstractReader', 'EdfReader', 'TiffReader', 'NexusReader', 'H5Reader', 'CbfReader',
+           'register_reader', 'get_reader', 'get_readers', 'get_available_suffixes']
+
+logger = logging.getLogger(__name__)
+
+
+class AbstractReader(object):
+    """
+    Reader of a detector image format. Each reader declares file suffixes
+    it is responsible for and provides a header-only probe (read_header),
+    a lazy frame accessor (open) and a read of a single frame (read), which
+    does not copy the data where the format allows it.
+    New formats are added by subclassing AbstractReader and calling register_reader.
+    """
+    NAME: str = ''
+    SUFFIXES: tuple = ()
+    # files browsed as h5 group trees in the file manager
+    IS_H5_CONTAINER: bool = False
+
+    def match(self, filepath: Path) -> bool:
+        name = Path(filepath).name
+        return any(name.endswith(suffix) for suffix in self.SUFFIXES)
+
+    @abstractmethod
+    def read_header(self, filepath: Path) -> dict:
+        """
+        Returns file metadata without reading image data.
+        """
+        pass
+
+    @abstractmethod
+    def open(self, filepath: Path):
+        """
+        Returns a lazy sequence of frames supporting len() and indexing.
+        """
+        pass
+
+    def read(self, filepath: Path, index: int = 0) -> np.ndarray:
+        return self.open(filepath)[index]
+
+
+class EdfReader(AbstractReader):
+    NAME = 'edf'
+    SUFFIXES = ('.edf', '.edf.gz')
+
+    def read_header(self, filepath: Path) -> dict:
+        header = read_header_from_file(filepath)
+        return dict(
+            header=header,
+            # images are rotated by read_edf
+            shape=[int(header['Dim_1']), int(header['Dim_2'])],
+            dtype=_get_numpy_type(header['DataType']).__name__
+        )
+
+    def open(self, filepath: Path) -> EdfFile:
+        return EdfFile(filepath)
+
+
+class TiffReader(AbstractReader):
+    NAME = 'tiff'
+    SUFFIXES = ('.tif', '.tiff')
+
+    def read_header(self, filepath: Path) -> dict:
+        tiff_file = TiffFile(filepath)
+        dtype = tiff_file.get_dtype(0)
+        return dict(
+            shape=list(tiff_file.get_shape(0)),
+            dtype=dtype.name if dtype is not None else 'unknown',
+            pages=len(tiff_file)
+        )
+
+    def open(self, filepath: Path) -> TiffFile:
+        return TiffFile(filepath)
+
+
+class CbfReader(AbstractReader):
+    NAME = 'cbf'
+    SUFFIXES = ('.cbf',)
+
+    def read_header(self, filepath: Path) -> dict:
+        cbf_file = CbfFile(filepath)
+        return dict(
+            header=cbf_file.header,
+            shape=list(cbf_file.get_shape()),
+            dtype=cbf_file.get_dtype().name
+        )
+
+    def open(self, filepath: Path) -> CbfFile:
+        return CbfFile(filepath)
+
+
+class NexusReader(AbstractReader):
+    NAME = 'NeXus'
+    SUFFIXES = ('.nxs', '_master.h5')
+
+    def read_header(self, filepath: Path) -> dict:
+        return dict(datasets=read_h5_layout(filepath))
+
+    def open(self, filepath: Path) -> NexusFile:
+        return NexusFile(filepath)
+
+
+class H5Reader(NexusReader):
+    NAME = 'h5'
+    SUFFIXES = ('.h5', '.hdf5')
+    IS_H5_CONTAINER = True
+
+
+_READERS = list()
+
+
+def register_reader(reader: AbstractReader) -> AbstractReader:
+    """
+    Registers a reader instance. Readers registered later take precedence
+    over earlier ones for matching suffixes.
+    """
+    _READERS.insert(0, reader)
+    return reader
+
+
+def get_reader(filepath: Path) -> AbstractReader or None:
+    for reader in _READERS:
+        if reader.match(filepath):
+            return reader
+
+
+def get_readers() -> tuple:
+    return tuple(_READERS)
+
+
+def get_available_suffixes() -> tuple:
+    return tuple(suffix for reader in reversed(_READERS) for suffix in reader.SUFFIXES)
+
+
+register_reader(H5Reader())
+register_reader(NexusReader())
+register_reader(TiffReader())
+register_reader(CbfReader())
+register_reader(EdfReader())
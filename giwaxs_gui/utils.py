@@ -4,6 +4,8 @@ from typing import NamedTuple
 from pathlib import Path
 from enum import Enum, auto
 
+import numpy as np
+
 from PyQt5.QtWidgets import (QGraphicsColorizeEffect, QLineEdit,
                              QWidget, QApplication, QMessageBox)
 from PyQt5.QtCore import QPropertyAnimation, Qt
@@ -120,3 +122,11 @@ def color_animation(widget: QWidget, color=Qt.red):
     widget.animation.setLoopCount(1)
     widget.animation.setDuration(1500)
     widget.animation.start()
+
+
+def get_subsampling_step(size: int, max_size: int) -> int:
+    """
+    Returns the smallest step along both axes reducing a 2d array of the given size
+    to no more than max_size elements.
+    """
+    return max(int(np.ceil(np.sqrt(size / max_size))), 1)
@@ -1 +1,4 @@
 from .config import *
+from .edf import *
+from .cbf import *
+from .tiff import *
@@ -0,0 +1,51 @@
+import struct
+
+import numpy as np
+
+__all__ = ['compress_byte_offset', 'write_cbf']
+
+
+def compress_byte_offset(values: np.ndarray) -> bytes:
+    data = bytearray()
+    previous = 0
+    for value in values.ravel().tolist():
+        delta, previous = value - previous, value
+        if abs(delta) < 128:
+            data += struct.pack('<b', delta)
+        elif abs(delta) < 2 ** 15:
+            data += b'\x80' + struct.pack('<h', delta)
+        elif abs(delta) < 2 ** 31:
+            data += b'\x80\x00\x80' + struct.pack('<i', delta)
+        else:
+            data += b'\x80\x00\x80\x00\x00\x00\x80' + struct.pack('<q', delta)
+    return bytes(data)
+
+
+def write_cbf(filepath, image: np.ndarray):
+    data = compress_byte_offset(image)
+    header = '\r\n'.join([
+        '###CBF: VERSION 1.5',
+        'data_test',
+        '_array_data.header_convention "PILATUS_1.2"',
+        '_array_data.header_contents',
+        ';',
+        '# Exposure_time 1.0 s',
+        ';',
+        '_array_data.data',
+        ';',
+        '--CIF-BINARY-FORMAT-SECTION--',
+        'Content-Type: application/octet-stream;',
+        '     conversions="x-CBF_BYTE_OFFSET"',
+        'Content-Transfer-Encoding: BINARY',
+        f'X-Binary-Size: {len(data)}',
+        'X-Binary-ID: 1',
+        'X-Binary-Element-Type: "signed 32-bit integer"',
+        'X-Binary-Element-Byte-Order: LITTLE_ENDIAN',
+        f'X-Binary-Number-of-Elements: {image.size}',
+        f'X-Binary-Size-Fastest-Dimension: {image.shape[1]}',
+        f'X-Binary-Size-Second-Dimension: {image.shape[0]}',
+        'X-Binary-Size-Padding: 4095',
+        '',
+        ''
+    ]).encode()
+    filepath.write_bytes(header + b'\x0c\x1a\x04\xd5' + data + b'\x00' * 4095 + b'\r\n--CIF-BINARY-FORMAT-SECTION----\r\n;\r\n')
@@ -22,7 +22,17 @@ def tmp_user_config_dir(create_tmp_user_config_dir, monkeypatch):
 DEFAULT_CONFIG_PARAMS = (
     ('Baseline correction', {"smoothness_param": 1000, "asymmetry_param": 0.01}),
     ('Fitting parameters', {"max_peaks_number": 20, "init_width": 30.0, "sigma_find": 8.0, "sigma_fit": None}),
-    ('Interpolation parameters', {"r_size": 512, "phi_size": 512, "mode": "Bilinear"})
+    ('Interpolation parameters', {"r_size": 512, "phi_size": 512, "mode": "Bilinear"}),
+    ('Cache parameters', {"frame_cache_size": 1024, "prefetch_number": 3,
+                           "geometry_cache_size": 256, "integration_cache_size": 1024,
+                           "binning_cache_size": 512}),
+    ('Detector geometry', {"distance": None, "pixel_size": None, "wavelength": None,
+                           "incidence_angle": 0.0, "tilt": 0.0}),
+    ('Intensity corrections', {"solid_angle": False, "polarization_factor": None,
+                               "flat_field": None, "dark_current": None}),
+    ('Radial binning', {"bins_number": None, "r_min": None, "r_max": None, "log_scale": False,
+                        "pixel_splitting": False, "error_bars": False, "sector_width": None}),
+    ('Detector mask', {"mask_file": None, "min_intensity": None, "max_intensity": None, "horizon": False})
 )
 
 USER_CONFIG_INTERPOLATED_PARAMS = (
@@ -0,0 +1,42 @@
+import gzip
+
+import numpy as np
+import pytest
+
+__all__ = ['write_edf_frame', 'edf_image', 'edf_filepath', 'edf_gz_filepath']
+
+
+def write_edf_frame(image: np.ndarray, **header) -> bytes:
+    """Encodes image as a single edf frame with a 1024 bytes header."""
+    header_dict = {
+        'HeaderID': 'EH:000001:000000:000000',
+        'ByteOrder': 'LowByteFirst',
+        'DataType': 'UnsignedShort',
+        'Dim_1': image.shape[1],
+        'Dim_2': image.shape[0],
+        'Size': image.nbytes,
+    }
+    header_dict.update(header)
+    header_str = '{\n' + ''.join(f'{k} = {v} ;\n' for k, v in header_dict.items())
+    header_bytes = header_str.encode().ljust(1022, b' ') + b'}\n'
+    return header_bytes + image.tobytes()
+
+
+@pytest.fixture(scope='session')
+def edf_image():
+    return np.arange(12 * 20, dtype=np.uint16).reshape(12, 20)
+
+
+@pytest.fixture()
+def edf_filepath(tmp_path, edf_image):
+    filepath = tmp_path / 'image.edf'
+    filepath.write_bytes(write_edf_frame(edf_image, ExposureTime=0.5))
+    return filepath
+
+
+@pytest.fixture()
+def edf_gz_filepath(tmp_path, edf_image):
+    filepath = tmp_path / 'image.edf.gz'
+    with gzip.open(filepath, 'wb') as f:
+        f.write(write_edf_frame(edf_image, ExposureTime=0.5))
+    return filepath
@@ -0,0 +1,44 @@
+import struct
+
+__all__ = ['write_tiff']
+
+
+def write_tiff(filepath, images, rows_per_strip: int = 2):
+    """
+    Writes uncompressed little-endian tiff pages with strips
+    stored in reversed order (not contiguous).
+    """
+    data = bytearray(b'II' + struct.pack('<HI', 42, 0))
+    ifd_offsets = []
+    for image in images:
+        strips = [image[i:i + rows_per_strip].tobytes()
+                  for i in range(0, image.shape[0], rows_per_strip)]
+        strip_offsets = [0] * len(strips)
+        for i in reversed(range(len(strips))):
+            strip_offsets[i] = len(data)
+            data += strips[i]
+        offsets_position = len(data)
+        data += struct.pack(f'<{len(strips)}I', *strip_offsets)
+        counts_position = len(data)
+        data += struct.pack(f'<{len(strips)}I', *map(len, strips))
+        entries = [
+            (256, 4, 1, image.shape[1]),
+            (257, 4, 1, image.shape[0]),
+            (258, 3, 1, image.dtype.itemsize * 8),
+            (259, 3, 1, 1),
+            (273, 4, len(strips), offsets_position),
+            (277, 3, 1, 1),
+            (278, 4, 1, rows_per_strip),
+            (279, 4, len(strips), counts_position),
+            (339, 3, 1, {'u': 1, 'i': 2, 'f': 3}[image.dtype.kind]),
+        ]
+        ifd_offsets.append(len(data))
+        data += struct.pack('<H', len(entries))
+        for entry in entries:
+            data += struct.pack('<HHII', *entry)
+        data += struct.pack('<I', 0)
+    struct.pack_into('<I', data, 4, ifd_offsets[0])
+    for i, ifd_offset in enumerate(ifd_offsets[:-1]):
+        number_of_entries, = struct.unpack_from('<H', data, ifd_offset)
+        struct.pack_into('<I', data, ifd_offset + 2 + number_of_entries * 12, ifd_offsets[i + 1])
+    filepath.write_bytes(bytes(data))
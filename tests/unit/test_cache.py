@@ -0,0 +1,56 @@
+import numpy as np
+
+from giwaxs_gui.cache import LRUCache
+from giwaxs_gui.read_data.frame_cache import FrameCache
+
+
+def test_lru_cache_memory_budget():
+    """
+    LRUCache should evict least recently used values when the memory budget is exceeded.
+    """
+    cache = LRUCache(max_size=250)
+    for key in range(3):
+        cache.put(key, np.zeros(100, dtype=np.uint8))
+    assert 0 not in cache
+    cache.get(1)
+    cache.put(3, np.zeros(100, dtype=np.uint8))
+    assert 1 in cache and 2 not in cache and 3 in cache
+    assert cache.size == 200
+    cache.put(4, np.zeros(1000, dtype=np.uint8))
+    assert 4 not in cache
+
+
+def test_frame_cache_prefetch():
+    """
+    FrameCache should not call loader again for prefetched frames.
+    """
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return np.ones((10, 10))
+
+    cache = FrameCache(max_size=10 ** 6)
+    cache.prefetch('frame', loader)
+    frame = cache.get_frame('frame', loader)
+    assert len(calls) == 1
+    assert not frame.flags.writeable
+    np.testing.assert_array_equal(frame, np.ones((10, 10)))
+
+
+def test_frame_cache_keeps_memmaps(tmp_path):
+    """
+    FrameCache should store memory-mapped frames without copying and copy views of larger buffers.
+    """
+    filepath = tmp_path / 'frame.raw'
+    np.arange(200, dtype=np.float32).tofile(filepath)
+    cache = FrameCache(max_size=10 ** 6)
+
+    frame = cache.get_frame('memmap', lambda: np.rot90(np.memmap(filepath, np.float32, 'r', shape=(10, 20))))
+    assert isinstance(frame.base, np.memmap) or isinstance(frame, np.memmap)
+    assert cache.size == frame.nbytes == 800
+
+    buffer = np.zeros((100, 20))
+    frame = cache.get_frame('view', lambda: buffer[:10])
+    assert frame.base is None and not frame.flags.writeable
+    assert cache.size == 800 + frame.nbytes
@@ -0,0 +1,51 @@
+import os
+
+import numpy as np
+
+from giwaxs_gui.gui.global_context import (Geometry, DetectorGeometry, DetectorParameters,
+                                           CorrectionParameters, IntensityCorrection)
+
+from tests.fixures.cbf import write_cbf
+
+
+def test_intensity_correction(tmp_path):
+    """
+    IntensityCorrection should subtract dark current and divide by flat field,
+    solid angle and polarization maps transformed as the image.
+    """
+    shape = (30, 40)
+    rng = np.random.default_rng(0)
+    dark = rng.integers(0, 10, shape).astype(np.int32)
+    flat = rng.integers(50, 150, shape).astype(np.int32)
+    flat[0, 0] = 0
+    write_cbf(tmp_path / 'dark.cbf', np.flip(dark, 0))
+    write_cbf(tmp_path / 'flat.cbf', np.flip(flat, 0))
+    transformations = ('rotate_right', 'horizontal')
+    dark, flat = np.fliplr(np.rot90(dark, -1)), np.fliplr(np.rot90(flat, -1))
+
+    detector_geometry = DetectorGeometry.get(Geometry.get(dark.shape, (5, 20)),
+                                             DetectorParameters(50., 0.172, 1.))
+    parameters = CorrectionParameters(True, 0.9, str(tmp_path / 'flat.cbf'), str(tmp_path / 'dark.cbf'))
+    correction = IntensityCorrection.get(parameters, dark.shape, transformations, detector_geometry)
+    assert IntensityCorrection.get(parameters, dark.shape, list(transformations), detector_geometry) is correction
+
+    image = rng.poisson(100, dark.shape)
+    result = correction.apply(image)
+    valid = flat > 0
+    expected = (image - dark)[valid] / flat[valid] / (
+            detector_geometry.solid_angle * detector_geometry.get_polarization(0.9))[valid]
+    assert result.dtype == np.float32
+    assert np.allclose(result[valid], expected, rtol=1e-5)
+    assert np.all(result[~valid] == 0)
+
+    out = np.empty(dark.shape, dtype=np.float32)
+    assert correction.apply(image, out=out) is out
+    assert np.array_equal(out, result)
+    assert not CorrectionParameters()
+
+    # rewritten calibration files are read again
+    write_cbf(tmp_path / 'dark.cbf', np.zeros(shape, dtype=np.int32))
+    os.utime(tmp_path / 'dark.cbf', (0, 1))
+    updated = IntensityCorrection.get(parameters, dark.shape, transformations, detector_geometry)
+    assert updated is not correction
+    assert not updated.dark.any()
@@ -0,0 +1,233 @@
+import pytest
+import numpy as np
+import cv2
+
+from giwaxs_gui.gui.global_context import (Geometry, DetectorGeometry, DetectorParameters,
+                                           RadialBinningParameters, get_binning_cache)
+
+
+def test_geometry_is_cached():
+    """
+    Geometry.get should return the same instance for the same shape and beam center.
+    """
+    geometry = Geometry.get((30, 40), (10, 5))
+    assert Geometry.get([30, 40], [10, 5]) is geometry
+    assert Geometry.get((30, 40), (10, 6)) is not geometry
+
+
+def test_geometry_arrays():
+    shape, center = (30, 40), (10.5, 5)
+    geometry = Geometry.get(shape, center)
+    xx, yy = np.meshgrid(np.arange(shape[1]) - center[1], np.arange(shape[0]) - center[0])
+    assert np.allclose(geometry.xx, xx)
+    assert np.allclose(geometry.yy, yy)
+    assert np.allclose(geometry.rr, np.sqrt(xx ** 2 + yy ** 2))
+    assert np.allclose(geometry.phi, np.arctan2(yy, xx))
+    assert not geometry.rr.flags.writeable
+    assert np.allclose(geometry.get_rr(3), geometry.rr[::3, ::3])
+    assert Geometry().rr is None
+
+
+@pytest.mark.parametrize('center', [(10.5, 5), (0, 0), (-20, 15.3), (15, -30), (45, 60), (29, 39)])
+def test_geometry_ranges(center):
+    """
+    Radius and angle ranges should be calculated without coordinate maps.
+    """
+    geometry = Geometry((30, 40), center)
+    assert np.allclose(geometry.r_range, (geometry.rr.min(), geometry.rr.max()))
+    assert np.allclose(geometry.phi_range, (geometry.phi.min(), geometry.phi.max()))
+    assert geometry.rr.dtype == np.float32
+
+
+def test_interpolation_geometry_is_cached():
+    """
+    InterpolationGeometry.get should reuse maps calculated for the same geometry.
+    """
+    from giwaxs_gui.gui.interpolation.interpolation import InterpolationGeometry
+
+    geometry = Geometry.get((30, 40), (10, 5))
+    interpolation_geometry = InterpolationGeometry.get(geometry, 20, 10)
+    InterpolationGeometry.get(Geometry.get((30, 40), (11, 5)), 20, 10)
+    assert InterpolationGeometry.get(geometry, 20, 10) is interpolation_geometry
+    assert InterpolationGeometry.get(geometry, 20, 11) is not interpolation_geometry
+    assert interpolation_geometry.map1.shape == (10, 20, 2)
+
+
+def test_interpolate_region():
+    """
+    Interpolation of a region should match the corresponding part of the full interpolation.
+    """
+    from giwaxs_gui.gui.interpolation.interpolation import Interpolation
+
+    image = np.random.default_rng(0).random((60, 80)).astype(np.float32)
+    interpolation = Interpolation()
+    interpolation.set_geometry(Geometry.get(image.shape, (20, 30)), r_size=64, phi_size=32)
+    full_image = interpolation.interpolate(image)
+    r_axis, phi_axis = interpolation.interpolation_geometry.r, interpolation.interpolation_geometry.p
+
+    r, phi, region = interpolation.interpolate_region(
+        image, (r_axis[10], r_axis[41]), (phi_axis[5], phi_axis[20]), r_size=32, phi_size=16)
+    assert region.shape == (16, 32)
+    assert np.allclose(region, full_image[5:21, 10:42], atol=1e-2)
+    assert np.allclose(phi, np.rad2deg(phi_axis[5:21]))
+
+
+def test_radial_binning():
+    """
+    Radial profile from the cached binning should average pixels by the integer part of radius.
+    """
+    geometry = Geometry.get((300, 200), (250.5, -20))
+    binning = geometry.get_radial_binning()
+    assert geometry.get_radial_binning() is binning
+    image = np.random.default_rng(0).poisson(10, geometry.shape).astype(np.float32)
+    index = geometry.rr.astype(int).ravel()
+    counts = np.bincount(index)
+    expected = np.bincount(index, image.ravel().astype(float))[counts > 0] / counts[counts > 0]
+    profile = binning.get_profile(image)
+    assert np.allclose(profile[counts > 0], expected)
+    assert np.all(profile[counts == 0] == 0)
+    assert geometry.get_radial_binning(2).get_profile(image[::2, ::2]).size == \
+        geometry.get_rr(2).astype(int).max() + 1
+
+
+def test_radial_binning_edges():
+    """
+    Binning by edges should match np.histogram means with Poisson errors sqrt(sum) / count.
+    """
+    geometry = Geometry.get((300, 200), (250.5, -20))
+    edges = np.geomspace(30, 300, 41)
+    binning = geometry.get_radial_binning(edges=edges)
+    assert geometry.get_radial_binning(edges=edges.copy()) is binning
+    image = np.random.default_rng(1).poisson(10, geometry.shape).astype(np.float32)
+    sums, _ = np.histogram(geometry.rr, edges, weights=image.astype(float))
+    counts, _ = np.histogram(geometry.rr, edges)
+    profile, errors = binning.get_profile(image, errors=True)
+    assert profile.size == edges.size - 1
+    assert np.allclose(profile, sums / counts)
+    assert np.allclose(errors, np.sqrt(sums) / counts)
+
+
+def test_radial_binning_sectors():
+    """
+    Sector profiles from the combined (sector, radius) index should match masked histograms,
+    the full azimuth profile should not depend on sectors.
+    """
+    geometry = Geometry.get((300, 200), (250.5, 80.3))
+    edges = np.linspace(10, 250, 61)
+    sectors = RadialBinningParameters(sector_width=20).sectors
+    binning = geometry.get_radial_binning(edges=edges, sectors=sectors)
+    image = np.random.default_rng(2).poisson(10, geometry.shape).astype(np.float32)
+    (profile, errors), (sector_profiles, sector_errors) = binning.get_sector_profiles(image, errors=True)
+    assert np.allclose(profile, geometry.get_radial_binning(edges=edges).get_profile(image))
+    assert sector_profiles.shape == sector_errors.shape == (len(sectors), edges.size - 1)
+
+    chi = np.abs(np.rad2deg(geometry.get_chi()))
+    for sector, sector_profile, sector_error in zip(sectors, sector_profiles, sector_errors):
+        mask = (chi >= sector.chi_min) & (chi < sector.chi_max)
+        sums, _ = np.histogram(geometry.rr[mask], edges, weights=image[mask].astype(float))
+        counts, _ = np.histogram(geometry.rr[mask], edges)
+        assert np.allclose(sector_profile[counts > 0], sums[counts > 0] / counts[counts > 0])
+        assert np.allclose(sector_error[counts > 0], np.sqrt(sums[counts > 0]) / counts[counts > 0])
+        assert np.all(sector_profile[counts == 0] == 0)
+
+
+@pytest.mark.parametrize('parameters', [
+    dict(bins_number=0), dict(bins_number=-5), dict(r_min=2, r_max=1), dict(r_min=1, r_max=1),
+    dict(r_min=0, log_scale=True), dict(sector_width=-10),
+])
+def test_radial_binning_parameters_validation(parameters):
+    """
+    RadialBinningParameters.from_dict should reject parameters which do not define nonempty bins.
+    """
+    with pytest.raises(ValueError):
+        RadialBinningParameters.from_dict(parameters)
+    assert RadialBinningParameters.from_dict(dict(bins_number=5, r_min=0, r_max=1)).bins_number == 5
+
+
+def test_angular_binning():
+    """
+    Angular profile from the radius-sorted index should average pixels of the ring by angle,
+    for contiguous and transformed (view) images.
+    """
+    geometry = Geometry.get((300, 200), (150.5, 80.3))
+    binning = geometry.get_angular_binning()
+    assert geometry.get_angular_binning() is binning
+    image = np.random.default_rng(3).poisson(10, (200, 300)).astype(np.float32)
+    image = np.rot90(image, -1)
+    phi, profile = binning.get_profile(image, 50, 60, bins_number=90)
+    assert np.array_equal(binning.get_profile(np.ascontiguousarray(image), 50, 60, 90)[1], profile)
+
+    ring = (geometry.rr >= 50) & (geometry.rr < 60)
+    phi_min, phi_max = geometry.phi_range
+    index = ((geometry.phi[ring] - phi_min) / (phi_max - phi_min) * 90).astype(int).clip(0, 89)
+    counts = np.bincount(index, minlength=90)
+    expected = np.bincount(index, image[ring].astype(float), minlength=90)[counts > 0] / counts[counts > 0]
+    assert np.allclose(profile[counts > 0], expected)
+    assert np.allclose(phi, phi_min + (np.arange(90) + 0.5) * (phi_max - phi_min) / 90)
+
+
+def test_binning_cache_size():
+    """
+    Binnings are kept in the byte-budgeted binning cache.
+    """
+    cache = get_binning_cache()
+    max_size = cache.max_size
+    try:
+        cache.clear()
+        binning = Geometry.get((300, 200), (150.5, 80.3)).get_radial_binning()
+        assert cache.size == binning.nbytes > 0
+        cache.set_max_size(binning.nbytes - 1)
+        assert len(cache) == 0
+    finally:
+        cache.set_max_size(max_size)
+
+
+def _exact_q(params: DetectorParameters, k: float, xx: np.ndarray, yy: np.ndarray):
+    # k_f - k_i rotated from the laboratory to the sample frame in float64
+    tilt, alpha_i = np.deg2rad(params.tilt), np.deg2rad(params.incidence_angle)
+    x, y = xx.astype(np.float64) * params.pixel_size, -yy.astype(np.float64) * params.pixel_size
+    k_f = np.stack([x, y * np.cos(tilt), params.distance + y * np.sin(tilt)], -1)
+    k_f /= np.linalg.norm(k_f, axis=-1, keepdims=True)
+    q = (k_f - [0, 0, 1]) * k
+    rotation = np.array([[1, 0, 0],
+                         [0, np.cos(alpha_i), -np.sin(alpha_i)],
+                         [0, np.sin(alpha_i), np.cos(alpha_i)]])
+    q = q @ rotation.T
+    return np.hypot(q[..., 0], q[..., 2]) * np.sign(q[..., 0]), q[..., 1]
+
+
+@pytest.mark.parametrize('shape, center, distance, incidence_angle, tilt', [
+    ((200, 300), (180.3, 120.7), 300., 0, 0),
+    ((200, 300), (180.3, 120.7), 300., 0.2, 0),
+    ((200, 300), (180.3, 120.7), 300., 0.15, 5),
+    # wide angles, where the exit angle is not the elevation shifted by the incidence angle
+    ((1000, 1000), (900.3, 500.7), 100., 0.5, 0),
+    ((1000, 1000), (900.3, 500.7), 100., 0.5, 3),
+])
+def test_detector_geometry(shape, center, distance, incidence_angle, tilt):
+    """
+    DetectorGeometry maps should match k_f - k_i calculated in the sample frame,
+    reciprocal maps should invert them.
+    """
+    geometry = Geometry.get(shape, center)
+    params = DetectorParameters(distance, 0.172, 1., incidence_angle, tilt)
+    detector_geometry = DetectorGeometry.get(geometry, params)
+    assert DetectorGeometry.get(geometry, params) is detector_geometry
+
+    q_xy, q_z = _exact_q(params, detector_geometry.k, geometry.xx, geometry.yy)
+    atol = 1e-6 * np.hypot(q_xy, q_z).max()
+    np.testing.assert_allclose(detector_geometry.q_z, q_z, rtol=1e-6, atol=atol)
+    np.testing.assert_allclose(detector_geometry.q_xy, q_xy, rtol=1e-6, atol=atol)
+
+    q_xy, q_z, map_x, map_y = detector_geometry.get_reciprocal_maps(100, 80)
+    covered = map_x >= 0
+    assert covered.mean() > 0.3
+    center_y, center_x = geometry.beam_center
+    exact_q_xy, exact_q_z = _exact_q(params, detector_geometry.k,
+                                     map_x[covered] - center_x, map_y[covered] - center_y)
+    q_xy_grid, q_z_grid = np.meshgrid(q_xy, q_z)
+    assert np.allclose(exact_q_xy, q_xy_grid[covered], atol=1e-4)
+    assert np.allclose(exact_q_z, q_z_grid[covered], atol=1e-4)
+
+    r = np.array([0, 10, 150.5])
+    assert np.allclose(detector_geometry.q_to_r(detector_geometry.r_to_q(r)), r)
@@ -0,0 +1,47 @@
+import pytest
+import numpy as np
+
+from giwaxs_gui.gui.global_context import Geometry
+from giwaxs_gui.gui.integration import get_integration_matrix
+
+
+@pytest.mark.parametrize('center', [(20.5, 15), (0, 0), (-10, 25.3), (39, 49)])
+def test_integration_matrix(center):
+    """
+    Pixel splitting should conserve intensity and give flat profiles for flat images.
+    """
+    geometry = Geometry.get((40, 50), center)
+    integration_matrix = get_integration_matrix(
+        geometry, 30, 20, r_range=(-10, geometry.r_range[1] + 10), phi_range=(-np.pi, np.pi))
+    assert get_integration_matrix(
+        geometry, 30, 20, r_range=(-10, geometry.r_range[1] + 10), phi_range=(-np.pi, np.pi)
+    ) is integration_matrix
+    assert np.allclose(integration_matrix.matrix.sum(axis=0), 1, atol=1e-5)
+
+    result = integration_matrix.integrate(np.full(geometry.shape, 3))
+    assert result.shape == (20, 30)
+    assert np.allclose(result[result > 0], 3, atol=1e-5)
+
+    radial_profile = get_integration_matrix(geometry, 30).integrate(np.full(geometry.shape, 3))
+    assert radial_profile.shape == (1, 30)
+    assert np.allclose(radial_profile, 3, atol=1e-5)
+
+
+def test_pixel_splitting_interpolation():
+    """
+    Pixel splitting mode should not calculate remap maps and give the same axes as remapping.
+    """
+    from giwaxs_gui.gui.interpolation.interpolation import Interpolation
+
+    geometry = Geometry.get((60, 80), (20, 30))
+    interpolation = Interpolation()
+    interpolation.set_algorithm('Pixel splitting')
+    interpolation.set_geometry(geometry, r_size=64, phi_size=32)
+    assert interpolation.interpolate(np.ones(geometry.shape, dtype=np.float32)).shape == (32, 64)
+    assert interpolation._interpolation_geometry is None
+
+    remap_interpolation = Interpolation()
+    remap_interpolation.set_geometry(geometry, r_size=64, phi_size=32)
+    assert np.allclose(interpolation.r_axis, remap_interpolation.r_axis)
+    assert np.allclose(interpolation.phi_axis, remap_interpolation.phi_axis)
+    assert interpolation._interpolation_geometry is None
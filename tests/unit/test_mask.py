@@ -0,0 +1,147 @@
+import numpy as np
+
+from giwaxs_gui.gui.global_context import (Image, Geometry, DetectorMask, MaskParameters,
+                                           RadialBinningParameters, get_limits, normalize_image)
+from giwaxs_gui.utils import RoiParameters
+
+from tests.fixures.cbf import write_cbf
+
+
+def test_detector_mask(tmp_path):
+    """
+    DetectorMask should keep the mask as packed bits and combine masks from file, thresholds and rois.
+    """
+    shape = (31, 45)
+    rng = np.random.default_rng(0)
+    array = rng.random(shape) > 0.9
+    mask = DetectorMask(array)
+    assert np.array_equal(mask.array, array)
+    assert mask.count == array.sum()
+    assert DetectorMask(array.copy()).key == mask.key
+    assert not DetectorMask(np.zeros(shape, dtype=bool))
+    assert (mask | None) is mask
+
+    write_cbf(tmp_path / 'mask.cbf', np.flip(array, 0).astype(np.int32))
+    assert np.array_equal(DetectorMask.from_file(str(tmp_path / 'mask.cbf'), shape).array, array)
+
+    image = rng.poisson(100, shape).astype(np.float32)
+    image[:, 10] = -1
+    image[3, 3] = 1e6
+    threshold_mask = DetectorMask.from_threshold(image, 0, 1e5)
+    assert np.array_equal(threshold_mask.array, (image < 0) | (image > 1e5))
+    assert np.array_equal((mask | threshold_mask).array, array | threshold_mask.array)
+
+    geometry = Geometry.get(shape, (25, 20))
+    roi_mask = DetectorMask.from_rois(geometry, [RoiParameters(10, 4, angle=90, angle_std=90)])
+    phi = np.rad2deg(geometry.phi)
+    expected = (geometry.rr >= 8) & (geometry.rr <= 12) & (np.abs(phi - 90) <= 45)
+    assert np.array_equal(roi_mask.array, expected)
+
+
+def test_masked_reductions():
+    """
+    Masked pixels should not contribute to radial profiles and polar interpolation.
+    """
+    rng = np.random.default_rng(1)
+    image = rng.poisson(100, (300, 200)).astype(np.float32)
+    image[:, 50:55] = -1
+    image[120:125, :] = 1e6
+    masked = (image < 0) | (image > 1e5)
+
+    img = Image()
+    img.set_image(image)
+    img.set_beam_center((250.5, 80.3))
+    img.set_mask_parameters(MaskParameters(min_intensity=0, max_intensity=1e5))
+    img.set_radial_binning_parameters(RadialBinningParameters(bins_number=50, r_max=250))
+    assert np.array_equal(img.mask.array, masked)
+
+    profile = img.get_radial_profile()
+    edges = np.linspace(img.r_range[0], 250, 51)
+    sums, _ = np.histogram(img.geometry.rr[~masked], edges, weights=image[~masked].astype(float))
+    counts, _ = np.histogram(img.geometry.rr[~masked], edges)
+    assert np.allclose(profile.y[counts > 0], sums[counts > 0] / counts[counts > 0])
+
+    for mode in ('Bilinear', 'Nearest', 'Pixel splitting'):
+        img.set_interpolation_parameters(dict(mode=mode, r_size=64, phi_size=64))
+        p_image = img.interpolate()
+        valid_bins = p_image != 0
+        assert valid_bins.any()
+        assert 30 < p_image[valid_bins].min() and p_image.max() < 200
+
+
+def test_mask_updates():
+    """
+    Horizon mask should follow the beam center except for previews, thresholds should be kept from the frame
+    current when the mask parameters were set.
+    """
+    from giwaxs_gui.gui.global_context import DetectorParameters
+
+    image = np.full((100, 80), 10, dtype=np.float32)
+    image[:, 5] = -1
+    img = Image()
+    img.set_image(image)
+    img.set_beam_center((60.5, 40.3))
+    img.set_detector_parameters(DetectorParameters(100, 0.172, 1., 0.2))
+    img.set_mask_parameters(MaskParameters(min_intensity=0, horizon=True))
+    horizon = img.mask.array.sum(1) == image.shape[1]
+    assert horizon.any() and not horizon.all()
+
+    mask = img.mask
+    img.set_beam_center((40.5, 40.3), preview=True)
+    assert img.mask is mask
+    img.set_beam_center((40.5, 40.3))
+    assert not np.array_equal(img.mask.array.sum(1) == image.shape[1], horizon)
+
+    # masks which do not depend on geometry are kept for new beam centers
+    img.set_mask_parameters(MaskParameters(min_intensity=0))
+    mask = img.mask
+    img.set_beam_center((50.5, 40.3))
+    assert img.mask is mask
+
+    img.set_image(np.full_like(image, 10))
+    assert img.mask.array[:, 5].all()
+    img.set_mask_parameters(MaskParameters(min_intensity=0))
+    assert img.mask is None
+
+
+def test_masked_interpolation_weights_are_cached():
+    """
+    Inverse remap weights of preview and region interpolation should be calculated once per mask.
+    """
+    image = np.random.default_rng(2).poisson(100, (300, 200)).astype(np.float32)
+    image[:, 50:55] = -1
+    img = Image()
+    img.set_image(image)
+    img.set_beam_center((250.5, 80.3))
+    img.set_mask_parameters(MaskParameters(min_intensity=0))
+    img.set_interpolation_parameters(dict(mode='Bilinear', r_size=64, phi_size=64))
+    img.interpolate()
+    interpolation = img.interpolation
+    interpolation.interpolate_preview(image)
+    interpolation.interpolate_region(image, (20, 100), (0, 1))
+    weights = dict(interpolation._weights)
+    assert len(weights) == 2  # small preview reuses the full interpolation geometry
+
+    _, _, region = interpolation.interpolate_region(image, (20, 100), (0, 1))
+    interpolation.interpolate_preview(image)
+    assert interpolation._weights.keys() == weights.keys()
+    assert 30 < region[region != 0].min() and region.max() < 200
+
+    # stale mask of another image shape is ignored
+    other = np.full((100, 120), 50, dtype=np.float32)
+    _, _, region = interpolation.interpolate_region(other, (20, 60), (0, 1))
+    assert np.allclose(region[region != 0], 50)
+    assert interpolation.interpolate_preview(other) is not None
+
+
+def test_masked_limits():
+    """
+    Intensity limits should ignore masked pixels, fully masked images should be normalized to zeros.
+    """
+    image = np.arange(20, dtype=np.float32).reshape(4, 5)
+    mask = image > 15
+    assert get_limits(image, None, mask) == (0, 15)
+    assert get_limits(image, None, np.ones_like(mask)) is None
+    normalized = normalize_image(image, mask=mask)
+    assert normalized.max() == 1 and np.all(normalized[mask] == 0)
+    assert not normalize_image(image, 2, np.ones_like(mask)).any()
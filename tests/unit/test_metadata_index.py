@@ -0,0 +1,82 @@
+import os
+from pathlib import Path
+
+from giwaxs_gui.read_data.metadata_index import FolderMetadataIndex
+from tests.fixures.edf import write_edf_frame
+
+
+def test_metadata_index(tmp_path, edf_filepath, edf_image, monkeypatch):
+    """
+    FolderMetadataIndex should store edf headers in a sidecar file
+    and read files again only if they were modified.
+    """
+    index = FolderMetadataIndex(tmp_path)
+    metadata = index.get_metadata(edf_filepath)
+    assert index.index_path.is_file()
+    assert metadata['header']['ExposureTime'] == '0.5'
+    assert metadata['shape'] == [edf_image.shape[1], edf_image.shape[0]]
+    assert metadata['dtype'] == 'uint16'
+
+    def fail(*args):
+        raise AssertionError('Indexed file should not be read.')
+
+    monkeypatch.setattr('giwaxs_gui.read_data.metadata_index.read_file_metadata', fail)
+    assert FolderMetadataIndex(tmp_path).get_metadata(edf_filepath) == metadata
+
+    monkeypatch.undo()
+    edf_filepath.write_bytes(write_edf_frame(edf_image, ExposureTime=2))
+    os.utime(edf_filepath, (0, 1))
+    assert index.get_metadata(edf_filepath)['header']['ExposureTime'] == '2'
+
+
+def test_metadata_index_batches(tmp_path, monkeypatch):
+    """
+    FolderMetadataIndex should find records of many files queried in chunks by name.
+    """
+    filepaths = [tmp_path / f'{i}.txt' for i in range(1200)]
+    for filepath in filepaths:
+        filepath.write_bytes(b'')
+    index = FolderMetadataIndex(tmp_path)
+    metadata = index.update(filepaths)
+    assert len(metadata) == 1200
+
+    def fail(*args):
+        raise AssertionError('Indexed file should not be read.')
+
+    monkeypatch.setattr('giwaxs_gui.read_data.metadata_index.read_file_metadata', fail)
+    assert index.update(filepaths[::-1]) == metadata
+
+
+def test_metadata_index_read_only_folder(tmp_path, tmp_user_config_dir, monkeypatch):
+    """
+    FolderMetadataIndex should not create a sidecar file in a read-only folder
+    and keep the index in the user config folder instead.
+    """
+    monkeypatch.setattr('giwaxs_gui.read_data.metadata_index.os.access', lambda *args: False)
+    filepath = tmp_path / 'a.txt'
+    filepath.write_bytes(b'')
+    index = FolderMetadataIndex(tmp_path)
+    assert index.update([filepath])[filepath]['size'] == 0
+    assert index.index_path.parent.parent == Path(tmp_user_config_dir)
+    assert list(tmp_path.iterdir()) == [filepath]
+
+
+def test_reader_registry(tmp_path):
+    """
+    read_data.get_reader should return the most recently registered reader
+    matching the file suffix.
+    """
+    from giwaxs_gui.read_data import readers
+
+    class CustomEdfReader(readers.EdfReader):
+        pass
+
+    assert isinstance(readers.get_reader(tmp_path / 'a.edf.gz'), readers.EdfReader)
+    assert isinstance(readers.get_reader(tmp_path / 'a_master.h5'), readers.NexusReader)
+    assert readers.get_reader(tmp_path / 'a.h5').IS_H5_CONTAINER
+    assert readers.get_reader(tmp_path / 'a.txt') is None
+    custom_reader = readers.register_reader(CustomEdfReader())
+    try:
+        assert readers.get_reader(tmp_path / 'a.edf') is custom_reader
+    finally:
+        readers._READERS.remove(custom_reader)
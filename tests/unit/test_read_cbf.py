@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from giwaxs_gui.read_data import get_image_from_path
+from giwaxs_gui.read_data.read_cbf import decompress_byte_offset, read_cbf_header
+from tests.fixures.cbf import compress_byte_offset, write_cbf
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_decompress_byte_offset(seed):
+    """
+    decompress_byte_offset should decode all escape levels, including escaped
+    values containing -128 bytes which are not escapes themselves.
+    """
+    rng = np.random.default_rng(seed)
+    size = 2000
+    deltas = np.choose(rng.integers(0, 5, size), [
+        rng.integers(-127, 128, size),
+        rng.integers(-2 ** 15 + 1, 2 ** 15, size),
+        rng.integers(-2 ** 31 + 1, 2 ** 31, size),
+        rng.integers(-2 ** 40, 2 ** 40, size),
+        rng.choice([128, -128, 0x8080, -0x7f80, 0x808080, 2 ** 31, -2 ** 31], size),
+    ])
+    values = np.cumsum(deltas)
+    assert np.array_equal(decompress_byte_offset(compress_byte_offset(values), size, np.int64), values)
+
+
+@pytest.mark.parametrize('deltas', [
+    [-32640] * 20000,
+    [32640, -32640] * 10000,
+    [1] + [-32640] * 20000 + [-0x7f7f7f80] * 5000 + [128] * 100,
+])
+def test_decompress_long_escape_chains(deltas):
+    """
+    Long runs of escaped values made of -128 bytes should be resolved in a few passes.
+    """
+    values = np.cumsum(deltas)
+    data = compress_byte_offset(values)
+    assert np.array_equal(decompress_byte_offset(data, values.size, np.int64), values)
+
+
+def test_read_cbf(tmp_path):
+    """
+    get_image_from_path should read cbf files flipped vertically as other formats.
+    """
+    rng = np.random.default_rng(0)
+    image = rng.poisson(10, (50, 40)).astype(np.int32)
+    image[rng.random(image.shape) < 0.05] = 10 ** 6
+    image[0, 0] = -1
+    filepath = tmp_path / 'image.cbf'
+    write_cbf(filepath, image)
+
+    result = get_image_from_path(filepath)
+    assert result.dtype == np.int32
+    assert np.array_equal(result, np.flip(image, 0))
+    header = read_cbf_header(filepath)
+    assert header['X-Binary-Size-Fastest-Dimension'] == '40'
+    assert header['Exposure_time'] == '1.0 s'
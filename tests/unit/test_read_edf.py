@@ -0,0 +1,95 @@
+import gzip
+
+import numpy as np
+
+from giwaxs_gui.read_data import read_edf
+from tests.fixures.edf import write_edf_frame
+
+
+def test_read_edf_mmap(edf_filepath, edf_image):
+    """
+    read_edf.read_edf_mmap should return the same image as the full read
+    without loading the payload into memory.
+    """
+    image, header = read_edf.read_edf_mmap(str(edf_filepath))
+    expected, expected_header = read_edf.read_edf(str(edf_filepath), mmap=False)
+    assert isinstance(image.base, np.memmap) or isinstance(image, np.memmap)
+    assert not image.flags.writeable
+    assert header == expected_header
+    assert header['headerSize'] == 1024
+    np.testing.assert_array_equal(image, expected)
+    np.testing.assert_array_equal(image, np.rot90(edf_image))
+
+
+def test_read_edf_from_file(edf_filepath, edf_gz_filepath):
+    """
+    read_edf.read_edf_from_file should give equal images for .edf and .edf.gz files.
+    """
+    image, _ = read_edf.read_edf_from_file(str(edf_filepath))
+    gz_image, _ = read_edf.read_edf_from_file(str(edf_gz_filepath))
+    np.testing.assert_array_equal(image, gz_image)
+
+
+def test_edf_file_frames(tmp_path, edf_image):
+    """
+    read_edf.EdfFile should index all frames of a multi-frame edf file
+    and decode them lazily.
+    """
+    filepath = tmp_path / 'series.edf'
+    frames = [edf_image + i for i in range(5)]
+    filepath.write_bytes(b''.join(write_edf_frame(frame) for frame in frames))
+    edf_file = read_edf.EdfFile(filepath)
+    assert len(edf_file) == 5
+    assert [h['headerSize'] for h in edf_file.headers] == [1024] * 5
+    np.testing.assert_array_equal(edf_file[3], np.rot90(frames[3]))
+    np.testing.assert_array_equal(edf_file[-1], np.rot90(frames[-1]))
+    assert len(edf_file[1:4]) == 3
+    np.testing.assert_array_equal(edf_file[1:4][0], np.rot90(frames[1]))
+
+
+def test_edf_gz_file_releases_data(tmp_path, edf_image):
+    """
+    read_edf.EdfFile should not keep decompressed edf.gz data after the first frame is read.
+    """
+    filepath = tmp_path / 'series.edf.gz'
+    frames = [edf_image + i for i in range(3)]
+    filepath.write_bytes(gzip.compress(b''.join(write_edf_frame(frame) for frame in frames)))
+    edf_file = read_edf.EdfFile(filepath)
+    assert len(edf_file) == 3
+    np.testing.assert_array_equal(edf_file[1], np.rot90(frames[1]))
+    assert edf_file._data is None
+    for i in (2, 0, 1):
+        image = edf_file[i]
+        np.testing.assert_array_equal(image, np.rot90(frames[i]))
+        assert len(image.base.base) == edf_image.nbytes
+
+
+def test_read_header_only(edf_filepath, edf_gz_filepath):
+    """
+    read_edf.read_header_from_file should read only the header blocks
+    and return the same header for .edf and .edf.gz files.
+    """
+    header = read_edf.read_header_from_file(edf_filepath)
+    gz_header = read_edf.read_header_from_file(edf_gz_filepath)
+    assert header == gz_header
+    assert header['ExposureTime'] == '0.5'
+    assert header['headerSize'] == 1024
+
+
+def test_iter_edf_gz_frames(tmp_path, edf_image):
+    """
+    iter_edf_gz_frames should yield frames of all files in order
+    while decompressing them in a thread pool.
+    """
+    filepaths = []
+    for i in range(7):
+        filepath = tmp_path / f'image_{i}.edf.gz'
+        frames = [write_edf_frame(edf_image + 2 * i + j, Index=j) for j in range(2)]
+        filepath.write_bytes(gzip.compress(b''.join(frames)))
+        filepaths.append(filepath)
+
+    results = list(read_edf.iter_edf_gz_frames(filepaths, max_workers=3, max_pending=2))
+    assert [(path, header['Index']) for path, _, header in results] == [
+        (str(path), str(j)) for path in filepaths for j in range(2)]
+    for i, (_, image, _) in enumerate(results):
+        assert np.array_equal(image, np.rot90(edf_image + i))
@@ -0,0 +1,21 @@
+import numpy as np
+import pytest
+
+from giwaxs_gui.read_data.read_tiff import TiffFile
+from tests.fixures.tiff import write_tiff
+
+
+@pytest.mark.parametrize('dtype', [np.uint16, np.int32, np.float32])
+def test_tiff_file_keeps_dtype(tmp_path, dtype):
+    """
+    TiffFile should read all pages of multi-page tiff files in their native dtype.
+    """
+    images = [(np.arange(7 * 5).reshape(7, 5) * (i + 1)).astype(dtype) for i in range(3)]
+    filepath = tmp_path / 'stack.tif'
+    write_tiff(filepath, images)
+    tiff_file = TiffFile(filepath)
+    assert len(tiff_file) == 3
+    for i, image in enumerate(images):
+        page = tiff_file[i]
+        assert page.dtype == dtype
+        np.testing.assert_array_equal(page, np.flip(image, 0))